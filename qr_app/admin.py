@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Student, Subject, QRSession, Attendance, Branch
+import tempfile
+
+from django.contrib import admin, messages
+from django.http import FileResponse
+
+from .idcards import generate_id_cards, idcard_setting
+from .models import Student, Subject, QRSession, Attendance, Branch, DailyAttendanceSummary, StudentSubjectStats
 
 
 @admin.register(Branch)
@@ -20,6 +25,27 @@ class StudentAdmin(admin.ModelAdmin):
     list_filter = ("branch", "year", "semester")
     search_fields = ("roll_no", "name")
     filter_horizontal = ("subjects",)
+    actions = ("id_cards_pdf", "id_cards_png")
+
+    def _id_cards(self, request, queryset, fmt, filename):
+        limit = idcard_setting("ADMIN_MAX_CARDS")
+        if queryset.count() > limit:
+            self.message_user(request, f"Select at most {limit} students here; use the generate_id_cards "
+                                       f"command for larger batches.", messages.ERROR)
+            return None
+        output = tempfile.TemporaryFile()
+        # Threads, not the command's process pool: no forking from the web server
+        generate_id_cards(queryset, output, fmt=fmt, workers=idcard_setting("ADMIN_WORKERS"), processes=False)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename)
+
+    @admin.action(description="Generate ID cards (PDF)")
+    def id_cards_pdf(self, request, queryset):
+        return self._id_cards(request, queryset, "pdf", "id-cards.pdf")
+
+    @admin.action(description="Generate ID cards (ZIP of PNG)")
+    def id_cards_png(self, request, queryset):
+        return self._id_cards(request, queryset, "png", "id-cards.zip")
 
 
 @admin.register(QRSession)
@@ -32,3 +58,17 @@ class QRSessionAdmin(admin.ModelAdmin):
 class AttendanceAdmin(admin.ModelAdmin):
     list_display = ("student", "qr_session", "timestamp")
     list_filter = ("qr_session", "student")
+
+
+@admin.register(DailyAttendanceSummary)
+class DailyAttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ("date", "subject", "branch", "count")
+    list_filter = ("branch", "subject")
+    date_hierarchy = "date"
+
+
+@admin.register(StudentSubjectStats)
+class StudentSubjectStatsAdmin(admin.ModelAdmin):
+    list_display = ("student", "subject", "attended", "held", "percentage")
+    list_filter = ("subject",)
+    search_fields = ("student__roll_no", "student__name")
@@ -0,0 +1,215 @@
+"""
+Admission control for attendance submissions.
+
+The moment a QR is projected, a whole class submits at once and flaky Wi-Fi
+retries add to it. Every submission first asks ``admission.admit()``:
+
+* a token bucket per client IP turns away a single client hammering the
+  endpoint. It only applies once ``TRUSTED_PROXIES`` is set: behind a
+  platform proxy every request would otherwise carry the proxy's address and
+  the bucket would cap the whole site. Classrooms often share one NAT
+  address too, so it is never stricter than the per-session limit;
+* a token bucket per QR session paces the class. A submission that finds
+  the bucket empty reserves a future token and waits for it, as long as the
+  wait stays under ``MAX_WAIT`` and fewer than ``MAX_WAITING`` requests are
+  already waiting for that session.
+
+Anything else is answered right away with "busy, try again" and a
+``Retry-After``, instead of queueing more work in front of the database.
+
+Settings (all optional) live in ``settings.QR_ADMISSION``:
+
+* ``ENABLED`` - turn admission control on or off
+* ``SESSION_RATE`` / ``SESSION_BURST`` - submissions per second per session, bucket size
+* ``IP_RATE`` / ``IP_BURST`` - the same per client IP (only with ``TRUSTED_PROXIES``)
+* ``MAX_WAIT`` - longest a submission is held for a token (seconds)
+* ``MAX_WAITING`` - bound of the wait queue per session
+* ``TRUSTED_PROXIES`` - addresses/networks of reverse proxies in front of the app
+* ``FORWARDED_HEADER`` - header those proxies put the client address in
+"""
+import ipaddress
+import math
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+
+from .cache import TTLCache
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SESSION_RATE": 50.0,
+    "SESSION_BURST": 100,
+    "IP_RATE": 50.0,
+    "IP_BURST": 100,
+    "MAX_WAIT": 2.0,
+    "MAX_WAITING": 50,
+    "TRUSTED_PROXIES": (),
+    "FORWARDED_HEADER": "X-Forwarded-For",
+}
+
+# Buckets not touched for this long are dropped (they would be full again).
+IDLE_TTL = 300
+
+
+def admission_setting(name):
+    return getattr(settings, "QR_ADMISSION", {}).get(name, DEFAULTS[name])
+
+
+class TokenBucket:
+    """
+    Token bucket that may go into debt: ``reserve()`` always takes a token
+    and returns how long the caller has to wait until it is really there.
+    """
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is there now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self, now):
+        wait = self.wait_time(now)
+        self.tokens -= 1
+        return wait
+
+
+@dataclass
+class Decision:
+    admitted: bool
+    retry_after: int = 0
+    waited: float = 0.0
+
+
+class AdmissionController:
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets = TTLCache(maxsize=4096, default_ttl=IDLE_TTL)
+        self._waiting = {}
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected_ip = 0
+        self.rejected_busy = 0
+        self.max_waiting_seen = 0
+        self.total_wait = 0.0
+
+    def _bucket(self, key, rate, burst, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst, now)
+        self._buckets.set(key, bucket)  # refresh the idle TTL
+        return bucket
+
+    def admit(self, session_id, client_ip):
+        """Admit one submission, possibly after a short wait; never raises."""
+        if not admission_setting("ENABLED"):
+            return Decision(True)
+
+        with self._lock:
+            now = self._clock()
+            ip_bucket = None
+            if admission_setting("TRUSTED_PROXIES"):
+                ip_bucket = self._bucket(
+                    ("ip", client_ip), admission_setting("IP_RATE"), admission_setting("IP_BURST"), now
+                )
+                ip_wait = ip_bucket.wait_time(now)
+                if ip_wait > 0:
+                    self.rejected_ip += 1
+                    return Decision(False, retry_after=math.ceil(ip_wait))
+
+            session_bucket = self._bucket(
+                ("session", session_id),
+                admission_setting("SESSION_RATE"), admission_setting("SESSION_BURST"), now,
+            )
+            wait = session_bucket.wait_time(now)
+            waiting = self._waiting.get(session_id, 0)
+            if wait > admission_setting("MAX_WAIT") or (wait and waiting >= admission_setting("MAX_WAITING")):
+                self.rejected_busy += 1
+                return Decision(False, retry_after=max(math.ceil(wait), 1))
+
+            if ip_bucket:
+                ip_bucket.reserve(now)
+            session_bucket.reserve(now)
+            self.admitted += 1
+            if not wait:
+                return Decision(True)
+            self.delayed += 1
+            self.total_wait += wait
+            self._waiting[session_id] = waiting + 1
+            self.max_waiting_seen = max(self.max_waiting_seen, waiting + 1)
+
+        try:
+            self._sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting[session_id] -= 1
+                if not self._waiting[session_id]:
+                    del self._waiting[session_id]
+        return Decision(True, waited=wait)
+
+    def reset(self):
+        """Forget all buckets (counters are kept)."""
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "delayed": self.delayed,
+                "rejected_ip": self.rejected_ip,
+                "rejected_busy": self.rejected_busy,
+                "waiting": sum(self._waiting.values()),
+                "max_waiting_seen": self.max_waiting_seen,
+                "avg_wait_ms": round(self.total_wait * 1000 / self.delayed, 2) if self.delayed else 0.0,
+                "buckets": len(self._buckets),
+            }
+
+
+admission = AdmissionController()
+
+
+@lru_cache(maxsize=8)
+def _networks(proxies):
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies if proxy)
+
+
+def _is_proxy(address, networks):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def client_ip(request):
+    """
+    Address the per-IP bucket is keyed on. Behind a trusted proxy every
+    request comes from the proxy, so the client is the right-most hop of the
+    forwarded header that is not a trusted proxy itself; hops left of it are
+    whatever the client chose to send and are never used.
+    """
+    remote = request.META.get("REMOTE_ADDR", "")
+    networks = _networks(tuple(admission_setting("TRUSTED_PROXIES")))
+    if not _is_proxy(remote, networks):
+        return remote
+    header = "HTTP_" + admission_setting("FORWARDED_HEADER").upper().replace("-", "_")
+    hops = [hop.strip() for hop in request.META.get(header, "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_proxy(hop, networks):
+            return hop
+    return hops[0] if hops else remote
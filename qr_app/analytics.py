@@ -0,0 +1,89 @@
+"""
+Semester-wide attendance analytics: scopes, the data version and the
+cache of attendance matrices.
+
+The matrices themselves (bit-packed NumPy arrays, see matrix.py) are built
+per scope (branch + semester + date range) and cached per scope and data
+version; the version is bumped by every write that could change them.
+NumPy is imported with the first matrix, not with this module.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import TTLCache, bump_shared_version, shared_version
+from .models import Attendance, QRSession, Student
+from .signals import attendance_recorded
+
+DEFAULT_THRESHOLD = 75.0
+
+
+@dataclass(frozen=True)
+class Scope:
+    branch_id: int
+    semester: int
+    date_from: object  # date
+    date_to: object    # date, inclusive
+
+    def bounds(self):
+        """Aware datetimes covering the local days of the scope."""
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(self.date_from, time.min), tz)
+        end = timezone.make_aware(datetime.combine(self.date_to + timedelta(days=1), time.min), tz)
+        return start, end
+
+
+def build_matrix(scope):
+    from .matrix import build_matrix as build  # loads NumPy on first use
+
+    return build(scope)
+
+
+# 🔢 Data version and cache
+#
+# The version lives in Django's cache so every worker agrees on it; any
+# write that can change a matrix bumps it and cached matrices fall out.
+
+VERSION_KEY = "qr:analytics:version"
+matrix_cache = TTLCache(maxsize=32, default_ttl=3600)
+
+
+def data_version():
+    return shared_version(VERSION_KEY)
+
+
+def bump_data_version():
+    bump_shared_version(VERSION_KEY)
+
+
+def get_matrix(scope):
+    key = (scope, data_version())
+    matrix = matrix_cache.get(key)
+    if matrix is None:
+        matrix = build_matrix(scope)
+        matrix_cache.set(key, matrix)
+    return matrix
+
+
+@receiver(attendance_recorded)
+def attendance_changed(sender, **kwargs):
+    transaction.on_commit(bump_data_version)
+
+
+@receiver(post_delete, sender=Attendance)
+@receiver(post_save, sender=QRSession)
+@receiver(post_delete, sender=QRSession)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def roster_or_sessions_changed(sender, **kwargs):
+    transaction.on_commit(bump_data_version)
+
+
+@receiver(m2m_changed, sender=Student.subjects.through)
+def enrollment_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        transaction.on_commit(bump_data_version)
@@ -5,3 +5,6 @@ class QrAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "qr_app"
     verbose_name = "QR Attendance System"
+
+    def ready(self):
+        from . import analytics, catalog, history, live, search, signals, stats, summary  # noqa: F401  (connect receivers, checks)
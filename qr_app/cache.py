@@ -0,0 +1,161 @@
+"""
+Process-local caches for the scan hot path.
+
+``TTLCache`` is a small thread-safe LRU where every entry carries its own
+expiry, so a cached ``QRSession`` can live exactly as long as the session.
+The version counters that invalidate such caches (``shared_version``) live
+in Django's cache instead, which settings.CACHES points at a backend shared
+by every worker process.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.utils import timezone
+
+from .models import QRSession
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, maxsize=1024, default_ttl=60.0):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires = entry
+            if expires <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def values(self):
+        """Live (unexpired) values, oldest first."""
+        now = time.monotonic()
+        with self._lock:
+            return [value for value, expires in self._data.values() if expires > now]
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# 🔑 QRSession by token
+#
+# A session never changes after generate_qr creates it, so it can be cached
+# until its own expires_at. Unknown tokens are cached too (as None) so that
+# a bad link shared around the class does not hit the DB on every open.
+# Expired sessions are kept briefly so the "QR expired" page stays cheap.
+
+def _session_cache_setting(name, default):
+    return getattr(settings, "QR_SESSION_CACHE", {}).get(name, default)
+
+
+qr_session_cache = TTLCache(maxsize=_session_cache_setting("MAX_SIZE", 512))
+
+
+def get_qr_session(token):
+    """Cached equivalent of ``get_object_or_404(QRSession, token=token)``."""
+    session = qr_session_cache.get(token, _MISSING)
+    if session is _MISSING:
+        session = QRSession.objects.select_related("subject").filter(token=token).first()
+        cache_qr_session(session, token)
+    if session is None:
+        raise Http404("No QRSession matches the given query.")
+    return session
+
+
+def get_qr_session_by_id(session_id):
+    """Same as get_qr_session() for the id carried by a signed token."""
+    key = ("id", session_id)
+    session = qr_session_cache.get(key, _MISSING)
+    if session is _MISSING:
+        session = QRSession.objects.select_related("subject").filter(id=session_id).first()
+        cache_qr_session(session, key)
+    if session is None:
+        raise Http404("No QRSession matches the given query.")
+    return session
+
+
+def cache_qr_session(session, token=None):
+    """Store a session (or a negative result for ``token``) in the cache."""
+    short_ttl = _session_cache_setting("NEGATIVE_TTL", 30)
+    if session is None:
+        qr_session_cache.set(token, None, ttl=short_ttl)
+        return
+    remaining = (session.expires_at - timezone.now()).total_seconds()
+    ttl = max(remaining, short_ttl)
+    qr_session_cache.set(token or session.token, session, ttl=ttl)
+    qr_session_cache.set(("id", session.id), session, ttl=ttl)
+
+
+# 🔢 Version counters shared by every worker
+
+def shared_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Unknown here (fresh cache or culled): start from a random value so a
+        # key or ETag handed out before can never match by accident.
+        cache.add(key, random.getrandbits(48), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_shared_version(key):
+    # A new random value rather than incr(): the file and database backends
+    # implement incr() as get + set, so two concurrent bumps could both land
+    # on the same number and one change would go unseen.
+    cache.set(key, random.getrandbits(48), timeout=None)
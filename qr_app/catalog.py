@@ -0,0 +1,80 @@
+"""
+Cached catalog pages: the student list, the subject list and the subject
+picker JSON.
+
+The catalog (students, subjects, branches) only changes through the add
+forms, the CSV import and the admin, so each response is rendered once per
+(page, filter parameters, catalog version) and kept in a process-local LRU.
+The version lives in Django's cache, so every worker agrees on it, and is
+bumped on commit by any save, delete or enrollment change. Responses carry
+an ETag built from the same key: an unchanged page costs a 304 and no
+queries, a changed one a single render.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .cache import TTLCache, bump_shared_version, shared_version
+from .models import Branch, Student, Subject
+
+
+def catalog_setting(name, default):
+    return getattr(settings, "QR_CATALOG_CACHE", {}).get(name, default)
+
+
+VERSION_KEY = "qr:catalog:version"
+page_cache = TTLCache(maxsize=catalog_setting("MAX_SIZE", 256), default_ttl=catalog_setting("TTL", 3600))
+
+
+def catalog_version():
+    return shared_version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    bump_shared_version(VERSION_KEY)
+
+
+def cached_page(request, name, params, render_page):
+    """
+    ``render_page()``'s response for ``request``, cached per page ``name``,
+    the values of the GET ``params`` it depends on and the catalog version.
+    """
+    key = (name, tuple(request.GET.get(p, "") for p in params), catalog_version())
+    etag = quote_etag(hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest())
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    entry = page_cache.get(key)
+    if entry is None:
+        response = render_page()
+        if response.status_code != 200:
+            return response
+        entry = (response.content, response["Content-Type"])
+        page_cache.set(key, entry)
+    response = HttpResponse(entry[0], content_type=entry[1])
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"  # always revalidate; the ETag makes that cheap
+    return response
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def catalog_changed(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(m2m_changed, sender=Student.subjects.through)
+def enrollment_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        transaction.on_commit(bump_catalog_version)
@@ -0,0 +1,70 @@
+"""
+Streaming CSV exports.
+
+Rows are produced from ``values_list`` projections read with
+``.iterator(chunk_size=...)``, so no model instances are built or cached and
+the first bytes leave the server before the last row is read.
+"""
+import csv
+
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+
+from .models import Attendance, Student
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def faculty_rows(attendance):
+    """Roll No / Name / Subject / Time rows for an Attendance queryset."""
+    rows = attendance.values_list(
+        "student__roll_no", "student__name", "qr_session__subject__name", "timestamp"
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for roll_no, name, subject_name, timestamp in rows:
+        yield [roll_no, name, subject_name, timestamp.strftime("%H:%M:%S")]
+
+
+def subject_sheet_queryset(subject, date):
+    """
+    Students of a subject, ordered by roll number, each annotated with
+    ``present`` via an EXISTS subquery, so presence is resolved by the join
+    instead of a Python membership test.
+    """
+    present = Attendance.objects.filter(
+        student=OuterRef("pk"),
+        qr_session__subject=subject,
+        attendance_date=date,
+    )
+    return (
+        Student.objects.filter(subjects=subject)
+        .order_by("roll_no")
+        .annotate(present=Exists(present))
+    )
+
+
+def subject_sheet_rows(subject, date, present_label="Present", absent_label="Absent"):
+    rows = subject_sheet_queryset(subject, date).values_list(
+        "roll_no", "name", "present"
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for roll_no, name, present in rows:
+        yield [roll_no, name, present_label if present else absent_label]
@@ -33,3 +33,33 @@ class SubjectForm(forms.ModelForm):
     class Meta:
         model = Subject
         fields = ["code", "name", "branch", "semester"]
+
+
+class StudentImportRowForm(forms.Form):
+    """One CSV row of a bulk student import (see importers.py)."""
+    roll_no = forms.CharField(max_length=20)
+    name = forms.CharField(max_length=100)
+    father_name = forms.CharField(max_length=100, required=False)
+    mother_name = forms.CharField(max_length=100, required=False)
+    dob = forms.DateField(input_formats=["%d-%m-%Y", "%Y-%m-%d"], required=False)
+    year = forms.TypedChoiceField(choices=Student.YEAR_CHOICES, coerce=int)
+    semester = forms.TypedChoiceField(choices=Student.SEM_CHOICES, coerce=int)
+    branch = forms.CharField(max_length=100)
+    mobile = forms.CharField(max_length=15, required=False)
+    email = forms.EmailField(required=False)
+
+
+class StudentImportForm(forms.Form):
+    file = forms.FileField(
+        label="CSV file",
+        help_text="Columns: roll_no, name, father_name, mother_name, dob, year, semester, branch, mobile, email",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv"}),
+    )
+    enroll = forms.BooleanField(
+        required=False, initial=True, label="Enroll in the subjects of their branch and semester",
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+    create_branches = forms.BooleanField(
+        required=False, label="Create unknown branches",
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
@@ -0,0 +1,122 @@
+"""
+A student's own attendance history (``attendance_stu``).
+
+The list is keyset paginated, newest first, projecting just the subject
+code and name next to each row. The header numbers (total, last 7 days,
+per subject) come from a per-student summary kept in Django's cache; any
+attendance write or delete for that student drops it.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Attendance, Student
+from .pagination import keyset_page
+from .signals import attendance_recorded
+
+HISTORY_PAGE_SIZE = 20
+HISTORY_ORDERING = ("-timestamp", "-id")
+FILTERS = ("today", "week", "all")
+
+
+def history_queryset(student_id, filter_type, today):
+    attendance = Attendance.objects.filter(student_id=student_id)
+    if filter_type == "today":
+        attendance = attendance.filter(attendance_date=today)
+    elif filter_type == "week":
+        attendance = attendance.filter(attendance_date__gte=today - timedelta(days=7))
+    return attendance.annotate(
+        subject_code=F("qr_session__subject__code"),
+        subject_name=F("qr_session__subject__name"),
+    ).values("id", "timestamp", "subject_code", "subject_name")
+
+
+def history_page(student_id, filter_type, today, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """``(rows, next_cursor)``; raises ValueError on a bad cursor."""
+    return keyset_page(history_queryset(student_id, filter_type, today), HISTORY_ORDERING, cursor, limit)
+
+
+# 🗂️ Per-student summary cache
+
+def _summary_key(roll_no):
+    return f"qr:student:{roll_no}:summary"
+
+
+def _seconds_until_midnight():
+    now = timezone.localtime()
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), time.min))
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def build_summary(roll_no, today):
+    student = (
+        Student.objects.filter(roll_no=roll_no)
+        .values("id", "roll_no", "name", "semester", branch_name=F("branch__name"))
+        .first()
+    )
+    if student is None:
+        return None
+    week_start = today - timedelta(days=7)
+    subjects = list(
+        Attendance.objects.filter(student_id=student["id"])
+        .values(code=F("qr_session__subject__code"), name=F("qr_session__subject__name"))
+        .annotate(
+            total=Count("id"),
+            week=Count("id", filter=Q(attendance_date__gte=week_start)),
+            today=Count("id", filter=Q(attendance_date=today)),
+        )
+        .order_by("code")
+    )
+    return {
+        "student": student,
+        "date": today,
+        "total": sum(s["total"] for s in subjects),
+        "week": sum(s["week"] for s in subjects),
+        "today": sum(s["today"] for s in subjects),
+        "subjects": subjects,
+    }
+
+
+def student_summary(roll_no):
+    """Cached build_summary() for today; None for an unknown roll number."""
+    today = timezone.localdate()
+    key = _summary_key(roll_no)
+    summary = cache.get(key)
+    if summary is None or summary["date"] != today:
+        summary = build_summary(roll_no, today)
+        if summary is not None:
+            # "Last 7 days" moves at midnight, so the entry never outlives the day
+            cache.set(key, summary, timeout=_seconds_until_midnight())
+    return summary
+
+
+def invalidate_summary(roll_no):
+    cache.delete(_summary_key(roll_no))
+
+
+def invalidate_summaries(roll_nos):
+    cache.delete_many([_summary_key(r) for r in roll_nos])
+
+
+@receiver(attendance_recorded)
+def drop_summaries_on_write(sender, records, **kwargs):
+    roll_nos = {r.student.roll_no for r in records}
+    transaction.on_commit(lambda: invalidate_summaries(roll_nos))
+
+
+@receiver(post_delete, sender=Attendance)
+def drop_summary_on_delete(sender, instance, **kwargs):
+    roll_no = Student.objects.filter(id=instance.student_id).values_list("roll_no", flat=True).first()
+    if roll_no is not None:
+        transaction.on_commit(lambda: invalidate_summary(roll_no))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def drop_summary_on_student_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_summary(instance.roll_no))
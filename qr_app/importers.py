@@ -0,0 +1,167 @@
+"""
+Bulk student roster import from CSV.
+
+Rows are streamed from the file and handled in batches: each row is
+validated on its own (``StudentImportRowForm``, no queries), then a batch
+costs one lookup of the existing roll numbers, one ``bulk_create`` for new
+students, one ``bulk_update`` for changed ones and one insert into the
+``Student.subjects`` through table for the branch+semester enrollments.
+Bad rows are reported with their line number and never abort the batch.
+
+Each batch commits on its own. A batch the database rejects is rolled back
+and reported; a file that stops decoding ends the import there. Both show
+up as errors, with everything before them already saved. Bulk writes send
+no model signals, so every committed batch invalidates the caches itself.
+"""
+import csv
+from dataclasses import dataclass, field
+from functools import partial
+
+from django.db import DatabaseError, transaction
+
+from .analytics import bump_data_version
+from .catalog import bump_catalog_version
+from .forms import StudentImportRowForm
+from .history import invalidate_summaries
+from .models import Branch, Student, Subject
+from .roster import roster_cache
+
+IMPORT_BATCH_SIZE = 500
+UPDATE_FIELDS = ["name", "father_name", "mother_name", "dob", "year", "semester", "branch", "mobile", "email"]
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    enrolled: int = 0
+    errors: list = field(default_factory=list)  # (line, roll_no, message)
+
+    def error(self, line, roll_no, message):
+        self.errors.append((line, roll_no, message))
+
+
+class StudentImporter:
+
+    def __init__(self, enroll=True, create_branches=False, batch_size=IMPORT_BATCH_SIZE):
+        self.enroll = enroll
+        self.create_branches = create_branches
+        self.batch_size = batch_size
+        self.result = ImportResult()
+        self.branches = {b.name.casefold(): b for b in Branch.objects.all()}
+        self.subjects = {}
+        for subject_id, branch_id, semester in Subject.objects.values_list("id", "branch_id", "semester"):
+            self.subjects.setdefault((branch_id, semester), []).append(subject_id)
+
+    def run(self, lines):
+        """Import from an iterable of CSV text lines (header first)."""
+        reader = csv.DictReader(lines)
+        batch, seen = [], {}
+        try:
+            for row in reader:
+                self.result.rows += 1
+                line = reader.line_num
+                student = self._validate(line, row, seen)
+                if student is None:
+                    continue
+                batch.append((line, student))
+                if len(batch) >= self.batch_size:
+                    self._save(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # The text is decoded ahead in chunks: the bad bytes are on this line or soon after
+            self.result.error(reader.line_num + 1, "", f"Unreadable file, import stopped here ({exc})")
+        if batch:
+            self._save(batch)
+        return self.result
+
+    def _validate(self, line, row, seen):
+        data = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+        roll_no = data.get("roll_no", "")
+        form = StudentImportRowForm(data)
+        if not form.is_valid():
+            message = "; ".join(f"{name}: {' '.join(errs)}" for name, errs in form.errors.items())
+            self.result.error(line, roll_no, message)
+            return None
+        if roll_no in seen:
+            self.result.error(line, roll_no, f"Duplicate roll_no (first seen on line {seen[roll_no]})")
+            return None
+        seen[roll_no] = line
+
+        values = form.cleaned_data
+        branch = self._branch(values.pop("branch"))
+        if branch is None:
+            self.result.error(line, roll_no, "Unknown branch")
+            return None
+        for name in ("father_name", "mother_name", "mobile", "email"):
+            values[name] = values[name] or None  # blank cells are stored as NULL, like the form
+        return Student(branch=branch, **values)
+
+    def _branch(self, name):
+        branch = self.branches.get(name.casefold())
+        if branch is None and self.create_branches:
+            branch, _ = Branch.objects.get_or_create(name=name)
+            self.branches[name.casefold()] = branch
+        return branch
+
+    def _save(self, batch):
+        try:
+            with transaction.atomic():
+                created, updated, unchanged, enrolled = self._write({s.roll_no: s for _, s in batch})
+        except DatabaseError as exc:
+            first, last = batch[0][0], batch[-1][0]
+            self.result.error(first, "", f"Database error, lines {first}-{last} not saved ({exc})")
+            return
+        self.result.created += created
+        self.result.updated += updated
+        self.result.unchanged += unchanged
+        self.result.enrolled += enrolled
+
+    def _write(self, students):
+        existing = Student.objects.filter(roll_no__in=students).in_bulk(field_name="roll_no")
+
+        new, changed, unchanged = [], [], 0
+        for roll_no, student in students.items():
+            current = existing.get(roll_no)
+            if current is None:
+                new.append(student)
+            elif any(getattr(current, f) != getattr(student, f) for f in UPDATE_FIELDS):
+                student.pk = current.pk
+                changed.append(student)
+            else:
+                unchanged += 1
+        Student.objects.bulk_create(new, batch_size=self.batch_size)
+        Student.objects.bulk_update(changed, UPDATE_FIELDS, batch_size=self.batch_size)
+        enrolled = self._enroll(students) if self.enroll else 0
+        if new or changed or enrolled:
+            transaction.on_commit(partial(self._invalidate, [s.roll_no for s in changed]))
+        return len(new), len(changed), unchanged, enrolled
+
+    @staticmethod
+    def _invalidate(changed_roll_nos):
+        """What the Student/enrollment signal receivers would have done for this batch."""
+        invalidate_summaries(changed_roll_nos)
+        roster_cache.clear()  # rosters rebuild on their next use
+        bump_data_version()
+        bump_catalog_version()
+
+    def _enroll(self, students):
+        ids = list(Student.objects.filter(roll_no__in=students).values_list("roll_no", "id"))
+        Through = Student.subjects.through
+        links = [
+            Through(student_id=student_id, subject_id=subject_id)
+            for roll_no, student_id in ids
+            for subject_id in self.subjects.get((students[roll_no].branch_id, students[roll_no].semester), ())
+        ]
+        if not links:
+            return 0
+        enrolled = Through.objects.filter(student_id__in=[i for _, i in ids])
+        before = enrolled.count()
+        Through.objects.bulk_create(links, ignore_conflicts=True, batch_size=self.batch_size)
+        return enrolled.count() - before
+
+
+def import_students(lines, **options):
+    return StudentImporter(**options).run(lines)
@@ -0,0 +1,361 @@
+"""
+Write-behind ingestion for attendance scans.
+
+When a whole class scans the same QR within a minute, writing one
+``Attendance`` row per request makes SQLite serialise hundreds of tiny
+transactions. Accepted scans are queued in-process instead and a background
+flusher commits them in ``bulk_create(ignore_conflicts=True)`` batches; the
+``unique_together ('student', 'qr_session')`` constraint keeps retries and
+double submits harmless. Each flush sends ``signals.attendance_recorded``
+with the rows it created, which is how counters and caches stay in sync.
+
+Settings (all optional) live in ``settings.QR_INGEST``:
+
+* ``ASYNC`` - queue scans for the background flusher (``False`` writes inline)
+* ``BATCH_SIZE`` - max rows per flush
+* ``FLUSH_INTERVAL`` - seconds the flusher waits to fill a batch
+* ``MAX_QUEUE`` - queue bound; when full the scan is written inline
+* ``MAX_RETRIES`` - attempts per batch when the database is locked
+* ``MAX_FAILED`` - failed scans kept for inspection (``failed_pairs()``)
+
+A batch that is still locked after the retries goes back on the queue. A
+batch that fails for any other reason is written again row by row, so one
+bad pair (a student deleted since the scan, say) costs only itself; a row
+that fails alone is logged and kept in ``failed_pairs()``, never dropped
+silently.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Attendance, Student
+from .signals import attendance_recorded
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ASYNC": True,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 0.25,
+    "MAX_QUEUE": 10000,
+    "MAX_RETRIES": 5,
+    "MAX_FAILED": 1000,
+}
+
+# Window (seconds) used for the rows-per-second figure in stats()
+RATE_WINDOW = 60
+
+
+def ingest_setting(name):
+    return getattr(settings, "QR_INGEST", {}).get(name, DEFAULTS[name])
+
+
+def is_lock_error(exc):
+    """SQLite's "database is locked" / "database table is locked" (worth retrying)."""
+    return isinstance(exc, OperationalError) and "locked" in str(exc)
+
+
+def record_attendance(pairs):
+    """
+    Insert ``(student_id, session_id)`` pairs with one bulk_create and send
+    ``attendance_recorded`` for the rows that were actually new. Must run
+    inside a transaction; returns the list of created Attendance rows.
+    """
+    pairs = set(pairs)
+    student_ids = {s for s, _ in pairs}
+    session_ids = {q for _, q in pairs}
+
+    def existing():
+        return (
+            Attendance.objects
+            .filter(student_id__in=student_ids, qr_session_id__in=session_ids)
+            .select_related("student", "qr_session__subject")
+        )
+
+    already = {(a.student_id, a.qr_session_id) for a in existing().only("student_id", "qr_session_id")}
+    fresh = pairs - already
+    if not fresh:
+        return []
+    Attendance.objects.bulk_create(
+        [Attendance(student_id=s, qr_session_id=q) for s, q in fresh], ignore_conflicts=True
+    )
+    # SQLite returns no ids with ignore_conflicts, so read the new rows back.
+    created = [a for a in existing() if (a.student_id, a.qr_session_id) in fresh]
+    attendance_recorded.send(sender=Attendance, records=created)
+    return created
+
+
+# Per-roll outcomes of mark_roll_numbers()
+CREATED, DUPLICATE, UNKNOWN, NOT_ENROLLED = "created", "duplicate", "unknown", "not_enrolled"
+
+
+def mark_roll_numbers(session, roll_nos):
+    """
+    Mark many students present in ``session`` at once (kiosks, manual
+    marking). One query resolves the roll numbers and checks them against
+    the subject's roster, record_attendance() writes them in one batch.
+    Returns ``{roll_no: outcome}`` in the order given.
+    """
+    subject = session.subject
+    enrolled = Student.subjects.through.objects.filter(student=OuterRef("pk"), subject=subject)
+    rows = Student.objects.filter(roll_no__in=set(roll_nos)).values_list(
+        "roll_no", "id", "branch_id", "semester", Exists(enrolled)
+    )
+    # Same rule as roster.eligible_students(): enrolled, or same branch + semester
+    eligible, known = {}, set()
+    for roll_no, student_id, branch_id, semester, in_subject in rows:
+        known.add(roll_no)
+        if in_subject or (branch_id, semester) == (subject.branch_id, subject.semester):
+            eligible[roll_no] = student_id
+
+    with transaction.atomic():
+        created = record_attendance((student_id, session.id) for student_id in eligible.values())
+    created_ids = {a.student_id for a in created}
+
+    outcomes = {}
+    for roll_no in roll_nos:
+        if roll_no in outcomes:
+            continue
+        if roll_no not in known:
+            outcomes[roll_no] = UNKNOWN
+        elif roll_no not in eligible:
+            outcomes[roll_no] = NOT_ENROLLED
+        else:
+            outcomes[roll_no] = CREATED if eligible[roll_no] in created_ids else DUPLICATE
+    return outcomes
+
+
+class AttendanceIngestor:
+    """Queue of accepted scans plus the thread that flushes it to the DB."""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=ingest_setting("MAX_QUEUE"))
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._recent = deque()
+        self._failed = deque(maxlen=ingest_setting("MAX_FAILED"))
+        self._stats = {
+            "accepted": 0,
+            "batches": 0,
+            "rows_flushed": 0,
+            "rows_written": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "inline_writes": 0,
+            "lock_retries": 0,
+            "requeued_rows": 0,
+            "split_batches": 0,
+            "failed_rows": 0,
+        }
+
+    # ---- producer side (request threads) ----
+
+    def submit(self, student_id, session_id):
+        """
+        Accept one scan. Returns False when the same student/session pair is
+        already waiting to be written, True otherwise.
+        """
+        pair = (student_id, session_id)
+        with self._pending_lock:
+            if pair in self._pending:
+                return False
+            self._pending.add(pair)
+        with self._stats_lock:
+            self._stats["accepted"] += 1
+
+        if not ingest_setting("ASYNC"):
+            self._write([pair])
+            return True
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(pair)
+        except queue.Full:
+            # Backpressure: rather than dropping the scan, pay for the write here.
+            with self._stats_lock:
+                self._stats["inline_writes"] += 1
+            self._write([pair])
+        return True
+
+    def is_pending(self, student_id, session_id):
+        with self._pending_lock:
+            return (student_id, session_id) in self._pending
+
+    # ---- flusher side ----
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="attendance-ingest", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                batch = self._take_batch(ingest_setting("FLUSH_INTERVAL"))
+                if batch:
+                    self._write(batch)
+        finally:
+            connection.close()
+
+    def _take_batch(self, timeout):
+        batch_size = ingest_setting("BATCH_SIZE")
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        # Give the burst a moment to fill the batch, then drain what is there.
+        deadline = time.monotonic() + timeout
+        while len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, pairs):
+        retries = ingest_setting("MAX_RETRIES")
+        for attempt in range(retries + 1):
+            try:
+                with self._write_lock, transaction.atomic():
+                    return record_attendance(pairs)
+            except OperationalError as exc:
+                if attempt == retries or not is_lock_error(exc):
+                    raise
+                with self._stats_lock:
+                    self._stats["lock_retries"] += 1
+                time.sleep(0.05 * (2 ** attempt))
+
+    def _write(self, pairs):
+        started = time.perf_counter()
+        try:
+            created = self._commit(pairs)
+        except Exception as exc:
+            if is_lock_error(exc):
+                self._requeue(pairs, exc)
+            elif len(pairs) > 1:
+                logger.warning("Attendance flush of %d rows failed (%s); writing them one by one", len(pairs), exc)
+                with self._stats_lock:
+                    self._stats["split_batches"] += 1
+                for pair in pairs:
+                    self._write([pair])
+            else:
+                self._fail(pairs[0], exc)
+            return
+
+        with self._pending_lock:
+            self._pending.difference_update(pairs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._record_flush(len(pairs), len(created), elapsed_ms)
+        logger.debug("Flushed %d attendance rows in %.1f ms", len(pairs), elapsed_ms)
+
+    def _requeue(self, pairs, exc):
+        """Still locked after the retries: try again in a later flush (they stay pending)."""
+        if self._stop.is_set():  # shutting down; nobody would pick them up
+            for pair in pairs:
+                self._fail(pair, exc)
+            return
+        logger.warning("Database still locked; requeueing %d attendance rows", len(pairs))
+        self._ensure_started()
+        for index, pair in enumerate(pairs):
+            try:
+                self._queue.put_nowait(pair)
+            except queue.Full:
+                for rest in pairs[index:]:
+                    self._fail(rest, exc)
+                return
+            with self._stats_lock:
+                self._stats["requeued_rows"] += 1
+
+    def _fail(self, pair, exc):
+        logger.error("Attendance row student=%s session=%s could not be written: %r", pair[0], pair[1], exc)
+        with self._stats_lock:
+            self._stats["failed_rows"] += 1
+            self._failed.append((pair, repr(exc)))
+        with self._pending_lock:
+            self._pending.discard(pair)
+
+    def failed_pairs(self):
+        """``((student_id, session_id), error)`` of the most recent rows that could not be written."""
+        with self._stats_lock:
+            return list(self._failed)
+
+    def _record_flush(self, size, written, elapsed_ms):
+        now = time.monotonic()
+        with self._stats_lock:
+            s = self._stats
+            s["batches"] += 1
+            s["rows_written"] += written
+            s["rows_flushed"] += size
+            s["last_batch_size"] = size
+            s["max_batch_size"] = max(s["max_batch_size"], size)
+            s["last_flush_ms"] = elapsed_ms
+            s["max_flush_ms"] = max(s["max_flush_ms"], elapsed_ms)
+            s["total_flush_ms"] += elapsed_ms
+            self._recent.append((now, written))
+            while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+                self._recent.popleft()
+
+    def flush(self):
+        """Write everything queued so far, in the calling thread (rows requeued meanwhile wait)."""
+        batch_size = ingest_setting("BATCH_SIZE")
+        batch = []
+        for _ in range(self._queue.qsize()):
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the flusher and commit whatever is left in the queue."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+            recent_rows = sum(n for _, n in self._recent)
+        batches = s["batches"] or 1
+        s["queue_depth"] = self._queue.qsize()
+        with self._pending_lock:
+            s["pending"] = len(self._pending)
+        s["avg_batch_size"] = round(s["rows_flushed"] / batches, 2)
+        s["avg_flush_ms"] = round(s.pop("total_flush_ms") / batches, 2)
+        s["rows_per_second"] = round(recent_rows / RATE_WINDOW, 2)
+        s["last_flush_ms"] = round(s["last_flush_ms"], 2)
+        s["max_flush_ms"] = round(s["max_flush_ms"], 2)
+        return s
+
+
+ingestor = AttendanceIngestor()
+atexit.register(ingestor.shutdown)
@@ -0,0 +1,296 @@
+"""
+Live attendance feed over Server-Sent Events.
+
+Teacher pages used to poll the full record list of a session every few
+seconds. Instead, the writer publishes each newly committed attendance row
+to an in-process hub and ``event_stream`` pushes only those rows to the
+subscribers of that session, with heartbeats, ``Last-Event-ID`` resume and
+a clean close once the session expires. The same commit hook bumps a
+per-session version counter that the polling API uses as its ETag.
+
+The hub only sees rows written by this process. Rows from another worker,
+the bulk API in another process or the admin arrive through the shared
+version counter instead: every heartbeat compares it with the last one seen
+and re-reads the session's new rows when it moved.
+
+Django can only stream an async iterator under ASGI and a sync one under
+WSGI, so the stream comes in both flavours (``aevent_stream`` /
+``event_stream``) around the same cursor logic. A WSGI stream pins a worker
+thread, so it ends after WSGI_STREAM_SECONDS and the browser reconnects
+with ``Last-Event-ID``; the page falls back to polling the JSON API when
+the stream keeps failing.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_shared_version, shared_version
+from .models import Attendance
+from .signals import attendance_recorded
+
+# Sentinel queued when a subscriber fell behind; it re-reads from the DB.
+OVERFLOW = object()
+
+
+def live_setting(name, default):
+    return getattr(settings, "QR_LIVE", {}).get(name, default)
+
+
+class Subscription:
+    """Subscriber consumed by a worker thread (WSGI)."""
+
+    def __init__(self, session_id, maxsize):
+        self.session_id = session_id
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except (queue.Full, asyncio.QueueFull):
+            # Fell behind: drop the backlog and let the stream re-read the DB.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    def deliver(self, event):
+        self._put(event)
+
+
+class AsyncSubscription(Subscription):
+    """Subscriber consumed by a coroutine on an event loop (ASGI)."""
+
+    def __init__(self, session_id, maxsize):
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+
+class AttendanceHub:
+    """Per-session fan-out of attendance events to subscribers."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, session_id, asynchronous=False):
+        cls = AsyncSubscription if asynchronous else Subscription
+        sub = cls(session_id, live_setting("QUEUE_SIZE", 1000))
+        with self._lock:
+            self._subscribers[session_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.session_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.session_id]
+
+    def has_subscribers(self, session_id):
+        with self._lock:
+            return bool(self._subscribers.get(session_id))
+
+    def publish(self, session_id, events):
+        """Thread-safe: may be called from request threads or the flusher."""
+        with self._lock:
+            subs = list(self._subscribers.get(session_id, ()))
+        for sub in subs:
+            for event in events:
+                sub.deliver(event)
+        self.published += len(events)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._subscribers),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+            }
+
+
+hub = AttendanceHub()
+
+
+def attendance_event(attendance_id, roll_no, name, timestamp):
+    return {
+        "id": attendance_id,
+        "roll_no": roll_no,
+        "name": name,
+        "timestamp": timezone.localtime(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# 🔢 Per-session version counters
+#
+# Kept in the cache shared by every worker (see cache.shared_version).
+# Polling clients get it as an ETag and are answered 304 without touching
+# the Attendance table while it is unchanged.
+
+def _version_key(session_id):
+    return f"qr:session:{session_id}:version"
+
+
+def session_version(session_id):
+    return shared_version(_version_key(session_id))
+
+
+def bump_session_version(session_id):
+    bump_shared_version(_version_key(session_id))
+
+
+@receiver(attendance_recorded)
+def publish_recorded_attendance(sender, records, **kwargs):
+    by_session = defaultdict(list)
+    for r in records:
+        events = by_session[r.qr_session_id]
+        if hub.has_subscribers(r.qr_session_id):
+            events.append(attendance_event(r.id, r.student.roll_no, r.student.name, r.timestamp))
+    for session_id, events in by_session.items():
+        # Only announce rows once they are visible to other connections.
+        transaction.on_commit(lambda s=session_id, e=events: _announce(s, e))
+
+
+@receiver(post_delete, sender=Attendance)
+def announce_deleted_attendance(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_session_version(instance.qr_session_id))
+
+
+def _announce(session_id, events):
+    bump_session_version(session_id)
+    if events:
+        hub.publish(session_id, events)
+
+
+def _rows_after(session_id, last_id):
+    rows = (
+        Attendance.objects.filter(qr_session_id=session_id, id__gt=last_id)
+        .order_by("id")
+        .values_list("id", "student__roll_no", "student__name", "timestamp")
+    )
+    return [attendance_event(*row) for row in rows]
+
+
+_arows_after = sync_to_async(_rows_after)
+_asession_version = sync_to_async(session_version)
+
+HEARTBEAT = ": heartbeat\n\n"
+EXPIRED = "event: expired\ndata: {}\n\n"
+
+
+def _format(event):
+    return f"id: {event['id']}\nevent: attendance\ndata: {json.dumps(event)}\n\n"
+
+
+class _Cursor:
+    """What a stream has sent, so rows read from the DB are not sent twice."""
+
+    def __init__(self, last_id):
+        self.last_id = last_id
+        self.replayed_up_to = last_id
+
+    def backlog(self, events):
+        for event in events:
+            self.last_id = max(self.last_id, event["id"])
+        self.replayed_up_to = max(self.replayed_up_to, self.last_id)
+        return events
+
+    def live(self, event):
+        if event["id"] <= self.replayed_up_to:
+            return []
+        self.last_id = max(self.last_id, event["id"])
+        return [event]
+
+
+def _wait_seconds(session):
+    """Seconds to wait for the next event, or None once the session expired."""
+    remaining = (session.expires_at - timezone.now()).total_seconds()
+    if remaining <= 0:
+        return None
+    return min(live_setting("HEARTBEAT", 5), remaining)
+
+
+def event_stream(session, last_id=0):
+    """SSE lines for ``session`` (WSGI): backlog after ``last_id``, then live rows."""
+    sub = hub.subscribe(session.id)  # before the backlog read, so nothing slips between
+    cursor = _Cursor(last_id)
+    ends = time.monotonic() + live_setting("WSGI_STREAM_SECONDS", 60)
+    try:
+        version = session_version(session.id)
+        yield f"retry: {live_setting('RETRY_MS', 3000)}\n\n"
+        for event in cursor.backlog(_rows_after(session.id, cursor.last_id)):
+            yield _format(event)
+
+        while True:
+            timeout = _wait_seconds(session)
+            if timeout is None:
+                yield EXPIRED
+                return
+            if time.monotonic() >= ends:
+                return  # free the thread; the browser reconnects with Last-Event-ID
+            try:
+                event = sub.queue.get(timeout=timeout)
+            except queue.Empty:
+                # Rows committed by other processes only show in the shared version
+                current = session_version(session.id)
+                if current == version:
+                    yield HEARTBEAT
+                    continue
+                version = current
+                event = OVERFLOW
+            if event is OVERFLOW:
+                events = cursor.backlog(_rows_after(session.id, cursor.last_id))
+            else:
+                events = cursor.live(event)
+            for event in events:
+                yield _format(event)
+    finally:
+        hub.unsubscribe(sub)
+
+
+async def aevent_stream(session, last_id=0):
+    """Async twin of event_stream() for ASGI servers."""
+    sub = hub.subscribe(session.id, asynchronous=True)
+    cursor = _Cursor(last_id)
+    try:
+        version = await _asession_version(session.id)
+        yield f"retry: {live_setting('RETRY_MS', 3000)}\n\n"
+        for event in cursor.backlog(await _arows_after(session.id, cursor.last_id)):
+            yield _format(event)
+
+        while True:
+            timeout = _wait_seconds(session)
+            if timeout is None:
+                yield EXPIRED
+                return
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                current = await _asession_version(session.id)
+                if current == version:
+                    yield HEARTBEAT
+                    continue
+                version = current
+                event = OVERFLOW
+            if event is OVERFLOW:
+                events = cursor.backlog(await _arows_after(session.id, cursor.last_id))
+            else:
+                events = cursor.live(event)
+            for event in events:
+                yield _format(event)
+    finally:
+        hub.unsubscribe(sub)
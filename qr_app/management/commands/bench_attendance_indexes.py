@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from qr_app.management.scratch import scratch_database
+from qr_app.models import Attendance, QRSession, Student
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query plans and timings of the attendance reads with and without "
+        "their indexes (dropped in a scratch copy of the database), and of the "
+        "legacy timestamp__date filters they replaced."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per query when timing (default 20).")
+        parser.add_argument("--date", help="Day to query, YYYY-MM-DD (default: today).")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._bench(options)
+
+    def _bench(self, options):
+        day = timezone.datetime.fromisoformat(options["date"]).date() if options["date"] else timezone.localdate()
+        week_ago = day - timezone.timedelta(days=7)
+        student = Student.objects.order_by("id").first()
+        session = QRSession.objects.order_by("-id").first()
+        subject_id = getattr(session, "subject_id", 0)
+
+        # (title, legacy query or None, query the index serves)
+        cases = [
+            (
+                "Faculty sheet for a day",
+                Attendance.objects.filter(timestamp__date=day),
+                Attendance.objects.filter(attendance_date=day),
+            ),
+            (
+                "Subject sheet for a day",
+                Attendance.objects.filter(qr_session__subject_id=subject_id, timestamp__date=day),
+                Attendance.objects.filter(qr_session__subject_id=subject_id, attendance_date=day),
+            ),
+            (
+                "Student history, last 7 days",
+                Attendance.objects.filter(student=student, timestamp__date__gte=week_ago).order_by("-timestamp"),
+                Attendance.objects.filter(student=student, attendance_date__gte=week_ago).order_by("-timestamp"),
+            ),
+            (
+                "Live list of a session",
+                None,
+                Attendance.objects.filter(qr_session=session).order_by("-timestamp"),
+            ),
+        ]
+
+        repeat = options["repeat"]
+        runs = {title: [] for title, legacy, query in cases}
+        for title, legacy, query in cases:
+            if legacy is not None:
+                runs[title].append(("legacy", self._measure(legacy, repeat)))
+            runs[title].append(("indexed", self._measure(query, repeat)))
+        self._drop_indexes()
+        for title, legacy, query in cases:
+            runs[title].append(("no index", self._measure(query, repeat)))
+
+        self.stdout.write(f"Attendance rows: {Attendance.objects.count()}  day: {day}\n")
+        for title, results in runs.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            for label, (ms, plan) in results:
+                self.stdout.write(f"  {label:<8} {ms:8.2f} ms/query")
+                for line in plan.splitlines():
+                    self.stdout.write(f"           {line}")
+            self.stdout.write("")
+
+    def _drop_indexes(self):
+        """Same queries, same rows: only the Attendance indexes go (in the scratch copy)."""
+        with connection.schema_editor() as editor:
+            for index in Attendance._meta.indexes:
+                editor.remove_index(Attendance, index)
+
+    def _measure(self, queryset, repeat):
+        plan = queryset.explain()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.values_list("id", flat=True))
+        return (time.perf_counter() - started) * 1000 / max(repeat, 1), plan
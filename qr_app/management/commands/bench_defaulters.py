@@ -0,0 +1,149 @@
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from qr_app.analytics import DEFAULT_THRESHOLD, Scope, build_matrix, get_matrix, matrix_cache
+from qr_app.models import Attendance, Branch, QRSession, Student, Subject
+from qr_app.roster import eligible_students
+
+
+class Rollback(Exception):
+    pass
+
+
+def orm_defaulters(scope, threshold):
+    """Baseline: the same percentages from ORM aggregations, one roster query per subject."""
+    start, end = scope.bounds()
+    subjects = list(Subject.objects.filter(branch_id=scope.branch_id, semester=scope.semester))
+    sessions = QRSession.objects.filter(subject__in=subjects, created_at__gte=start, created_at__lt=end)
+    held_per_subject = dict(sessions.values_list("subject").annotate(n=Count("id")))
+    attended = {
+        (r["student"], r["qr_session__subject"]): r["n"]
+        for r in Attendance.objects.filter(qr_session__in=sessions)
+        .values("student", "qr_session__subject").annotate(n=Count("id"))
+    }
+
+    totals = defaultdict(lambda: [0, 0, False])
+    for subject in subjects:
+        held = held_per_subject.get(subject.id, 0)
+        for student_id in eligible_students(subject).values_list("id", flat=True):
+            got = attended.get((student_id, subject.id), 0)
+            row = totals[student_id]
+            row[0] += got
+            row[1] += held
+            row[2] |= bool(held) and got * 100.0 / held < threshold
+    return {
+        student_id for student_id, (got, held, below) in totals.items()
+        if below or (held and got * 100.0 / held < threshold)
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the bit-packed defaulter engine (cold and cached) against an "
+        "ORM-aggregation baseline, optionally on synthetic data that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--branch", type=int, help="Branch id (default: the first branch).")
+        parser.add_argument("--semester", type=int, default=1, help="Semester (default 1).")
+        parser.add_argument("--days", type=int, default=180, help="Date range ending today (default 180).")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (default 5).")
+        parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+        parser.add_argument("--seed-students", type=int, default=0,
+                            help="Benchmark on this many synthetic students (rolled back afterwards).")
+        parser.add_argument("--seed-sessions", type=int, default=300,
+                            help="Sessions per synthetic scope (default 300).")
+        parser.add_argument("--seed-subjects", type=int, default=6,
+                            help="Subjects per synthetic scope (default 6).")
+
+    def handle(self, *args, **options):
+        if not options["seed_students"]:
+            self._bench(options)
+            return
+        try:
+            with transaction.atomic():
+                options["branch"] = self._seed(options)
+                self._bench(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _seed(self, options):
+        branch = Branch.objects.create(name=f"BENCH-{uuid.uuid4().hex[:8]}")
+        subjects = [
+            Subject.objects.create(code=f"{branch.name}-{i}", name=f"Bench {i}", branch=branch,
+                                   semester=options["semester"])
+            for i in range(options["seed_subjects"])
+        ]
+        Student.objects.bulk_create([
+            Student(roll_no=f"{branch.name}-{i:05d}", name=f"Bench {i}", year=1,
+                    semester=options["semester"], branch=branch)
+            for i in range(options["seed_students"])
+        ], batch_size=1000)
+        student_ids = list(Student.objects.filter(branch=branch).values_list("id", flat=True))
+        expires = timezone.now() + timedelta(hours=1)
+        QRSession.objects.bulk_create([
+            QRSession(subject=subjects[i % len(subjects)], token=uuid.uuid4().hex, expires_at=expires)
+            for i in range(options["seed_sessions"])
+        ], batch_size=1000)
+        session_ids = QRSession.objects.filter(subject__branch=branch).values_list("id", flat=True)
+
+        # Each student has their own attendance rate between 50% and 100%
+        rate = {s: random.uniform(0.5, 1.0) for s in student_ids}
+        Attendance.objects.bulk_create(
+            (Attendance(student_id=s, qr_session_id=q)
+             for q in session_ids for s in student_ids if random.random() < rate[s]),
+            batch_size=5000,
+        )
+        self.stdout.write(f"Seeded {len(student_ids)} students, {len(session_ids)} sessions, "
+                          f"{Attendance.objects.filter(qr_session__subject__branch=branch).count()} attendance rows.")
+        return branch.id
+
+    def _bench(self, options):
+        branch_id = options["branch"] or Branch.objects.order_by("id").values_list("id", flat=True).first()
+        if branch_id is None:
+            raise CommandError("No branch to benchmark; pass --seed-students to use synthetic data.")
+        today = timezone.localdate()
+        scope = Scope(branch_id, options["semester"], today - timedelta(days=options["days"]), today)
+        threshold, repeat = options["threshold"], max(options["repeat"], 1)
+
+        def timed(fn):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                result = fn()
+            return (time.perf_counter() - started) * 1000 / repeat, result
+
+        def cold():
+            matrix_cache.clear()
+            return get_matrix(scope).defaulters(threshold)
+
+        build_ms, matrix = timed(lambda: build_matrix(scope))
+        cold_ms, engine = timed(cold)
+        warm_ms, _ = timed(lambda: get_matrix(scope).defaulters(threshold))
+        orm_ms, baseline = timed(lambda: orm_defaulters(scope, threshold))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Scope branch={branch_id} sem={options['semester']} {scope.date_from}..{scope.date_to}: "
+            f"{len(matrix)} students x {matrix.n_sessions} sessions, {matrix.nbytes()} bytes packed"
+        ))
+        self.stdout.write(f"  matrix build      {build_ms:9.2f} ms")
+        self.stdout.write(f"  engine (cold)     {cold_ms:9.2f} ms")
+        self.stdout.write(f"  engine (cached)   {warm_ms:9.2f} ms")
+        self.stdout.write(f"  ORM baseline      {orm_ms:9.2f} ms")
+
+        engine_ids = {row["student_id"] for row in engine}
+        if engine_ids == baseline:
+            self.stdout.write(self.style.SUCCESS(f"  {len(engine_ids)} defaulters, identical in both."))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"  Results differ: {len(engine_ids - baseline)} only in engine, "
+                f"{len(baseline - engine_ids)} only in baseline."
+            ))
@@ -0,0 +1,224 @@
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, router, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from qr_app.ingest import record_attendance
+from qr_app.management.commands.loadtest_scans import percentiles
+from qr_app.management.scratch import scratch_database
+from qr_app.models import Attendance, Branch, QRSession, Student, StudentSubjectStats, Subject
+from qr_app.replica import REPLICA, reading_from_replica
+from qr_app.stats import rebuild_stats
+from qr_app.summary import rebuild_summary
+
+PREFIX = "LOCKBENCH"
+STUDENTS = 1000
+
+# Environment that selects each profile in settings.py; a child process runs each one
+PROFILES = {
+    "stock": {},  # Django's defaults: rollback journal, 5 s timeout, deferred BEGIN
+    "production": {"QR_DB_PROFILE": "production"},
+}
+
+
+def is_locked(exc):
+    return "locked" in str(exc) or "busy" in str(exc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed read/write load on a scratch copy of the database under the stock "
+        "and the production connection profile (settings.py, including the "
+        "replica alias and router), counting 'database is locked' errors. Each "
+        "writer is its own process, like the web workers, and a locked write is "
+        "counted, not retried."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration per profile (default 5).")
+        parser.add_argument("--writers", type=int, default=8, help="Scan-writer processes (default 8).")
+        parser.add_argument("--readers", type=int, default=4, help="Dashboard-reader threads (default 4).")
+        parser.add_argument("--rows", type=int, default=100_000, help="Attendance rows to preload (default 100k).")
+        parser.add_argument("--batch", type=int, default=20, help="Rows per write transaction (default 20).")
+        parser.add_argument("--profile", choices=PROFILES,
+                            help="Run only this profile, in this process, and print the result as JSON.")
+
+    def handle(self, *args, **options):
+        if options["profile"]:
+            self._check_profile(options["profile"])
+            with scratch_database():
+                self._seed(options["rows"])
+                result = self._run(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = {name: self._child(name, options) for name in PROFILES}
+        self._print(results, options["seconds"])
+
+    def _child(self, name, options):
+        """settings.py picks the profile at import time, so each one gets its own process."""
+        env = {k: v for k, v in os.environ.items() if k != "QR_DB_PROFILE"}
+        env.update(PROFILES[name])
+        env.setdefault("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)
+        args = [f"--{key}={options[key]}" for key in ("seconds", "writers", "readers", "rows", "batch")]
+        done = subprocess.run(
+            [sys.executable, "-m", "django", "bench_sqlite_locks", f"--profile={name}", *args],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if done.returncode:
+            raise CommandError(f"{name} profile failed:\n{done.stderr}")
+        return json.loads(done.stdout.strip().splitlines()[-1])
+
+    def _check_profile(self, name):
+        if (REPLICA in connections) != (name == "production"):
+            raise CommandError(f"Settings do not match the {name} profile (QR_DB_PROFILE).")
+
+    # 🌱 Seed
+
+    def _seed(self, rows):
+        if REPLICA not in connections:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=DELETE")  # as a stock database would be
+        with transaction.atomic():
+            self._seed_rows(rows)
+
+    def _seed_rows(self, rows):
+        branch = Branch.objects.create(name=PREFIX)
+        subject = Subject.objects.create(code=f"{PREFIX}-101", name="Lock bench", branch=branch, semester=1)
+        students = Student.objects.bulk_create([
+            Student(roll_no=f"{PREFIX}{i:05d}", name=f"Bench {i}", dob=date(2004, 1, 1), year=1, semester=1,
+                    branch=branch)
+            for i in range(STUDENTS)
+        ])
+        expires = timezone.now() + timedelta(hours=1)
+        sessions = QRSession.objects.bulk_create([
+            QRSession(subject=subject, token=uuid.uuid4().hex, expires_at=expires)
+            for _ in range(max(1, rows // STUDENTS))
+        ])
+        Attendance.objects.bulk_create(
+            (Attendance(student=students[i % STUDENTS], qr_session=sessions[i // STUDENTS % len(sessions)])
+             for i in range(rows)),
+            batch_size=5000, ignore_conflicts=True,
+        )
+        rebuild_stats()
+        rebuild_summary()
+        self.subject = subject
+        self.student_ids = [s.id for s in students]
+
+    # 🚀 Run
+
+    def _run(self, options):
+        sessions = self._sessions(options)
+        connections.close_all()  # the writers are forked and open their own
+        deadline = time.perf_counter() + options["seconds"]
+        lock = threading.Lock()
+        result = {"writes": 0, "write_errors": 0, "reads": 0, "read_errors": 0, "write_ms": []}
+        context = multiprocessing.get_context("fork")
+        results = context.SimpleQueue()
+
+        def writer(session_ids):
+            # One web worker flushing its scan queue: in one transaction, read
+            # which rows exist, then insert the rest. No retry on "locked".
+            done = {"writes": 0, "write_errors": 0, "write_ms": []}
+            try:
+                for session_id in session_ids:
+                    if time.perf_counter() >= deadline:
+                        break
+                    students = random.sample(self.student_ids, options["batch"])
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            record_attendance([(s, session_id) for s in students])
+                    except OperationalError as exc:
+                        if not is_locked(exc):
+                            raise
+                        done["write_errors"] += 1
+                        continue
+                    done["writes"] += 1
+                    done["write_ms"].append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+                results.put(done)
+
+        def reader():
+            while time.perf_counter() < deadline:
+                try:
+                    # A report page (@replica_reads): several queries that should see one snapshot
+                    with reading_from_replica(), transaction.atomic(using=router.db_for_read(Attendance)):
+                        list(Attendance.objects.values("qr_session").annotate(n=Count("id")))
+                        list(StudentSubjectStats.objects.filter(subject=self.subject)
+                             .values("student").annotate(attended=Sum("attended"), held=Sum("held")))
+                except OperationalError as exc:
+                    if not is_locked(exc):
+                        raise
+                    with lock:
+                        result["read_errors"] += 1
+                    continue
+                with lock:
+                    result["reads"] += 1
+
+        def thread(target):
+            def run():
+                try:
+                    target()
+                finally:
+                    connections.close_all()  # this thread's connections
+            return threading.Thread(target=run)
+
+        writers = [context.Process(target=writer, args=(ids,), daemon=True) for ids in sessions]
+        for p in writers:
+            p.start()
+        threads = [thread(reader) for _ in range(options["readers"])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for _ in writers:
+            done = results.get()
+            result["writes"] += done["writes"]
+            result["write_errors"] += done["write_errors"]
+            result["write_ms"] += done["write_ms"]
+        for p in writers:
+            p.join()
+        with reading_from_replica():
+            result["read_alias"] = router.db_for_read(Attendance) or "default"
+        return result
+
+    def _sessions(self, options):
+        """
+        A fresh session per write, made up front so that every write inserts
+        a full batch; one list per writer process.
+        """
+        expires = timezone.now() + timedelta(hours=1)
+        count = options["writers"] * max(1000, int(options["seconds"] * 1000))
+        created = QRSession.objects.bulk_create(
+            QRSession(subject=self.subject, token=uuid.uuid4().hex, expires_at=expires) for _ in range(count)
+        )
+        ids = [s.id for s in created]
+        return [ids[i::options["writers"]] for i in range(options["writers"])]
+
+    def _print(self, results, seconds):
+        rows = [
+            ("reads on", lambda r: r["read_alias"]),
+            ("write txns", lambda r: f"{r['writes']} ({r['writes'] / seconds:.0f}/s)"),
+            ("write locked", lambda r: r["write_errors"]),
+            ("read pages", lambda r: f"{r['reads']} ({r['reads'] / seconds:.0f}/s)"),
+            ("read locked", lambda r: r["read_errors"]),
+        ]
+        for q in ("p50", "p95", "p99"):
+            rows.append((f"write {q} ms", lambda r, q=q: f"{(percentiles(r['write_ms']) or {q: 0})[q]:.1f}"))
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{'':14}" + "".join(f"{name:>18}" for name in results)))
+        for label, value in rows:
+            self.stdout.write(f"{label:14}" + "".join(f"{value(r)!s:>18}" for r in results.values()))
@@ -0,0 +1,116 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from qr_app.management.commands.loadtest_scans import percentiles
+
+# Libraries that only the QR, PDF, XLSX and analytics paths should load
+HEAVY = ("numpy", "reportlab", "qrcode", "openpyxl", "PIL")
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+# Run in a fresh interpreter: boot Django the way a WSGI worker does, serve one request
+WORKER = """
+import json, os, sys, time
+from django.core.wsgi import get_wsgi_application
+app = get_wsgi_application()
+booted = time.perf_counter()
+status = []
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": sys.argv[1], "QUERY_STRING": "",
+    "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+    "wsgi.url_scheme": "http", "wsgi.input": __import__("io").BytesIO(), "wsgi.errors": sys.stderr,
+}
+body = b"".join(app(environ, lambda s, h, *a: status.append(s)))
+served = time.perf_counter()
+print(json.dumps({
+    "status": status[0], "boot": booted, "served": served,
+    "heavy": sorted(m for m in %r if m in sys.modules),
+}))
+""" % (HEAVY,)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker cold start: -X importtime totals for booting Django and "
+        "time from process start to the first served request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/", help="URL of the first request (default /).")
+        parser.add_argument("--repeat", type=int, default=5, help="Worker starts to time (default 5).")
+        parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list (default 10).")
+        parser.add_argument("--output", help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)  # manage.py has set DJANGO_SETTINGS_MODULE
+        cwd = str(settings.BASE_DIR)
+
+        imports = self._importtime(env, cwd, options["path"])
+        runs = [self._first_request(env, cwd, options["path"]) for _ in range(max(options["repeat"], 1))]
+
+        boot = [r["boot_ms"] for r in runs]
+        first = [r["first_request_ms"] for r in runs]
+        result = {
+            "import_total_ms": imports["total_ms"],
+            "modules": imports["modules"],
+            "slowest": imports["top"][:options["top"]],
+            "boot_ms": percentiles(boot) | {"median": round(statistics.median(boot), 2)},
+            "first_request_ms": percentiles(first) | {"median": round(statistics.median(first), 2)},
+            "status": runs[-1]["status"],
+            "heavy_loaded": runs[-1]["heavy"],
+        }
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Imports (python -X importtime)"))
+        self.stdout.write(f"  {result['modules']} modules, {result['import_total_ms']:.1f} ms cumulative")
+        for name, ms in result["slowest"]:
+            self.stdout.write(f"  {ms:8.1f} ms  {name}")
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Worker cold start, {len(runs)} runs, GET {options['path']}"))
+        self.stdout.write(f"  process start -> app ready   median {result['boot_ms']['median']:.1f} ms")
+        self.stdout.write(f"  process start -> first resp  median {result['first_request_ms']['median']:.1f} ms"
+                          f"  ({result['status']})")
+        self.stdout.write(f"  heavy libraries loaded: {', '.join(result['heavy_loaded']) or 'none'}")
+        if options["output"]:
+            with open(options["output"], "w") as fp:
+                json.dump(result, fp, indent=2)
+
+    def _importtime(self, env, cwd, path):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", WORKER, path],
+            env=env, cwd=cwd, capture_output=True, text=True, check=True,
+        )
+        top, total_us, modules = [], 0, 0
+        for line in proc.stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, indent, name = match.groups()
+            modules += 1
+            total_us += int(self_us)
+            if len(indent) == 1:  # top-level import: cumulative includes its children
+                top.append((name, int(cumulative_us) / 1000))
+        top.sort(key=lambda item: item[1], reverse=True)
+        return {"total_ms": total_us / 1000, "modules": modules, "top": top}
+
+    def _first_request(self, env, cwd, path):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", WORKER, path], env=env, cwd=cwd, capture_output=True, text=True, check=True,
+        )
+        done = time.perf_counter()
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        # The child's perf_counter shares the clock (CLOCK_MONOTONIC) with ours
+        return {
+            "boot_ms": (report["boot"] - started) * 1000,
+            "first_request_ms": (report["served"] - started) * 1000,
+            "total_ms": (done - started) * 1000,
+            "status": report["status"],
+            "heavy": report["heavy"],
+        }
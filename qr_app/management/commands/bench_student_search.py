@@ -0,0 +1,93 @@
+import random
+import string
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from qr_app.management.commands.loadtest_scans import percentiles
+from qr_app.models import Branch, Student
+from qr_app.search import fts_available, search_setting, search_students
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Sneha", "Vikram", "Ananya", "Rohan", "Kavya", "Arjun", "Meera",
+               "Karan", "Divya", "Siddharth", "Pooja", "Aditya", "Neha", "Manish", "Ritika", "Varun", "Isha"]
+LAST_NAMES = ["Sharma", "Verma", "Patel", "Singh", "Gupta", "Reddy", "Iyer", "Nair", "Khan", "Das",
+              "Joshi", "Mehta", "Rao", "Bose", "Kulkarni", "Chopra", "Malhotra", "Pillai", "Sinha", "Yadav"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time autocomplete-style student searches on the FTS5 index against the "
+        "old icontains filter, optionally on synthetic students that are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed-students", type=int, default=0,
+                            help="Benchmark on this many synthetic students (rolled back afterwards).")
+        parser.add_argument("--queries", type=int, default=200, help="Searches per method (default 200).")
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("No FTS5 student index on this database (SQLite with migration 0005 required).")
+        if not options["seed_students"]:
+            self._bench(options)
+            return
+        try:
+            with transaction.atomic():
+                self._seed(options["seed_students"])
+                self._bench(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _seed(self, count):
+        branch = Branch.objects.create(name=f"BENCH-{uuid.uuid4().hex[:8]}")
+        Student.objects.bulk_create([
+            Student(roll_no=f"B{i:06d}", name=f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+                    year=1, semester=1, branch=branch)
+            for i in range(count)
+        ], batch_size=2000)
+        self.stdout.write(f"Seeded {count} students.")
+
+    def _bench(self, options):
+        rolls = list(Student.objects.values_list("roll_no", flat=True)[:5000])
+        names = list(Student.objects.values_list("name", flat=True)[:5000])
+        if not rolls:
+            raise CommandError("No students to search; pass --seed-students.")
+        # What a user types: the first few characters of a roll number or a name, or a miss
+        queries = [
+            ("roll", random.choice(rolls)[:random.randint(3, 6)]) if random.random() < 0.5
+            else ("name", random.choice(names)[:random.randint(2, 5)])
+            for _ in range(options["queries"])
+        ] + [("miss", "".join(random.choices(string.ascii_lowercase, k=4))) for _ in range(10)]
+        limit = search_setting("AUTOCOMPLETE_LIMIT")
+
+        def fts(query):
+            return search_students(query, limit)
+
+        def like(query):
+            return list(Student.objects.filter(Q(roll_no__icontains=query) | Q(name__icontains=query))
+                        .order_by("roll_no")[:limit])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{Student.objects.count()} students, {len(queries)} queries, limit {limit}"
+        ))
+        for label, search in (("FTS5 prefix", fts), ("icontains", like)):
+            timings = {"all": [], "roll": [], "name": [], "miss": []}
+            for kind, query in queries:
+                started = time.perf_counter()
+                search(query)
+                ms = (time.perf_counter() - started) * 1000
+                timings["all"].append(ms)
+                timings[kind].append(ms)
+            # icontains stops early on common prefixes but scans the table on a miss
+            for kind, samples in timings.items():
+                p = percentiles(samples)
+                self.stdout.write(f"  {label:<12} {kind:<5} p50 {p['p50']:7.2f} ms  p95 {p['p95']:7.2f} ms  "
+                                  f"p99 {p['p99']:7.2f} ms  max {p['max']:7.2f} ms")
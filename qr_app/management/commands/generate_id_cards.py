@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from qr_app.idcards import FORMATS, generate_id_cards
+from qr_app.models import Student
+
+
+class Command(BaseCommand):
+    help = (
+        "Render QR ID cards for a filtered set of students on a process pool, "
+        "as a PDF sheet or a ZIP of PNG/SVG files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write (.pdf or .zip).")
+        parser.add_argument("--format", choices=FORMATS, help="Default: pdf, or png for a .zip output.")
+        parser.add_argument("--branch", type=int, help="Branch id.")
+        parser.add_argument("--semester", type=int)
+        parser.add_argument("--year", type=int)
+        parser.add_argument("--workers", type=int, help="Render processes (default: QR_ID_CARDS or CPU count).")
+        parser.add_argument("--chunk-size", type=int, help="Students per worker task.")
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        for field in ("branch", "semester", "year"):
+            if options[field] is not None:
+                students = students.filter(**{f"{field}_id" if field == "branch" else field: options[field]})
+        if not students.exists():
+            raise CommandError("No students match the filters.")
+
+        fmt = options["format"] or ("png" if options["output"].endswith(".zip") else "pdf")
+        batch = generate_id_cards(
+            students, options["output"], fmt=fmt, workers=options["workers"], chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {batch.cards} {fmt} cards to {options['output']} in {batch.seconds:.2f} s "
+            f"({batch.cards_per_second:.0f} cards/s, {batch.workers} workers)"
+        ))
+        if batch.peak_rss_kb is not None:
+            self.stdout.write(f"Peak memory: {batch.peak_rss_kb / 1024:.1f} MB parent, "
+                              f"{batch.peak_worker_rss_kb / 1024:.1f} MB largest worker")
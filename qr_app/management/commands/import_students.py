@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from qr_app.importers import IMPORT_BATCH_SIZE, import_students
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import students from a CSV file (roll_no, name, father_name, mother_name, "
+        "dob, year, semester, branch, mobile, email), upserting on roll_no and enrolling "
+        "them in the subjects of their branch and semester."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import.")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                            help=f"Rows per batch (default {IMPORT_BATCH_SIZE}).")
+        parser.add_argument("--no-enroll", action="store_true", help="Do not enroll students in subjects.")
+        parser.add_argument("--create-branches", action="store_true", help="Create branches that do not exist.")
+
+    def handle(self, *args, **options):
+        try:
+            fh = open(options["path"], newline="", encoding="utf-8-sig")
+        except OSError as exc:
+            raise CommandError(exc)
+        with fh:
+            result = import_students(
+                fh,
+                enroll=not options["no_enroll"],
+                create_branches=options["create_branches"],
+                batch_size=max(options["batch_size"], 1),
+            )
+
+        for line, roll_no, message in result.errors:
+            self.stderr.write(f"line {line} [{roll_no or '-'}]: {message}")
+        style = self.style.WARNING if result.errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{result.rows} rows: {result.created} created, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {result.enrolled} enrollments added, {len(result.errors)} errors."
+        ))
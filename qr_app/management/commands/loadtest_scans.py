@@ -0,0 +1,283 @@
+import http.cookiejar
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from qr_app.admission import admission
+from qr_app.ingest import ingestor
+from qr_app.management.scratch import scratch_database
+from qr_app.models import Attendance, Branch, QRSession, Student, Subject
+from qr_app.tokens import make_token, signed_tokens_enabled
+
+PREFIX = "LOADTEST"
+DOB = date(2004, 1, 1)
+CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 2)
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99), "max": round(ordered[-1], 2)}
+
+
+def classify(status, body):
+    if status == 503:
+        return "busy"
+    if status >= 500:
+        return "server_error"
+    if "Attendance Marked Successfully" in body:
+        return "ok"
+    if "already marked" in body:
+        return "duplicate"
+    return "rejected"
+
+
+class InProcessClient:
+    """One scan flow through the WSGI app, as a phone with its own address."""
+
+    def __init__(self, address):
+        self.client = Client(REMOTE_ADDR=address, raise_request_exception=True)
+
+    def get(self, path):
+        return self._result(self.client.get(path))
+
+    def post(self, path, data):
+        return self._result(self.client.post(path, data))
+
+    def _result(self, response):
+        return response.status_code, response.content.decode(), response.get("Retry-After")
+
+
+class HTTPClient:
+    """One scan flow against a running server (cookies and CSRF included)."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.csrf = ""
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, body, headers = response.status, response.read().decode(), response.headers
+        except urllib.error.HTTPError as exc:
+            status, body, headers = exc.code, exc.read().decode(errors="replace"), exc.headers
+        match = CSRF_RE.search(body)
+        if match:
+            self.csrf = match.group(1)
+        return status, body, headers.get("Retry-After")
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        data = dict(data, csrfmiddlewaretoken=self.csrf)
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=urllib.parse.urlencode(data).encode(),
+            headers={"Referer": self.base_url + path},
+        )
+        return self._open(request)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the scan path: seed a session and roster, fire concurrent "
+        "GET + POST + confirm flows and report throughput, latency percentiles, "
+        "lock errors and duplicate rejections. Runs on a scratch copy of the "
+        "database unless --in-place is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=300, help="Students in the seeded roster (default 300).")
+        parser.add_argument("--ramp", type=float, default=30, help="Seconds over which scans start (default 30).")
+        parser.add_argument("--workers", type=int, default=64, help="Concurrent clients (default 64).")
+        parser.add_argument("--resubmit", type=float, default=0.05,
+                            help="Fraction of students that submit twice (default 0.05).")
+        parser.add_argument("--retries", type=int, default=3, help="Retries after a 503 busy answer (default 3).")
+        parser.add_argument("--url", help="Base URL of a running server sharing this database (needs "
+                                          "--in-place); default drives the WSGI app in-process.")
+        parser.add_argument("--timeout", type=float, default=30, help="HTTP timeout with --url (default 30).")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded data (with --in-place).")
+        parser.add_argument("--in-place", action="store_true",
+                            help=f"Seed into the configured database itself and delete every branch and "
+                                 f"student named {PREFIX}* from it afterwards.")
+
+    def handle(self, *args, **options):
+        if options["students"] < 1 or options["workers"] < 1:
+            raise CommandError("--students and --workers must be positive")
+        if options["url"] and not options["in_place"]:
+            raise CommandError("--url seeds the database the server uses: pass --in-place to confirm.")
+
+        with nullcontext() if options["in_place"] else scratch_database():
+            self._cleanup()
+            session, students = self._seed(options["students"])
+            try:
+                results = self._run(session, students, options)
+                self._flush(results, options)
+                results.update(self._verify(session, len(students)))
+            finally:
+                if not options["keep"]:
+                    self._cleanup()
+
+        self._report(results)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    # 🌱 Seed / cleanup
+
+    @transaction.atomic
+    def _seed(self, count):
+        branch = Branch.objects.create(name=PREFIX)
+        subject = Subject.objects.create(code=f"{PREFIX}-101", name="Load test", branch=branch, semester=1)
+        Student.objects.bulk_create([
+            Student(roll_no=f"{PREFIX}{i:05d}", name=f"Load {i}", dob=DOB, year=1, semester=1, branch=branch)
+            for i in range(count)
+        ])
+        students = list(Student.objects.filter(branch=branch).order_by("roll_no"))
+        subject.student_set.add(*students)
+        session = QRSession.objects.create(
+            subject=subject, token=uuid.uuid4().hex, expires_at=timezone.now() + timedelta(minutes=30)
+        )
+        return session, students
+
+    def _cleanup(self):
+        Student.objects.filter(roll_no__startswith=PREFIX).delete()
+        Branch.objects.filter(name=PREFIX).delete()
+
+    # 🚀 Run
+
+    def _run(self, session, students, options):
+        flows = [(s, False) for s in students]
+        flows += [(s, True) for s in random.sample(students, int(len(students) * options["resubmit"]))]
+        random.shuffle(flows)
+        spacing = options["ramp"] / len(flows)
+
+        latencies = {"get": [], "post": [], "confirm": [], "flow": []}
+        outcomes = Counter()
+        lock = threading.Lock()
+        admission.reset()
+        started = time.perf_counter()
+
+        def flow(index, student, resubmit):
+            delay = started + index * spacing - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            token = make_token(session) if signed_tokens_enabled() else session.token
+            path = reverse("attendance_form", args=[token])
+            if options["url"]:
+                client = HTTPClient(options["url"], options["timeout"])
+            else:
+                client = InProcessClient(f"10.{index // 250 % 250}.{index % 250}.{1 + index // 62500}")
+            form = {"roll_no": student.roll_no, "dob": DOB.isoformat()}
+            timings, outcome = {}, None
+            flow_started = time.perf_counter()
+            try:
+                for step, data in (("get", None), ("post", form), ("confirm", dict(form, confirm="yes"))):
+                    for attempt in range(options["retries"] + 1):
+                        t0 = time.perf_counter()
+                        status, body, retry_after = client.get(path) if data is None else client.post(path, data)
+                        timings[step] = (time.perf_counter() - t0) * 1000
+                        if status != 503 or attempt == options["retries"]:
+                            break
+                        with lock:
+                            outcomes["busy_retries"] += 1
+                        time.sleep(float(retry_after or 1))
+                    if status != 200 or step == "confirm":
+                        outcome = classify(status, body)
+                        break
+                    if step == "post" and "Confirm Present" not in body:
+                        outcome = classify(status, body)
+                        break
+            except OperationalError as exc:
+                outcome = "lock_error" if "locked" in str(exc) else "server_error"
+            except Exception:
+                outcome = "server_error"
+            with lock:
+                outcomes["resubmit_" + outcome if resubmit else outcome] += 1
+                for step, ms in timings.items():
+                    latencies[step].append(ms)
+                latencies["flow"].append((time.perf_counter() - flow_started) * 1000)
+
+        # Every 503 would otherwise be logged by django.request
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                for index, (student, resubmit) in enumerate(flows):
+                    pool.submit(flow, index, student, resubmit)
+        finally:
+            request_logger.setLevel(level)
+        wall = time.perf_counter() - started
+
+        return {
+            "config": {k: options[k] for k in ("students", "ramp", "workers", "resubmit", "retries", "url",
+                                               "in_place")},
+            "started_at": timezone.now().isoformat(),
+            "flows": len(flows),
+            "wall_seconds": round(wall, 3),
+            "throughput_flows_per_s": round(len(flows) / wall, 2),
+            "latency_ms": {step: percentiles(samples) for step, samples in latencies.items()},
+            "outcomes": dict(outcomes),
+            "lock_errors": outcomes["lock_error"] + outcomes["resubmit_lock_error"],
+            "duplicate_rejections": outcomes["duplicate"] + outcomes["resubmit_duplicate"],
+        }
+
+    def _flush(self, results, options):
+        """In-process runs: drain the write-behind queue and keep the server-side counters."""
+        if not options["url"]:
+            ingestor.shutdown()  # also waits for a batch the flusher is writing
+            results["server"] = {"ingest": ingestor.stats(), "admission": admission.stats()}
+
+    def _verify(self, session, expected):
+        rows = Attendance.objects.filter(qr_session=session)
+        doubled = rows.values("student").annotate(n=Count("id")).filter(n__gt=1).count()
+        return {"recorded_rows": rows.count(), "expected_rows": expected, "duplicate_rows": doubled}
+
+    def _report(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{results['flows']} flows in {results['wall_seconds']} s "
+            f"({results['throughput_flows_per_s']} flows/s)"
+        ))
+        for step, stats in results["latency_ms"].items():
+            if stats:
+                self.stdout.write(
+                    f"  {step:<8} p50 {stats['p50']:8.2f}  p95 {stats['p95']:8.2f}  "
+                    f"p99 {stats['p99']:8.2f}  max {stats['max']:8.2f} ms"
+                )
+        self.stdout.write(f"  outcomes       {results['outcomes']}")
+        self.stdout.write(f"  lock errors    {results['lock_errors']}")
+        self.stdout.write(f"  duplicates     {results['duplicate_rejections']} rejected, "
+                          f"{results['duplicate_rows']} duplicate rows")
+        style = self.style.SUCCESS if results["recorded_rows"] == results["expected_rows"] else self.style.ERROR
+        self.stdout.write(style(f"  recorded       {results['recorded_rows']} / {results['expected_rows']}"))
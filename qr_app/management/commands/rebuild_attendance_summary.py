@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from qr_app.summary import find_drift, rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily attendance summary from the Attendance table, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report counters that disagree with the Attendance table; exit non-zero on drift.",
+        )
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+        for (day, subject_id, branch_id), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(
+                f"{day} subject={subject_id} branch={branch_id}: stored {stored}, expected {expected}"
+            )
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{len(drift)} summary counter(s) drifted")
+            self.stdout.write(self.style.SUCCESS("Summary is consistent."))
+            return
+
+        rows = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} summary row(s); fixed {len(drift)} drifted."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from qr_app.search import check_index, fts_available, missing_triggers, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 student search index from the student table (or just check it)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only run the index integrity check.")
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("No FTS5 student index on this database (SQLite with migration 0005 required).")
+        missing = missing_triggers()
+        if missing:
+            raise CommandError(f"Search index triggers missing: {', '.join(missing)}. "
+                               f"Create them again as in migration 0005 before rebuilding.")
+        if options["check"]:
+            try:
+                check_index()
+            except DatabaseError as exc:
+                raise CommandError(f"Search index is out of sync: {exc}. Run without --check to rebuild.")
+            self.stdout.write(self.style.SUCCESS("Search index matches the student table."))
+            return
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} students."))
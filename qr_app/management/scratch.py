@@ -0,0 +1,55 @@
+"""
+Throwaway copies of the SQLite database for the load tests and benchmarks.
+
+``scratch_database()`` backs the ``default`` database up into a temporary
+file and points every alias on that file (``default``, and ``replica`` under
+the production profile) at the copy until the block exits. Connections
+opened meanwhile, in any thread, see the copy, so a command can seed rows,
+drop indexes or hammer the write lock without touching db.sqlite3.
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+from django.db import connections
+
+
+def _aliases_on(name):
+    return [
+        alias for alias in connections
+        if connections.settings[alias]["ENGINE"] == "django.db.backends.sqlite3"
+        and str(connections.settings[alias]["NAME"]) == name
+    ]
+
+
+@contextmanager
+def scratch_database():
+    """Run the block against a temporary copy of the default SQLite database."""
+    source = connections.settings["default"]
+    if source["ENGINE"] != "django.db.backends.sqlite3":
+        raise CommandError("A scratch copy needs the SQLite backend.")
+    name = str(source["NAME"])
+    names = {alias: connections.settings[alias]["NAME"] for alias in _aliases_on(name)}
+    with tempfile.TemporaryDirectory(prefix="qr-scratch-") as tmp:
+        path = os.path.join(tmp, "db.sqlite3")
+        try:
+            src = sqlite3.connect(f"file:{name}?mode=ro", uri=True)
+        except sqlite3.OperationalError as exc:
+            raise CommandError(f"Cannot open {name}: {exc}")
+        dst = sqlite3.connect(path)
+        try:
+            src.backup(dst)  # a consistent snapshot, WAL included
+        finally:
+            src.close()
+            dst.close()
+        connections.close_all()
+        for alias in names:
+            connections.settings[alias]["NAME"] = path
+        try:
+            yield path
+        finally:
+            connections.close_all()
+            for alias, original in names.items():
+                connections.settings[alias]["NAME"] = original
@@ -0,0 +1,166 @@
+"""
+The NumPy side of analytics.py: bit-packed attendance matrices.
+
+For a scope the (student x QR session) presence matrix is loaded from a
+single ``values_list`` scan of Attendance, next to a "held" matrix saying
+which sessions each student was expected at (enrolled in the subject, or
+same branch + semester). Both are stored with ``np.packbits`` - one bit
+per cell, so 3,000 students x 600 sessions take about 450 KB for the pair.
+
+Percentages are popcounts of ``present & column mask`` per subject,
+defaulters a threshold on those, and absence streaks a vectorised
+reset-cumsum over the unpacked rows. Only analytics.get_matrix() imports
+this module, so workers that never open the defaulter page never load NumPy.
+"""
+from itertools import chain
+
+import numpy as np
+from django.db.models import Q
+
+from .analytics import DEFAULT_THRESHOLD
+from .models import Attendance, QRSession, Student, Subject
+
+# Set bits per byte value, for popcounts over packed rows
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class AttendanceMatrix:
+    """Packed presence/held bits for one scope; rows are students, columns sessions."""
+
+    def __init__(self, students, sessions, subjects, present, held):
+        self.students = students          # [(id, roll_no, name)], row order
+        self.session_ids = np.array([s[0] for s in sessions], dtype=np.int64)
+        self.session_subjects = np.array([s[1] for s in sessions], dtype=np.int64)
+        self.subjects = subjects          # [(id, code, name)]
+        self.n_sessions = len(sessions)
+        self.present = np.packbits(present, axis=1)
+        self.held = np.packbits(held, axis=1)
+
+    def __len__(self):
+        return len(self.students)
+
+    def nbytes(self):
+        return self.present.nbytes + self.held.nbytes
+
+    def _column_mask(self, subject_id):
+        return np.packbits(self.session_subjects == subject_id)
+
+    def _popcount(self, packed, mask=None):
+        if mask is not None:
+            packed = packed & mask
+        return POPCOUNT[packed].sum(axis=1, dtype=np.int64)
+
+    def subject_counts(self):
+        """``(attended, held)``: students x subjects count arrays."""
+        n, s = len(self.students), len(self.subjects)
+        attended = np.zeros((n, s), dtype=np.int64)
+        held = np.zeros((n, s), dtype=np.int64)
+        for j, (subject_id, _, _) in enumerate(self.subjects):
+            mask = self._column_mask(subject_id)
+            attended[:, j] = self._popcount(self.present, mask)
+            held[:, j] = self._popcount(self.held, mask)
+        return attended, held
+
+    def rates(self):
+        """``(attended, held, per_subject %, overall %)``; NaN where nothing was held."""
+        attended, held = self.subject_counts()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            per_subject = attended * 100.0 / held
+            overall = attended.sum(axis=1) * 100.0 / held.sum(axis=1)
+        return attended, held, per_subject, overall
+
+    def absence_streaks(self):
+        """
+        ``(longest, current)`` runs of consecutive missed sessions per student.
+        Sessions a student was not expected at neither extend nor break a run.
+        """
+        if not self.n_sessions:
+            zeros = np.zeros(len(self.students), dtype=np.int64)
+            return zeros, zeros
+        present = np.unpackbits(self.present, axis=1, count=self.n_sessions).astype(bool)
+        held = np.unpackbits(self.held, axis=1, count=self.n_sessions).astype(bool)
+        absent = held & ~present
+        missed = np.cumsum(absent, axis=1)
+        # Missed count at the last attended session, carried forward: the reset point
+        baseline = np.maximum.accumulate(np.where(present, missed, 0), axis=1)
+        run = missed - baseline
+        return run.max(axis=1), run[:, -1]
+
+    def report(self, threshold=DEFAULT_THRESHOLD):
+        """One dict per student, lowest overall percentage first."""
+        attended, held, per_subject, overall = self.rates()
+        below = (per_subject < threshold) & (held > 0)
+        longest, current = self.absence_streaks()
+
+        rows = []
+        for i, (student_id, roll_no, name) in enumerate(self.students):
+            rows.append({
+                "student_id": student_id,
+                "roll_no": roll_no,
+                "name": name,
+                "attended": int(attended[i].sum()),
+                "held": int(held[i].sum()),
+                "percentage": None if np.isnan(overall[i]) else round(float(overall[i]), 1),
+                "subjects_below": [
+                    {"code": code, "percentage": round(float(per_subject[i, j]), 1),
+                     "attended": int(attended[i, j]), "held": int(held[i, j])}
+                    for j, (_, code, _) in enumerate(self.subjects) if below[i, j]
+                ],
+                "longest_absence": int(longest[i]),
+                "current_absence": int(current[i]),
+                "defaulter": bool(overall[i] < threshold or below[i].any()),
+            })
+        rows.sort(key=lambda r: (r["percentage"] is None, r["percentage"] or 0, r["roll_no"]))
+        return rows
+
+    def defaulters(self, threshold=DEFAULT_THRESHOLD):
+        return [row for row in self.report(threshold) if row["defaulter"]]
+
+
+def _positions(ids, values):
+    """Index of each of ``values`` in ``ids`` (-1 where absent), vectorised."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return np.full(len(values), -1, dtype=np.int64)
+    order = np.argsort(ids)
+    sorted_ids = ids[order]
+    pos = np.clip(np.searchsorted(sorted_ids, values), 0, len(ids) - 1)
+    return np.where(sorted_ids[pos] == values, order[pos], -1)
+
+
+def build_matrix(scope):
+    subjects = Subject.objects.filter(branch_id=scope.branch_id, semester=scope.semester).order_by("code")
+    start, end = scope.bounds()
+    sessions_qs = QRSession.objects.filter(subject__in=subjects, created_at__gte=start, created_at__lt=end)
+    sessions = list(sessions_qs.order_by("created_at", "id").values_list("id", "subject_id"))
+    subject_rows = list(subjects.values_list("id", "code", "name"))
+
+    in_cohort = Q(branch_id=scope.branch_id, semester=scope.semester)
+    students = list(
+        Student.objects.filter(in_cohort | Q(subjects__in=subjects)).distinct()
+        .order_by("roll_no").values_list("id", "roll_no", "name", "branch_id", "semester")
+    )
+    n, m = len(students), len(sessions)
+    row_of = {s[0]: i for i, s in enumerate(students)}
+    session_subjects = np.array([s[1] for s in sessions], dtype=np.int64)
+
+    # Expected at every session of the cohort's subjects, or only at those enrolled in
+    held = np.zeros((n, m), dtype=bool)
+    cohort = [i for i, s in enumerate(students) if (s[3], s[4]) == (scope.branch_id, scope.semester)]
+    held[cohort, :] = True
+    enrolled = Student.subjects.through.objects.filter(subject__in=subjects).values_list("student_id", "subject_id")
+    for student_id, subject_id in enrolled:
+        held[row_of[student_id], session_subjects == subject_id] = True
+
+    # The single scan of Attendance, mapped to (row, column) with searchsorted
+    present = np.zeros((n, m), dtype=bool)
+    pairs = Attendance.objects.filter(qr_session__in=sessions_qs).values_list("student_id", "qr_session_id")
+    flat = np.fromiter(chain.from_iterable(pairs.iterator(chunk_size=5000)), dtype=np.int64)
+    pairs = flat.reshape(-1, 2)
+    rows = _positions([s[0] for s in students], pairs[:, 0])
+    cols = _positions([s[0] for s in sessions], pairs[:, 1])
+    found = (rows >= 0) & (cols >= 0)
+    present[rows[found], cols[found]] = True
+    held |= present  # attended means it was held for them, whatever the enrollment says now
+
+    return AttendanceMatrix([s[:3] for s in students], sessions, subject_rows, present, held)
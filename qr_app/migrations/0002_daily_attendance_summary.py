@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_summary(apps, schema_editor):
+    Attendance = apps.get_model('qr_app', 'Attendance')
+    DailyAttendanceSummary = apps.get_model('qr_app', 'DailyAttendanceSummary')
+    rows = (
+        Attendance.objects
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'qr_session__subject', 'qr_session__subject__branch')
+        .annotate(n=Count('id'))
+    )
+    DailyAttendanceSummary.objects.bulk_create([
+        DailyAttendanceSummary(
+            date=r['day'], subject_id=r['qr_session__subject'],
+            branch_id=r['qr_session__subject__branch'], count=r['n'],
+        )
+        for r in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='qr_app.branch')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='qr_app.subject')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily attendance summaries',
+                'unique_together': {('date', 'subject', 'branch')},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
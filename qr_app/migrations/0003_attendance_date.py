@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:06
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_attendance_date(apps, schema_editor):
+    Attendance = apps.get_model('qr_app', 'Attendance')
+    batch = []
+    for row in Attendance.objects.only('id', 'timestamp').iterator(chunk_size=2000):
+        row.attendance_date = timezone.localdate(row.timestamp)
+        batch.append(row)
+        if len(batch) >= 2000:
+            Attendance.objects.bulk_update(batch, ['attendance_date'])
+            batch = []
+    if batch:
+        Attendance.objects.bulk_update(batch, ['attendance_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_app', '0002_daily_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='attendance_date',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+        migrations.RunPython(backfill_attendance_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['attendance_date', 'qr_session'], name='attendance_date_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'attendance_date'], name='attendance_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['qr_session', 'timestamp'], name='attendance_session_time_idx'),
+        ),
+    ]
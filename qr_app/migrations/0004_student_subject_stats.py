@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_stats(apps, schema_editor):
+    Attendance = apps.get_model('qr_app', 'Attendance')
+    QRSession = apps.get_model('qr_app', 'QRSession')
+    Student = apps.get_model('qr_app', 'Student')
+    Subject = apps.get_model('qr_app', 'Subject')
+    StudentSubjectStats = apps.get_model('qr_app', 'StudentSubjectStats')
+
+    attended = {
+        (r['student'], r['qr_session__subject']): r['n']
+        for r in Attendance.objects.values('student', 'qr_session__subject').annotate(n=Count('id'))
+    }
+    sessions = dict(QRSession.objects.values_list('subject').annotate(n=Count('id')))
+    held = {}
+    for subject in Subject.objects.filter(id__in=sessions):
+        eligible = Student.objects.filter(
+            Q(subjects=subject) | Q(branch_id=subject.branch_id, semester=subject.semester)
+        ).distinct().values_list('id', flat=True)
+        for student_id in eligible:
+            held[student_id, subject.id] = sessions[subject.id]
+    for student_id, subject_id in attended:
+        held.setdefault((student_id, subject_id), sessions.get(subject_id, 0))
+    StudentSubjectStats.objects.bulk_create([
+        StudentSubjectStats(student_id=student_id, subject_id=subject_id,
+                            attended=attended.get((student_id, subject_id), 0), held=n)
+        for (student_id, subject_id), n in held.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_app', '0003_attendance_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attended', models.PositiveIntegerField(default=0)),
+                ('held', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_stats', to='qr_app.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_stats', to='qr_app.subject')),
+            ],
+            options={
+                'verbose_name_plural': 'Student subject stats',
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
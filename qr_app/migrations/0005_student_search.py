@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# External-content FTS5 index over qr_app_student, kept in sync by triggers
+# (see qr_app/search.py). SQLite only; other databases keep icontains search.
+# The triggers go whenever a later migration remakes qr_app_student: such a
+# migration must run the CREATE TRIGGER statements below again (check qr_app.E001).
+CREATE = [
+    """
+    CREATE VIRTUAL TABLE qr_app_student_fts USING fts5(
+        roll_no, name,
+        content='qr_app_student', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER qr_app_student_fts_ai AFTER INSERT ON qr_app_student BEGIN
+        INSERT INTO qr_app_student_fts(rowid, roll_no, name) VALUES (new.id, new.roll_no, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER qr_app_student_fts_ad AFTER DELETE ON qr_app_student BEGIN
+        INSERT INTO qr_app_student_fts(qr_app_student_fts, rowid, roll_no, name)
+        VALUES ('delete', old.id, old.roll_no, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER qr_app_student_fts_au AFTER UPDATE OF roll_no, name ON qr_app_student BEGIN
+        INSERT INTO qr_app_student_fts(qr_app_student_fts, rowid, roll_no, name)
+        VALUES ('delete', old.id, old.roll_no, old.name);
+        INSERT INTO qr_app_student_fts(rowid, roll_no, name) VALUES (new.id, new.roll_no, new.name);
+    END
+    """,
+    "INSERT INTO qr_app_student_fts(qr_app_student_fts) VALUES ('rebuild')",
+]
+DROP = [
+    "DROP TRIGGER IF EXISTS qr_app_student_fts_au",
+    "DROP TRIGGER IF EXISTS qr_app_student_fts_ad",
+    "DROP TRIGGER IF EXISTS qr_app_student_fts_ai",
+    "DROP TABLE IF EXISTS qr_app_student_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_app', '0004_student_subject_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE), _run(DROP)),
+    ]
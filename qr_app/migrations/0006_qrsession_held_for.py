@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_app', '0005_student_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qrsession',
+            name='held_for',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+# The shared cache (settings.CACHES) defaults to a database table; create it
+# here so that migrate is all a deployment needs. A no-op for other backends.
+def create_cache_table(apps, schema_editor):
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_app', '0006_qrsession_held_for'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -49,18 +49,76 @@ class QRSession(models.Model):
     token = models.CharField(max_length=64, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
+    # Student ids the session was counted as held for (stats.py); None before 0006
+    held_for = models.JSONField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"QR for {self.subject.name} at {self.created_at}"
 
+    def is_active(self):
+        return timezone.now() <= self.expires_at
+
 
 class Attendance(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     qr_session = models.ForeignKey(QRSession, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Local (TIME_ZONE) date of the scan, so date filters can use an index
+    # instead of converting every timestamp with timestamp__date.
+    attendance_date = models.DateField(default=timezone.localdate, editable=False)
 
     class Meta:
         unique_together = ('student', 'qr_session')
+        indexes = [
+            models.Index(fields=["attendance_date", "qr_session"], name="attendance_date_session_idx"),
+            models.Index(fields=["student", "attendance_date"], name="attendance_student_date_idx"),
+            models.Index(fields=["qr_session", "timestamp"], name="attendance_session_time_idx"),
+        ]
 
     def __str__(self):
         return f"{self.student.name} - {self.qr_session.subject.name} ({self.timestamp})"
+
+
+class DailyAttendanceSummary(models.Model):
+    """
+    Attendance count per day and subject (with the subject's branch copied
+    alongside), maintained incrementally as attendance is written so the
+    dashboards never aggregate the Attendance table.
+    """
+    date = models.DateField()
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name="daily_summaries")
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name="daily_summaries")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'subject', 'branch')
+        verbose_name_plural = "Daily attendance summaries"
+
+    def __str__(self):
+        return f"{self.date} - {self.subject.name}: {self.count}"
+
+
+class StudentSubjectStats(models.Model):
+    """
+    Per student and subject: sessions held for the student (one per QR
+    session generated while they were on the subject's roster) and sessions
+    attended. Maintained incrementally (see stats.py) so percentages are a
+    plain read.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="subject_stats")
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name="student_stats")
+    attended = models.PositiveIntegerField(default=0)
+    held = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('student', 'subject')
+        verbose_name_plural = "Student subject stats"
+
+    def __str__(self):
+        return f"{self.student.roll_no} - {self.subject.code}: {self.attended}/{self.held}"
+
+    @property
+    def percentage(self):
+        if not self.held:
+            return None
+        return round(min(self.attended, self.held) * 100 / self.held, 1)
@@ -0,0 +1,81 @@
+"""
+Keyset (seek) pagination.
+
+Instead of OFFSET, each page continues from the sort key of the last row it
+returned, so page 1000 costs the same as page 1. The position is handed to
+clients as an opaque, URL-safe cursor.
+"""
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return [_load(v) for v in values]
+
+
+def _dump(value):
+    if isinstance(value, datetime.datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict) and "dt" in value:
+        parsed = parse_datetime(value["dt"])
+        if parsed is None:
+            raise ValueError("Invalid cursor")
+        return parsed
+    return value
+
+
+def seek_filter(ordering, values):
+    """
+    Q matching rows strictly after ``values`` in ``ordering``, e.g. for
+    ("a", "b", "id"): a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z).
+    A leading "-" on a field means descending.
+    """
+    if len(values) != len(ordering):
+        raise ValueError("Invalid cursor")
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=50):
+    """
+    One page of ``queryset`` (which must yield dicts, i.e. ``.values()``).
+    Returns ``(rows, next_cursor)``; next_cursor is None on the last page.
+    Every field of ``ordering`` must be part of the projection, and the last
+    one must be unique (normally the primary key).
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(seek_filter(ordering, decode_cursor(cursor)))
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last[field.lstrip("-")] for field in ordering])
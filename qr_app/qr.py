@@ -0,0 +1,67 @@
+"""
+QR image rendering for sessions.
+
+The projector page used to receive a freshly rasterised, base64-inlined PNG
+on every generate. Images are now served by their own endpoint: SVG by
+default (PNG on request), rendered once per token + parameters, kept in a
+bounded cache and sent with long-lived cache headers.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+
+from .cache import TTLCache
+
+# Names in qrcode.constants; qrcode itself is only imported by the first render
+ERROR_CORRECTION = {
+    "L": "ERROR_CORRECT_L",
+    "M": "ERROR_CORRECT_M",
+    "Q": "ERROR_CORRECT_Q",
+    "H": "ERROR_CORRECT_H",
+}
+CONTENT_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+MAX_BOX_SIZE = 40
+
+
+def qr_setting(name, default):
+    return getattr(settings, "QR_IMAGE", {}).get(name, default)
+
+
+qr_image_cache = TTLCache(maxsize=qr_setting("CACHE_SIZE", 256))
+
+
+def render_qr(data, fmt="svg", error_correction="M", box_size=10, border=4):
+    """Encode ``data`` and return the image bytes in ``fmt`` ("svg" or "png")."""
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(
+        error_correction=getattr(qrcode.constants, ERROR_CORRECTION[error_correction]),
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    if fmt == "svg":
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+    else:
+        img = qr.make_image()
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def qr_image(data, fmt, error_correction, box_size, ttl):
+    """
+    Cached render_qr(). Returns ``(image_bytes, etag)``; ``ttl`` is how long
+    the entry may live (normally the session's remaining lifetime).
+    """
+    key = (data, fmt, error_correction, box_size)
+    cached = qr_image_cache.get(key)
+    if cached is None:
+        image = render_qr(data, fmt, error_correction, box_size)
+        etag = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        cached = (image, etag)
+        qr_image_cache.set(key, cached, ttl=ttl)
+    return cached
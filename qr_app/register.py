@@ -0,0 +1,90 @@
+"""
+Monthly attendance register: one row per student of a subject, one column
+per class (QR session) held in the month, P/A in the cells.
+
+The grid comes from three flat reads - the month's sessions, the subject's
+roster and the (student, session) pairs present - pivoted in one pass
+through a set, so building it is linear in the size of the grid. It is
+streamed as CSV, or written as XLSX with openpyxl's write-only mode. An
+XLSX file is a zip whose directory is written last, so it is saved to a
+temporary file first and then streamed from disk.
+"""
+import calendar
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime, time
+
+from django.http import FileResponse
+from django.utils import timezone
+
+from .exports import EXPORT_CHUNK_SIZE
+from .models import Attendance, QRSession
+from .roster import eligible_students
+
+PRESENT, ABSENT = "P", "A"
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def month_bounds(year, month):
+    """Aware datetimes for the first instant of the month and of the next one."""
+    tz = timezone.get_current_timezone()
+    last_day = calendar.monthrange(year, month)[1]
+    start = timezone.make_aware(datetime.combine(date(year, month, 1), time.min), tz)
+    end = timezone.make_aware(datetime.combine(date(year, month, last_day), time.max), tz)
+    return start, end
+
+
+@dataclass
+class Register:
+    subject: object
+    year: int
+    month: int
+    sessions: list  # [(id, created_at)]
+    students: list  # [(id, roll_no, name)]
+    present: set    # {(student_id, session_id)}
+
+    def header(self):
+        labels = [timezone.localtime(created).strftime("%d/%m %H:%M") for _, created in self.sessions]
+        return ["Roll No", "Name", *labels, "Present", "Held", "%"]
+
+    def rows(self):
+        held = len(self.sessions)
+        for student_id, roll_no, name in self.students:
+            marks = [PRESENT if (student_id, session_id) in self.present else ABSENT
+                     for session_id, _ in self.sessions]
+            attended = marks.count(PRESENT)
+            percentage = round(attended * 100 / held, 1) if held else ""
+            yield [roll_no, name, *marks, attended, held, percentage]
+
+    def filename(self, extension):
+        return f"register_{self.subject.code}_{self.year}-{self.month:02d}.{extension}"
+
+
+def build_register(subject, year, month):
+    start, end = month_bounds(year, month)
+    sessions_qs = QRSession.objects.filter(subject=subject, created_at__range=(start, end))
+    sessions = list(sessions_qs.order_by("created_at", "id").values_list("id", "created_at"))
+    students = list(eligible_students(subject).order_by("roll_no").values_list("id", "roll_no", "name"))
+    present = set(
+        Attendance.objects.filter(qr_session__in=sessions_qs)
+        .values_list("student_id", "qr_session_id").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return Register(subject, year, month, sessions, students, present)
+
+
+def register_xlsx(register):
+    """XLSX response, saved to a temporary file (not memory) and streamed from it."""
+    from openpyxl import Workbook  # optional: only the XLSX export needs it
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=f"{register.subject.code} {register.year}-{register.month:02d}"[:31])
+    sheet.freeze_panes = "C2"
+    sheet.append(register.header())
+    for row in register.rows():
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=register.filename("xlsx"), content_type=XLSX_CONTENT_TYPE
+    )
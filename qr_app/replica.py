@@ -0,0 +1,54 @@
+"""
+Read/write connection routing for the SQLite production profile.
+
+With ``QR_DB_PROFILE=production`` settings.py adds a ``replica`` alias: a
+second connection to the same database file with ``query_only`` set. Views
+wrapped in ``@replica_reads`` (dashboards, reports) run their reads on it,
+while scan writes and everything else stay on ``default``. Under WAL the two
+never wait for each other, and a report can never write by accident.
+
+Without the profile the router is not installed and the decorator is a
+no-op, so development and tests use the single ``default`` connection.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+REPLICA = "replica"
+
+_use_replica = ContextVar("qr_use_replica", default=False)
+
+
+@contextmanager
+def reading_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(view):
+    """Run a read-only view's queries on the replica alias (when configured)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reading_from_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Reads inside reading_from_replica() go to the replica; writes always to default."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if _use_replica.get() else None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so saving an instance loaded from the replica still goes to default
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # same file, same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
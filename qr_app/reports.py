@@ -0,0 +1,273 @@
+"""
+Background PDF rendering for attendance sheets.
+
+Drawing a multi-thousand-row sheet with reportlab takes seconds, so the
+export views enqueue a job on a small worker pool instead of rendering in
+the request. Finished PDFs are stored under ``QR_REPORTS["ROOT"]`` with a
+name derived from the filter parameters and a data version (row count + last
+id of the rows, plus the catalog version for renamed students or subjects),
+so downloading an unchanged sheet again is served from disk and a changed
+sheet gets a fresh file. At most ``MAX_JOBS`` finished jobs are remembered
+in memory; older ones are still found on disk.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+
+from .catalog import catalog_version
+from .exports import EXPORT_CHUNK_SIZE, subject_sheet_queryset
+from .models import Attendance, Student, Subject
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def reports_setting(name, default):
+    return getattr(settings, "QR_REPORTS", {}).get(name, default)
+
+
+def reports_root():
+    root = Path(reports_setting("ROOT", Path(settings.BASE_DIR) / "reports"))
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+# 🔎 Queries shared by the views and the renderers
+
+def faculty_queryset(date, branch_id=None, semester=None, subject_id=None):
+    attendance = Attendance.objects.filter(attendance_date=date)
+    if branch_id:
+        attendance = attendance.filter(student__branch_id=branch_id)
+    if semester:
+        attendance = attendance.filter(student__semester=semester)
+    if subject_id:
+        attendance = attendance.filter(qr_session__subject_id=subject_id)
+    return attendance
+
+
+def _faculty_version(params):
+    # Names on the sheet come from the catalog: a rename changes its version
+    return {**faculty_queryset(**params).aggregate(rows=Count("id"), last=Max("id")), "catalog": catalog_version()}
+
+
+def _subject_version(params):
+    subject = Subject.objects.get(id=params["subject_id"])
+    present = Attendance.objects.filter(
+        qr_session__subject=subject, attendance_date=params["date"]
+    ).aggregate(rows=Count("id"), last=Max("id"))
+    roster = Student.objects.filter(subjects=subject).aggregate(
+        students=Count("id"), last_student=Max("id")
+    )
+    return {**present, **roster, "catalog": catalog_version()}
+
+
+# 🖨️ Renderers (run on the worker pool; reportlab is imported by the first one)
+
+def _render_faculty(fp, params):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    date = params["date"]
+    p = canvas.Canvas(fp, pagesize=letter)
+    width, height = letter
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(50, height - 50, f"Attendance Report ({date})")
+    y = height - 80
+    p.setFont("Helvetica", 11)
+    p.drawString(50, y, "Roll No")
+    p.drawString(150, y, "Name")
+    p.drawString(300, y, "Subject")
+    p.drawString(450, y, "Time")
+
+    rows = faculty_queryset(**params).values_list(
+        "student__roll_no", "student__name", "qr_session__subject__name", "timestamp"
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    y -= 20
+    for roll_no, name, subject_name, timestamp in rows:
+        p.drawString(50, y, str(roll_no))
+        p.drawString(150, y, name)
+        p.drawString(300, y, subject_name)
+        p.drawString(450, y, timestamp.strftime("%H:%M:%S"))
+        y -= 20
+        if y < 50:
+            p.showPage()
+            y = height - 50
+
+    p.save()
+
+
+def _render_subject(fp, params):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    subject = Subject.objects.get(id=params["subject_id"])
+    date = params["date"]
+    p = canvas.Canvas(fp, pagesize=letter)
+    width, height = letter
+
+    # Title
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(50, height - 50, f"Attendance Sheet - {subject.name} ({subject.code})")
+    p.setFont("Helvetica", 12)
+    p.drawString(50, height - 70, f"Date: {date}")
+
+    # Table headers
+    y = height - 100
+    p.setFont("Helvetica-Bold", 11)
+    p.drawString(50, y, "Roll No")
+    p.drawString(150, y, "Name")
+    p.drawString(400, y, "Status")
+
+    rows = subject_sheet_queryset(subject, date).values_list(
+        "roll_no", "name", "present"
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    # Rows
+    p.setFont("Helvetica", 11)
+    y -= 20
+    for roll_no, name, present in rows:
+        p.drawString(50, y, str(roll_no))
+        p.drawString(150, y, name)
+        p.drawString(400, y, "Present ✓" if present else "Absent ×")
+        y -= 20
+        if y < 50:  # New page if too long
+            p.showPage()
+            y = height - 50
+
+    p.showPage()
+    p.save()
+
+
+REPORT_KINDS = {
+    "faculty": (_faculty_version, _render_faculty),
+    "subject": (_subject_version, _render_subject),
+}
+
+
+# 📦 Jobs
+
+class ReportJob:
+    def __init__(self, job_id, kind, params, filename, path):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.filename = filename
+        self.path = path
+        self.status = DONE if path.exists() else QUEUED
+        self.error = None
+
+    def as_dict(self):
+        return {"id": self.id, "kind": self.kind, "status": self.status, "error": self.error}
+
+
+_jobs = OrderedDict()  # oldest first
+_jobs_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=reports_setting("WORKERS", 2), thread_name_prefix="report-render"
+            )
+        return _executor
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def request_report(kind, params, filename):
+    """
+    Return the job for ``kind``/``params``, enqueueing a render if no PDF for
+    the current data version exists yet. Identical requests share one job.
+    """
+    version_of, _ = REPORT_KINDS[kind]
+    scope = _digest([kind, params])
+    job_id = f"{scope}-{_digest(version_of(params))}"
+    path = reports_root() / f"{job_id}.pdf"
+
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        stale = job is not None and (job.status == FAILED or job.path != path
+                                     or (job.status == DONE and not path.exists()))
+        if job is not None and not stale:
+            return job
+        job = _jobs[job_id] = ReportJob(job_id, kind, params, filename, path)
+        _forget_finished_jobs()
+    if job.status == QUEUED:
+        _get_executor().submit(_run_job, job)
+    return job
+
+
+def _forget_finished_jobs():
+    """Keep ``_jobs`` bounded; queued and running jobs stay until they finish."""
+    excess = len(_jobs) - reports_setting("MAX_JOBS", 256)
+    for job_id in [j.id for j in _jobs.values() if j.status in (DONE, FAILED)][:max(excess, 0)]:
+        del _jobs[job_id]
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        # Finished before a restart: the file is still a valid artifact.
+        path = reports_root() / f"{os.path.basename(job_id)}.pdf"
+        if path.exists():
+            job = ReportJob(job_id, None, None, "attendance.pdf", path)
+    return job
+
+
+def _run_job(job):
+    try:
+        render_job(job)
+    finally:
+        # Pool threads keep their own DB connection; don't leak it between jobs.
+        connection.close()
+
+
+def render_job(job):
+    """Render ``job`` into its file, atomically replacing older versions."""
+    _, render = REPORT_KINDS[job.kind]
+    job.status = RUNNING
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=job.path.parent, suffix=".part")
+        with os.fdopen(fd, "wb") as fp:
+            render(fp, job.params)
+        os.replace(tmp_path, job.path)
+        tmp_path = None
+        _prune_old_versions(job)
+        job.status = DONE
+    except Exception as exc:
+        logger.exception("Rendering report %s failed", job.id)
+        job.status = FAILED
+        job.error = str(exc)
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
+
+
+def _prune_old_versions(job):
+    scope = job.id.split("-", 1)[0]
+    for old in job.path.parent.glob(f"{scope}-*.pdf"):
+        if old != job.path:
+            old.unlink(missing_ok=True)
+            with _jobs_lock:
+                _jobs.pop(old.stem, None)
+
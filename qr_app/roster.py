@@ -0,0 +1,147 @@
+"""
+Per-session roster of the students allowed to scan a QR.
+
+``generate_qr`` preloads the subject's eligible students (enrolled through
+``Student.subjects`` or matching the subject's branch + semester) into a
+compact ``roll_no -> (dob, student_id, ...)`` map, so verifying a scan and
+checking enrollment is a dictionary lookup instead of a Student query.
+Rosters are evicted when their session expires.
+
+A roster remembers the catalog version (see catalog.py) it was built at. A
+real student missing from it triggers a rebuild only if the catalog changed
+since, and the answer for a pair that is still missing is kept on the
+roster, so resubmitting from outside the class costs no queries.
+"""
+import sys
+from collections import namedtuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import TTLCache
+from .catalog import catalog_version
+from .models import Student
+
+# Only what the scan/confirm pages need; keeps each entry small.
+RosterEntry = namedtuple("RosterEntry", "dob student_id name father_name semester")
+
+# Remembered misses per roster; bounds what guessing roll numbers can grow it to.
+MAX_MISSES = 1000
+
+
+class Roster:
+    __slots__ = ("session_id", "subject_id", "entries", "version", "misses")
+
+    def __init__(self, session_id, subject_id, entries, version=None):
+        self.session_id = session_id
+        self.subject_id = subject_id
+        self.entries = entries
+        self.version = version
+        self.misses = {}  # (roll_no, dob) -> whether such a student exists at all
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, roll_no):
+        return roll_no in self.entries
+
+    def verify(self, roll_no, dob):
+        """Roster entry for a roll_no/dob pair, or None."""
+        entry = self.entries.get(roll_no)
+        if entry is None or entry.dob != dob:
+            return None
+        return entry
+
+    def student(self, roll_no):
+        """Unsaved-looking ``Student`` built from the entry, for templates."""
+        entry = self.entries[roll_no]
+        return Student(
+            id=entry.student_id,
+            roll_no=roll_no,
+            name=entry.name,
+            father_name=entry.father_name,
+            dob=entry.dob,
+            semester=entry.semester,
+        )
+
+    def memory_bytes(self):
+        """Approximate footprint of the map, its keys and entries."""
+        size = sys.getsizeof(self.entries)
+        for roll_no, entry in self.entries.items():
+            size += sys.getsizeof(roll_no) + sys.getsizeof(entry)
+            size += sum(sys.getsizeof(field) for field in entry)
+        return size
+
+
+def eligible_students(subject):
+    """Students expected in a subject's class: enrolled, or same branch + semester."""
+    return Student.objects.filter(
+        Q(subjects=subject) | Q(branch_id=subject.branch_id, semester=subject.semester)
+    ).distinct()
+
+
+def build_roster(session):
+    version = catalog_version()  # read first: a change during the build shows up as a newer one
+    rows = eligible_students(session.subject).values_list(
+        "roll_no", "dob", "id", "name", "father_name", "semester"
+    )
+    entries = {row[0]: RosterEntry(*row[1:]) for row in rows}
+    return Roster(session.id, session.subject_id, entries, version)
+
+
+roster_cache = TTLCache(maxsize=256)
+
+
+def cache_roster(session, roster):
+    """Keep ``roster`` until ``session`` expires."""
+    ttl = (session.expires_at - timezone.now()).total_seconds()
+    roster_cache.set(session.id, roster, ttl=ttl)
+
+
+def warm_roster(session):
+    """Build and cache the roster of ``session`` until it expires."""
+    roster = build_roster(session)
+    cache_roster(session, roster)
+    return roster
+
+
+def get_roster(session):
+    roster = roster_cache.get(session.id)
+    if roster is None:
+        roster = warm_roster(session)
+    return roster
+
+
+def recheck_roster(session, roster, roll_no, dob):
+    """
+    Second look at a roll_no/dob pair ``roster`` does not have. Returns
+    ``(roster, entry, is_student)``: the roster is rebuilt (at most once per
+    catalog version) when a real student is missing from an outdated one.
+    """
+    key = (roll_no, dob)
+    current = roster.version == catalog_version()
+    if current and key in roster.misses:
+        return roster, None, roster.misses[key]
+    is_student = Student.objects.filter(roll_no=roll_no, dob=dob).exists()
+    if is_student and not current:
+        roster = warm_roster(session)
+        entry = roster.verify(roll_no, dob)
+        if entry is not None:
+            return roster, entry, True
+    if len(roster.misses) < MAX_MISSES:
+        roster.misses[key] = is_student
+    return roster, None, is_student
+
+
+def roster_stats():
+    stats = roster_cache.stats()
+    stats["rosters"] = [
+        {
+            "session": roster.session_id,
+            "subject": roster.subject_id,
+            "students": len(roster),
+            "bytes": roster.memory_bytes(),
+        }
+        for roster in roster_cache.values()
+    ]
+    return stats
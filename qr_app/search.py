@@ -0,0 +1,152 @@
+"""
+Student search on an SQLite FTS5 index.
+
+``qr_app_student_fts`` is an external-content FTS5 table over the roll number
+and name of ``qr_app_student`` (migration 0005). Triggers on the student
+table keep it in sync, including the CSV importer's bulk writes, which
+send no model signals. Every word of the query is matched as a prefix
+("cs00 ram" finds CS001 Ramesh), and results are ranked by bm25 with the
+roll number weighted above the name.
+
+SQLite drops a table's triggers when it drops the table, and Django remakes
+``qr_app_student`` (create, copy, drop, rename) for most field changes on
+SQLite. A migration that alters the student table must therefore create
+the 0005 triggers again and rebuild the index; the ``qr_app.E001`` database
+check (``manage.py check --database default``, also run by ``migrate``)
+reports them missing.
+
+Autocomplete ranks only the first RANK_WINDOW matches in rowid order, so on
+a one- or two-letter prefix the best match can fall outside it. On common
+prefixes ``icontains`` answers faster (it stops at the first matches in
+roll-number order); the index wins on rare and missing terms, where
+``icontains`` scans the whole table, and on ranking.
+
+On other databases, or before the migration, search falls back to the old
+``icontains`` filter. Once the index has been seen on a database alias it
+is taken to stay there for the life of the process, so a search does not
+read sqlite_master; unapplying 0005 needs a restart.
+"""
+import re
+
+from django.conf import settings
+from django.core import checks
+from django.db import connection, connections
+from django.db.models import Q
+
+from .models import Student
+
+FTS_TABLE = "qr_app_student_fts"
+# bm25 column weights: roll_no, name
+RANK = f"bm25({FTS_TABLE}, 10.0, 1.0)"
+TERM_RE = re.compile(r"\w+")
+TRIGGERS = ("qr_app_student_fts_ai", "qr_app_student_fts_ad", "qr_app_student_fts_au")
+
+# Aliases whose database has the index
+_fts_aliases = set()
+
+DEFAULTS = {
+    "AUTOCOMPLETE_LIMIT": 10,
+    "MAX_LIMIT": 50,
+    "LIST_LIMIT": 200,
+    "RANK_WINDOW": 500,
+}
+
+
+def search_setting(name):
+    return getattr(settings, "QR_SEARCH", {}).get(name, DEFAULTS[name])
+
+
+def fts_available(conn=connection):
+    if conn.alias in _fts_aliases:
+        return True
+    if conn.vendor == "sqlite" and FTS_TABLE in conn.introspection.table_names():
+        _fts_aliases.add(conn.alias)
+        return True
+    return False
+
+
+def missing_triggers(conn=connection):
+    """Sync triggers of the index that are not on the student table (see the module docstring)."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [Student._meta.db_table]
+        )
+        present = {row[0] for row in cursor.fetchall()}
+    return [name for name in TRIGGERS if name not in present]
+
+
+@checks.register(checks.Tags.database)
+def check_index_triggers(app_configs=None, databases=None, **kwargs):
+    errors = []
+    for alias in databases or ():
+        conn = connections[alias]
+        if not fts_available(conn):
+            continue
+        missing = missing_triggers(conn)
+        if missing:
+            errors.append(checks.Error(
+                f"Student search index on {alias!r} is missing its triggers: {', '.join(missing)}.",
+                hint="A migration that remade qr_app_student dropped them. Create them again as in "
+                     "migration 0005, then run manage.py rebuild_student_search.",
+                id="qr_app.E001",
+            ))
+    return errors
+
+
+def match_expression(query):
+    """FTS5 query with every word as a quoted prefix term, or "" if nothing is searchable."""
+    return " ".join(f'"{term}"*' for term in TERM_RE.findall(query))
+
+
+def ranked_ids(query, limit, queryset=None):
+    """
+    Ids of students matching ``query``, best first. With a filtered
+    ``queryset`` only its students count and every match is ranked; without
+    one (autocomplete) only the first RANK_WINDOW matches are, which keeps
+    one- and two-letter prefixes cheap at 100k students.
+    """
+    match = match_expression(query)
+    if not match:
+        return []
+    # The LIMIT keeps SQLite from pushing "id IN (...)" into the FTS scan,
+    # which would run one index lookup per student.
+    sql = (
+        f"SELECT id FROM (SELECT rowid AS id, {RANK} AS score FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s LIMIT %s)"
+    )
+    params = [match]
+    if queryset is not None and queryset.query.has_filters():
+        subquery, subparams = queryset.values("id").query.sql_with_params()
+        sql += f" WHERE id IN ({subquery})"
+        params += [-1, *subparams]
+    else:
+        params.append(search_setting("RANK_WINDOW"))
+    sql += " ORDER BY score LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_students(query, limit, queryset=None):
+    """Matching students of ``queryset`` (default: all), ranked; at most ``limit``."""
+    queryset = Student.objects.all() if queryset is None else queryset
+    if not fts_available():
+        return list(queryset.filter(Q(roll_no__icontains=query) | Q(name__icontains=query))
+                    .order_by("roll_no")[:limit])
+    ids = ranked_ids(query, limit, queryset)
+    by_id = queryset.in_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def rebuild_index():
+    """Re-read every student into the index; returns the number of rows indexed."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def check_index():
+    """FTS5's own consistency check against the content table; raises DatabaseError on drift."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('integrity-check', 1)")
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+
+from .models import Attendance
+
+# Sent inside the writing transaction whenever attendance rows are created,
+# whether one by one or in bulk (bulk_create sends no post_save).
+# ``records`` is a list of saved Attendance instances.
+attendance_recorded = Signal()
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, **kwargs):
+    if created:
+        attendance_recorded.send(sender=Attendance, records=[instance])
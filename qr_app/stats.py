@@ -0,0 +1,178 @@
+"""
+Incrementally maintained attendance percentages (``StudentSubjectStats``).
+
+``held`` goes up for every student on the roster when ``generate_qr``
+opens a session, in the transaction that creates it, and the ids counted
+are stored on the session (``QRSession.held_for``); ``attended`` goes up
+with every attendance write (in the same transaction). An attendee missing
+from ``held_for`` (enrolled after the session opened and let in by
+``recheck_roster``, or marked by hand) is added to it and counted as held
+then, so ``held`` never trails ``attended``. Deletes decrement both, a
+session exactly for the students it was counted for. ``rebuild_stats()``
+recomputes the table from QRSession/Attendance for the management command;
+sessions from before ``held_for`` count as held for the students eligible
+now (or who attended them).
+"""
+from collections import Counter, defaultdict
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Attendance, QRSession, Student, StudentSubjectStats, Subject
+from .roster import eligible_students
+from .signals import attendance_recorded
+
+# Student ids per UPDATE ... IN (...) statement
+CHUNK_SIZE = 500
+
+
+def _chunks(items):
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+def apply_deltas(field, deltas):
+    """Add ``{(student_id, subject_id): delta}`` to ``field`` ("attended" or "held")."""
+    grouped = defaultdict(list)
+    for (student_id, subject_id), delta in deltas.items():
+        if delta:
+            grouped[subject_id, delta].append(student_id)
+    for (subject_id, delta), student_ids in grouped.items():
+        for chunk in _chunks(student_ids):
+            if delta > 0:
+                # Missing rows first, then one UPDATE: safe against concurrent creators.
+                StudentSubjectStats.objects.bulk_create(
+                    [StudentSubjectStats(student_id=s, subject_id=subject_id) for s in chunk],
+                    ignore_conflicts=True,
+                )
+            rows = StudentSubjectStats.objects.filter(subject_id=subject_id, student_id__in=chunk)
+            if delta < 0:
+                rows = rows.filter(**{f"{field}__gte": -delta})
+            rows.update(**{field: F(field) + delta})
+
+
+@transaction.atomic
+def count_session_held(session, student_ids):
+    """
+    A new session of ``session.subject`` counts as held for ``student_ids``
+    (its roster). Call it in the transaction that creates the session.
+    """
+    session.held_for = sorted(set(student_ids))
+    QRSession.objects.filter(pk=session.pk).update(held_for=session.held_for)
+    apply_deltas("held", {(student_id, session.subject_id): 1 for student_id in session.held_for})
+
+
+@receiver(attendance_recorded)
+def count_attended(sender, records, **kwargs):
+    count_late_attendees(records)
+    apply_deltas("attended", Counter((r.student_id, r.qr_session.subject_id) for r in records))
+
+
+def count_late_attendees(records):
+    """Add attendees missing from their session's ``held_for`` to it, and to ``held``."""
+    attendees = defaultdict(set)
+    for record in records:
+        attendees[record.qr_session_id].add(record.student_id)
+    # Read here, after the insert took the write lock, not from the possibly cached session
+    sessions = QRSession.objects.filter(pk__in=attendees, held_for__isnull=False)
+    deltas = Counter()
+    for session_id, subject_id, held_for in sessions.values_list("id", "subject_id", "held_for"):
+        late = attendees[session_id].difference(held_for)
+        if late:
+            QRSession.objects.filter(pk=session_id).update(held_for=sorted(late.union(held_for)))
+            deltas.update((student_id, subject_id) for student_id in late)
+    apply_deltas("held", deltas)
+
+
+@receiver(post_delete, sender=Attendance)
+def uncount_attended(sender, instance, **kwargs):
+    try:
+        subject_id = instance.qr_session.subject_id
+    except ObjectDoesNotExist:
+        return
+    apply_deltas("attended", {(instance.student_id, subject_id): -1})
+
+
+@receiver(pre_delete, sender=QRSession)
+def uncount_held(sender, instance, **kwargs):
+    try:
+        subject = instance.subject
+    except ObjectDoesNotExist:
+        return  # the subject (and its stats) are going too
+    # From the row, not the instance: late attendees may have joined since it was loaded
+    student_ids = QRSession.objects.filter(pk=instance.pk).values_list("held_for", flat=True).first()
+    if student_ids is None:  # counted before held_for existed: best guess is today's roster
+        student_ids = eligible_students(subject).values_list("id", flat=True)
+    apply_deltas("held", {(student_id, subject.id): -1 for student_id in student_ids})
+
+
+# 📖 Readers
+
+def stats_for_student(student):
+    """The student's stats rows with their subject, by subject code."""
+    return (
+        StudentSubjectStats.objects.filter(student=student)
+        .select_related("subject")
+        .order_by("subject__code")
+    )
+
+
+def stats_by_student(subject):
+    """``{student_id: StudentSubjectStats}`` for one subject."""
+    return {s.student_id: s for s in StudentSubjectStats.objects.filter(subject=subject)}
+
+
+# 🔁 Rebuild / drift check
+
+def expected_stats():
+    """``{(student_id, subject_id): (attended, held)}`` recomputed from the source tables."""
+    attended = {
+        (r["student"], r["qr_session__subject"]): r["n"]
+        for r in Attendance.objects.values("student", "qr_session__subject").annotate(n=Count("id"))
+    }
+    students = set(Student.objects.values_list("id", flat=True))
+    legacy, held = Counter(), Counter()
+    for subject_id, held_for in QRSession.objects.values_list("subject_id", "held_for").iterator():
+        if held_for is None:
+            legacy[subject_id] += 1
+        else:
+            held.update((student_id, subject_id) for student_id in held_for if student_id in students)
+    for subject in Subject.objects.filter(id__in=legacy):
+        for student_id in eligible_students(subject).values_list("id", flat=True):
+            held[student_id, subject.id] += legacy[subject.id]
+    for student_id, subject_id in attended:
+        if (student_id, subject_id) not in held:  # attended only sessions from before held_for
+            held[student_id, subject_id] = legacy[subject_id]
+    return {key: (attended.get(key, 0), n) for key, n in held.items()}
+
+
+def stored_stats():
+    return {
+        (student_id, subject_id): (attended, held)
+        for student_id, subject_id, attended, held in StudentSubjectStats.objects.exclude(attended=0, held=0)
+        .values_list("student_id", "subject_id", "attended", "held")
+    }
+
+
+def find_drift():
+    """``{key: (stored, expected)}`` for every (attended, held) pair that disagrees."""
+    expected, stored = expected_stats(), stored_stats()
+    return {
+        key: (stored.get(key, (0, 0)), expected.get(key, (0, 0)))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key, (0, 0)) != expected.get(key, (0, 0))
+    }
+
+
+@transaction.atomic
+def rebuild_stats():
+    stats = expected_stats()
+    StudentSubjectStats.objects.all().delete()
+    StudentSubjectStats.objects.bulk_create([
+        StudentSubjectStats(student_id=student_id, subject_id=subject_id, attended=attended, held=held)
+        for (student_id, subject_id), (attended, held) in stats.items()
+    ], batch_size=1000)
+    return len(stats)
@@ -0,0 +1,115 @@
+"""
+Incrementally maintained attendance counters (``DailyAttendanceSummary``).
+
+Every attendance write bumps the (date, subject, branch) counter in the same
+transaction; deletes decrement it. ``rebuild_summary()`` recomputes the
+table from scratch and reports drift, for the management command.
+"""
+from collections import Counter
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Attendance, DailyAttendanceSummary
+from .signals import attendance_recorded
+
+
+def _summary_key(record):
+    subject = record.qr_session.subject
+    return (record.attendance_date, subject.id, subject.branch_id)
+
+
+def apply_counts(counts):
+    """Add ``{(date, subject_id, branch_id): delta}`` to the summary rows."""
+    for (day, subject_id, branch_id), delta in counts.items():
+        if not delta:
+            continue
+        rows = DailyAttendanceSummary.objects.filter(date=day, subject_id=subject_id, branch_id=branch_id)
+        # A drifted counter must not go below zero (PositiveIntegerField)
+        count = F("count") + delta if delta > 0 else Greatest(F("count") + delta, 0)
+        if rows.update(count=count) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                DailyAttendanceSummary.objects.create(
+                    date=day, subject_id=subject_id, branch_id=branch_id, count=delta
+                )
+        except IntegrityError:
+            # Created concurrently between our update and insert.
+            rows.update(count=F("count") + delta)
+
+
+@receiver(attendance_recorded)
+def count_recorded_attendance(sender, records, **kwargs):
+    apply_counts(Counter(_summary_key(r) for r in records))
+
+
+@receiver(post_delete, sender=Attendance)
+def uncount_deleted_attendance(sender, instance, **kwargs):
+    try:
+        key = _summary_key(instance)
+    except ObjectDoesNotExist:
+        # Session/subject already gone (cascade delete): their rows go with them.
+        return
+    apply_counts({key: -1})
+
+
+# 📖 Readers
+
+def todays_total(**filters):
+    """Attendance marked today, optionally filtered (subject_id, branch_id, ...)."""
+    rows = DailyAttendanceSummary.objects.filter(date=timezone.localdate(), **filters)
+    return rows.aggregate(total=Sum("count"))["total"] or 0
+
+
+def subjects_with_attendance():
+    return DailyAttendanceSummary.objects.filter(count__gt=0).values("subject").distinct().count()
+
+
+# 🔁 Rebuild / drift check
+
+def expected_counts():
+    """Counters recomputed from the Attendance table."""
+    rows = (
+        Attendance.objects
+        .values("attendance_date", "qr_session__subject", "qr_session__subject__branch")
+        .annotate(n=Count("id"))
+    )
+    return {
+        (r["attendance_date"], r["qr_session__subject"], r["qr_session__subject__branch"]): r["n"]
+        for r in rows
+    }
+
+
+def stored_counts():
+    return {
+        (day, subject_id, branch_id): count
+        for day, subject_id, branch_id, count in DailyAttendanceSummary.objects.filter(count__gt=0)
+        .values_list("date", "subject_id", "branch_id", "count")
+    }
+
+
+def find_drift():
+    """``{key: (stored, expected)}`` for every counter that disagrees."""
+    expected, stored = expected_counts(), stored_counts()
+    return {
+        key: (stored.get(key, 0), expected.get(key, 0))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key, 0) != expected.get(key, 0)
+    }
+
+
+@transaction.atomic
+def rebuild_summary():
+    counts = expected_counts()
+    DailyAttendanceSummary.objects.all().delete()
+    DailyAttendanceSummary.objects.bulk_create([
+        DailyAttendanceSummary(date=day, subject_id=subject_id, branch_id=branch_id, count=n)
+        for (day, subject_id, branch_id), n in counts.items()
+    ], batch_size=1000)
+    return len(counts)
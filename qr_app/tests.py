@@ -1,5 +1,40 @@
-from django.test import TestCase
-from .models import Student, Branch
+import io
+import json
+import multiprocessing
+import tempfile
+import uuid
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, IntegrityError, OperationalError, connection, transaction
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import history, live, reports, views
+from .admission import AdmissionController, admission, client_ip
+from .cache import TTLCache, get_qr_session, qr_session_cache
+from .catalog import page_cache
+from .idcards import card_payload, generate_id_cards, verify_card
+from .ingest import AttendanceIngestor, record_attendance
+from .models import Student, Branch, Subject, QRSession, Attendance, DailyAttendanceSummary, StudentSubjectStats
+from .qr import qr_image_cache, render_qr
+from .replica import REPLICA, ReadReplicaRouter, reading_from_replica
+from .roster import build_roster, roster_cache, warm_roster
+from .search import search_students
+from .summary import find_drift, todays_total
+from .tokens import (
+    InvalidToken, StaleToken, current_window, image_key, make_form_stamp, make_token, rotate_seconds, submit_max_age,
+    verify_token,
+)
 
 
 class StudentModelTest(TestCase):
@@ -22,3 +57,1214 @@ class StudentModelTest(TestCase):
         self.assertEqual(student.name, "Test Student")
         self.assertEqual(student.branch.name, "CSE")
 
+
+class AttendanceFixtureMixin:
+
+    def setUp(self):
+        cache.clear()
+        qr_session_cache.clear()
+        roster_cache.clear()
+        admission.reset()
+        self.branch = Branch.objects.create(name="CSE")
+        self.subject = Subject.objects.create(code="CS101", name="Programming", branch=self.branch, semester=1)
+        self.students = [
+            Student.objects.create(
+                roll_no=f"CS{i:03d}", name=f"Student {i}", dob=date(2004, 1, i),
+                year=1, semester=1, branch=self.branch,
+            )
+            for i in range(1, 4)
+        ]
+        self.session = QRSession.objects.create(
+            subject=self.subject, token="tok123", expires_at=timezone.now() + timedelta(minutes=5)
+        )
+
+
+@override_settings(QR_INGEST={"ASYNC": False})
+class AttendanceIngestTest(AttendanceFixtureMixin, TestCase):
+
+    def test_flush_writes_batch_and_ignores_duplicates(self):
+        ingestor = AttendanceIngestor()
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        for student in self.students:
+            ingestor._pending.add((student.id, self.session.id))
+            ingestor._queue.put((student.id, self.session.id))
+
+        ingestor.flush()
+
+        self.assertEqual(Attendance.objects.filter(qr_session=self.session).count(), 3)
+        stats = ingestor.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["last_batch_size"], 3)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["pending"], 0)
+
+    def test_failed_batch_is_split_and_bad_rows_are_kept(self):
+        ingestor = AttendanceIngestor()
+        good = [(student.id, self.session.id) for student in self.students[:2]]
+        bad = (999999, self.session.id)
+        ingestor._pending.update([*good, bad])
+
+        def record(pairs):
+            if bad in set(pairs):
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            return record_attendance(pairs)
+
+        with mock.patch("qr_app.ingest.record_attendance", side_effect=record), \
+                self.assertLogs("qr_app.ingest", "WARNING") as logs:
+            ingestor._write([good[0], bad, good[1]])
+        self.assertIn("student=999999", logs.output[-1])
+
+        self.assertEqual(Attendance.objects.filter(qr_session=self.session).count(), 2)
+        self.assertEqual([pair for pair, _ in ingestor.failed_pairs()], [bad])
+        stats = ingestor.stats()
+        self.assertEqual((stats["split_batches"], stats["failed_rows"], stats["lock_retries"]), (1, 1, 0))
+        self.assertEqual(stats["pending"], 0)
+
+    @override_settings(QR_INGEST={"ASYNC": False, "MAX_RETRIES": 1})
+    def test_only_lock_errors_are_retried_and_requeued(self):
+        ingestor = AttendanceIngestor()
+        pairs = [(student.id, self.session.id) for student in self.students]
+        ingestor._pending.update(pairs)
+        with mock.patch("qr_app.ingest.record_attendance",
+                        side_effect=OperationalError("database is locked")) as record, \
+                mock.patch.object(ingestor, "_ensure_started"), mock.patch("qr_app.ingest.time.sleep"), \
+                self.assertLogs("qr_app.ingest", "WARNING"):
+            ingestor._write(pairs)
+        self.assertEqual(record.call_count, 2)
+        self.assertEqual(ingestor.stats()["queue_depth"], 3)
+        self.assertEqual(ingestor.stats()["pending"], 3)  # still waiting, not lost
+        self.assertEqual(ingestor.failed_pairs(), [])
+
+        with mock.patch("qr_app.ingest.record_attendance",
+                        side_effect=OperationalError("no such table: qr_app_attendance")) as record, \
+                self.assertLogs("qr_app.ingest", "ERROR"):
+            ingestor._write(pairs[:1])
+        self.assertEqual(record.call_count, 1)
+        self.assertEqual(len(ingestor.failed_pairs()), 1)
+
+    def test_submit_rejects_pair_already_pending(self):
+        ingestor = AttendanceIngestor()
+        pair = (self.students[0].id, self.session.id)
+        ingestor._pending.add(pair)
+        self.assertFalse(ingestor.submit(*pair))
+
+    def test_confirmed_scan_is_recorded(self):
+        url = reverse("attendance_form", args=[self.session.token])
+        response = self.client.post(url, {"roll_no": "CS001", "dob": "2004-01-01", "confirm": "yes"})
+        self.assertTemplateUsed(response, "qr_app/success.html")
+        self.assertTrue(Attendance.objects.filter(student=self.students[0], qr_session=self.session).exists())
+
+        response = self.client.post(url, {"roll_no": "CS001", "dob": "2004-01-01", "confirm": "yes"})
+        self.assertContains(response, "already marked")
+
+
+class TTLCacheTest(TestCase):
+
+    def test_lru_eviction_and_expiry(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        cache.set("d", 4, ttl=-1)
+        self.assertIsNone(cache.get("d"))
+
+
+class QRSessionCacheTest(AttendanceFixtureMixin, TestCase):
+
+    def test_repeat_lookups_skip_the_database(self):
+        get_qr_session(self.session.token)
+        with self.assertNumQueries(0):
+            session = get_qr_session(self.session.token)
+            self.assertEqual(session.subject.code, "CS101")
+
+    def test_unknown_token_is_negatively_cached(self):
+        with self.assertRaises(Http404):
+            get_qr_session("missing")
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            get_qr_session("missing")
+
+
+@override_settings(QR_INGEST={"ASYNC": False})
+class RosterTest(AttendanceFixtureMixin, TestCase):
+
+    def test_roster_covers_branch_semester_and_enrolled_students(self):
+        other_branch = Branch.objects.create(name="ME")
+        enrolled = Student.objects.create(
+            roll_no="ME001", name="Enrolled", dob=date(2004, 2, 1), year=1, semester=1, branch=other_branch
+        )
+        enrolled.subjects.add(self.subject)
+        Student.objects.create(
+            roll_no="ME002", name="Outsider", dob=date(2004, 2, 2), year=1, semester=1, branch=other_branch
+        )
+
+        roster = build_roster(self.session)
+
+        self.assertEqual(set(roster.entries), {"CS001", "CS002", "CS003", "ME001"})
+        self.assertIsNotNone(roster.verify("CS002", date(2004, 1, 2)))
+        self.assertIsNone(roster.verify("CS002", date(2004, 1, 3)))
+        self.assertGreater(roster.memory_bytes(), 0)
+
+    def test_scan_verification_uses_warm_roster(self):
+        warm_roster(self.session)
+        url = reverse("attendance_form", args=[self.session.token])
+        get_qr_session(self.session.token)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {"roll_no": "CS002", "dob": "2004-01-02"})
+        self.assertTemplateUsed(response, "qr_app/confirm_attendance.html")
+        self.assertFalse([q for q in ctx.captured_queries if "qr_app_student" in q["sql"]])
+
+    def test_student_outside_roster_is_rejected(self):
+        Student.objects.create(
+            roll_no="EE001", name="Elsewhere", dob=date(2004, 3, 1), year=2, semester=3, branch=self.branch
+        )
+        url = reverse("attendance_form", args=[self.session.token])
+        response = self.client.post(url, {"roll_no": "EE001", "dob": "2004-03-01", "confirm": "yes"})
+        self.assertContains(response, "not enrolled")
+        self.assertFalse(Attendance.objects.exists())
+
+    @override_settings(QR_INGEST={"ASYNC": False})
+    def test_resubmitting_from_outside_the_roster_costs_no_queries(self):
+        outsider = Student.objects.create(
+            roll_no="EE001", name="Elsewhere", dob=date(2004, 3, 1), year=2, semester=3, branch=self.branch
+        )
+        url = reverse("attendance_form", args=[self.session.token])
+        form = {"roll_no": "EE001", "dob": "2004-03-01", "confirm": "yes"}
+        self.client.post(url, form)
+        self.client.post(url, {**form, "roll_no": "NOPE"})
+
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.post(url, form), "not enrolled")
+            self.assertContains(self.client.post(url, {**form, "roll_no": "NOPE"}), "Invalid Roll No")
+
+        # Enrolling them changes the catalog version: one rebuild lets them in
+        with self.captureOnCommitCallbacks(execute=True):
+            outsider.subjects.add(self.subject)
+        with mock.patch("qr_app.roster.build_roster", wraps=build_roster) as build:
+            self.assertTemplateUsed(self.client.post(url, form), "qr_app/success.html")
+        self.assertEqual(build.call_count, 1)
+
+
+class CSVExportTest(AttendanceFixtureMixin, TestCase):
+
+    def test_subject_sheet_is_streamed_with_presence(self):
+        for student in self.students:
+            student.subjects.add(self.subject)
+        Attendance.objects.create(student=self.students[1], qr_session=self.session)
+        today = timezone.localdate()
+
+        response = self.client.get(
+            reverse("attendance_dashboard"), {"subject": self.subject.id, "date": str(today), "export": "csv"}
+        )
+
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [
+            "Roll No,Name,Status",
+            "CS001,Student 1,Absent",
+            "CS002,Student 2,Present",
+            "CS003,Student 3,Absent",
+        ])
+
+    def test_faculty_export_is_streamed(self):
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        response = self.client.get(reverse("attendance_faculty"), {"export": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "Roll No,Name,Subject,Time")
+        self.assertTrue(lines[1].startswith("CS001,Student 1,Programming,"))
+
+
+class PDFReportJobTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.settings_override = override_settings(QR_REPORTS={"ROOT": Path(tmp.name)})
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        reports._jobs.clear()
+        for student in self.students:
+            student.subjects.add(self.subject)
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+
+    def _job(self):
+        params = {"subject_id": self.subject.id, "date": str(timezone.localdate())}
+        with mock.patch("qr_app.reports._get_executor"):
+            return reports.request_report("subject", params, "sheet.pdf")
+
+    def test_rendered_pdf_is_reused_until_data_changes(self):
+        job = self._job()
+        self.assertEqual(job.status, reports.QUEUED)
+        reports.render_job(job)
+        self.assertEqual(job.status, reports.DONE)
+        self.assertTrue(job.path.read_bytes().startswith(b"%PDF"))
+
+        self.assertIs(self._job(), job)
+
+        Attendance.objects.create(student=self.students[1], qr_session=self.session)
+        newer = self._job()
+        self.assertNotEqual(newer.id, job.id)
+        reports.render_job(newer)
+        self.assertFalse(job.path.exists())
+
+        # Renaming a student on the sheet is a new version too
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students[2].name = "Renamed"
+            self.students[2].save()
+        self.assertNotEqual(self._job().id, newer.id)
+
+    def test_finished_jobs_are_bounded_and_a_vanished_file_is_rendered_again(self):
+        job = self._job()
+        reports.render_job(job)
+        job.path.unlink()  # e.g. pruned by a newer version right after the status check
+        with mock.patch("qr_app.reports._get_executor") as executor:
+            response = self.client.get(reverse("report_job_download", args=[job.id]))
+        self.assertRedirects(response, reverse("report_job", args=[job.id]), fetch_redirect_response=False)
+        executor.return_value.submit.assert_called_once()
+
+        with override_settings(QR_REPORTS={"ROOT": job.path.parent, "MAX_JOBS": 1}):
+            reports.render_job(reports._jobs[job.id])
+            Attendance.objects.create(student=self.students[1], qr_session=self.session)
+            newer = self._job()
+        self.assertEqual(list(reports._jobs), [newer.id])
+
+    def test_export_redirects_to_job_page_then_downloads(self):
+        with mock.patch("qr_app.reports._get_executor"):
+            response = self.client.get(reverse("attendance_dashboard"), {
+                "subject": self.subject.id, "date": str(timezone.localdate()), "export": "pdf",
+            })
+        job_id = response.url.rstrip("/").split("/")[-1]
+        self.assertRedirects(response, reverse("report_job", args=[job_id]))
+
+        reports.render_job(reports.get_job(job_id))
+        status = self.client.get(reverse("report_job", args=[job_id]), {"format": "json"}).json()
+        self.assertEqual(status["status"], "done")
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download["Content-Type"], "application/pdf")
+
+
+class KeysetReportTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        other = Subject.objects.create(code="CS102", name="Maths", branch=self.branch, semester=1)
+        other_session = QRSession.objects.create(
+            subject=other, token="tok456", expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        for session in (self.session, other_session):
+            for student in self.students:
+                Attendance.objects.create(student=student, qr_session=session)
+
+    def test_api_walks_all_rows_in_key_order(self):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            with self.assertNumQueries(1):
+                data = self.client.get(reverse("report_api"), params).json()
+            seen.extend(data["results"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(Attendance.objects.order_by(*views.REPORT_ORDERING).values_list("id", flat=True))
+        self.assertEqual([r["id"] for r in seen], expected)
+
+    def test_api_filters_and_rejects_bad_cursor(self):
+        data = self.client.get(reverse("report_api"), {"subject": self.subject.id}).json()
+        self.assertEqual({r["subject_code"] for r in data["results"]}, {"CS101"})
+        self.assertEqual(self.client.get(reverse("report_api"), {"cursor": "!!"}).status_code, 400)
+
+    def test_report_page_renders_projected_columns(self):
+        response = self.client.get(reverse("report"), {"limit": 4})
+        self.assertContains(response, "Student 1")
+        self.assertIn("cursor=", response.context["next_query"])
+
+
+@override_settings(QR_INGEST={"ASYNC": False})
+class DailySummaryTest(AttendanceFixtureMixin, TestCase):
+
+    def test_counters_follow_single_and_bulk_writes(self):
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        with transaction.atomic():
+            created = record_attendance([(s.id, self.session.id) for s in self.students])
+        self.assertEqual(len(created), 2)
+
+        row = DailyAttendanceSummary.objects.get(subject=self.subject)
+        self.assertEqual(row.count, 3)
+        self.assertEqual(row.branch, self.branch)
+        self.assertEqual(todays_total(subject_id=self.subject.id), 3)
+        self.assertEqual({a.attendance_date for a in created}, {timezone.localdate()})
+
+        Attendance.objects.filter(student=self.students[0]).delete()
+        self.assertEqual(todays_total(), 2)
+        self.assertEqual(find_drift(), {})
+
+    def test_rebuild_command_fixes_drift(self):
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        DailyAttendanceSummary.objects.update(count=7)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_attendance_summary", "--check", stdout=io.StringIO())
+        call_command("rebuild_attendance_summary", stdout=io.StringIO())
+        self.assertEqual(DailyAttendanceSummary.objects.get().count, 1)
+
+    def test_faculty_total_matches_filtered_rows(self):
+        other = Branch.objects.create(name="ECE")
+        visitor = Student.objects.create(roll_no="EC001", name="Visitor", year=1, semester=3, branch=other)
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        Attendance.objects.create(student=visitor, qr_session=self.session)
+
+        for params, total in (({}, 2), ({"subject": self.subject.id}, 2),
+                              ({"branch": self.branch.id}, 1), ({"semester": 3}, 1)):
+            response = self.client.get(reverse("attendance_faculty"), params)
+            self.assertEqual(response.context["today_total"], total, params)
+            self.assertEqual(len(response.context["attendance"]), total, params)
+
+    def test_drifted_counter_does_not_go_negative(self):
+        attendance = Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        DailyAttendanceSummary.objects.update(count=0)
+        attendance.delete()
+        self.assertEqual(DailyAttendanceSummary.objects.get().count, 0)
+
+    def test_dashboard_reads_counters(self):
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["todays_attendance_count"], 1)
+        self.assertEqual(response.context["reports_count"], 1)
+
+
+class LiveStreamTest(AttendanceFixtureMixin, TestCase):
+
+    def test_stream_replays_backlog_then_pushes_new_rows(self):
+        first = Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        stream = live.event_stream(self.session)
+        self.assertTrue(next(stream).startswith("retry:"))
+        self.assertIn(f"id: {first.id}\n", next(stream))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Attendance.objects.create(student=self.students[1], qr_session=self.session)
+        event = next(stream)
+        self.assertIn(f"id: {second.id}\n", event)
+        self.assertIn('"roll_no": "CS002"', event)
+        stream.close()
+        self.assertFalse(live.hub.has_subscribers(self.session.id))
+
+    def test_resume_from_last_event_id_and_close_on_expiry(self):
+        first = Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        second = Attendance.objects.create(student=self.students[1], qr_session=self.session)
+        QRSession.objects.filter(id=self.session.id).update(expires_at=timezone.now())
+        self.session.refresh_from_db()
+
+        chunks = list(live.event_stream(self.session, last_id=first.id))
+
+        self.assertEqual(len(chunks), 3)
+        self.assertIn(f"id: {second.id}\n", chunks[1])
+        self.assertEqual(chunks[2], live.EXPIRED)
+
+    @override_settings(QR_LIVE={"HEARTBEAT": 0.01})
+    def test_heartbeat_picks_up_rows_committed_by_another_process(self):
+        stream = live.event_stream(self.session)
+        self.assertTrue(next(stream).startswith("retry:"))
+        self.assertEqual(next(stream), live.HEARTBEAT)
+
+        # No on_commit here, so this process's hub never hears of the row
+        other = Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        live.bump_session_version(self.session.id)
+
+        self.assertIn(f"id: {other.id}\n", next(stream))
+        stream.close()
+
+    @override_settings(QR_LIVE={"WSGI_STREAM_SECONDS": 0})
+    def test_wsgi_stream_ends_for_the_browser_to_reconnect(self):
+        first = Attendance.objects.create(student=self.students[0], qr_session=self.session)
+
+        chunks = list(live.event_stream(self.session))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertIn(f"id: {first.id}\n", chunks[1])
+        self.assertFalse(live.hub.has_subscribers(self.session.id))
+
+
+class SessionAttendanceAPITest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("session_attendance_api", args=[self.session.id])
+
+    def test_since_cursor_returns_only_newer_rows(self):
+        first = Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        data = self.client.get(self.url).json()
+        self.assertEqual(data["cursor"], first.id)
+        self.assertTrue(data["active"])
+
+        second = Attendance.objects.create(student=self.students[1], qr_session=self.session)
+        data = self.client.get(self.url, {"since": data["cursor"]}).json()
+        self.assertEqual([r["roll_no"] for r in data["records"]], ["CS002"])
+        self.assertEqual(data["cursor"], second.id)
+
+        data = self.client.get(self.url, {"since": data["cursor"]}).json()
+        self.assertEqual((data["records"], data["cursor"]), ([], second.id))
+
+    def test_unchanged_session_answers_304_without_reading_attendance(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries if "qr_app_attendance" in q["sql"]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class QRImageTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        qr_image_cache.clear()
+        self.url = reverse("qr_image", args=[self.session.id, image_key(self.session.id)])
+
+    def test_svg_is_rendered_once_and_revalidated(self):
+        self.url += f"?w={current_window()}"
+        with mock.patch("qr_app.qr.render_qr", wraps=render_qr) as render:
+            response = self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(b"<svg", response.content)
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_generate_page_links_image_instead_of_inlining_it(self):
+        response = self.client.post(reverse("qr_generate"), {
+            "branch": self.branch.id, "semester": 1, "subject": self.subject.id, "duration": 5,
+        })
+        session = response.context["qr_session"]
+        self.assertContains(response, reverse("qr_image", args=[session.id, image_key(session.id)]))
+        self.assertNotContains(response, "base64")
+
+    def test_png_and_parameter_validation(self):
+        response = self.client.get(self.url, {"format": "png", "ec": "h", "box": 4})
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+        self.assertEqual(self.client.get(self.url, {"format": "gif"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"w": current_window() + 5}).status_code, 400)
+
+    def test_image_url_cannot_be_guessed_from_the_session_id(self):
+        for key in ("", "AAAAAAAAAAAA", image_key(self.session.id + 1)):
+            url = f"/qr/session/{self.session.id}/image/{key}/"
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(QR_INGEST={"ASYNC": False})
+class SignedTokenTest(AttendanceFixtureMixin, TestCase):
+
+    def test_round_trip_and_short_payload(self):
+        token = make_token(self.session)
+        self.assertEqual(verify_token(token, max_age=60), self.session.id)
+        self.assertLess(len(token), 32)  # shorter than the legacy uuid4().hex
+
+    def test_forged_and_stale_tokens_are_rejected(self):
+        token = make_token(self.session)
+        payload, signature = token.rsplit(".", 1)
+        other_session = payload.replace(payload.split(".")[0], "zz", 1)
+        for forged in (f"{other_session}.{signature}", token[:-1] + "A", "1.2.3", "a.b.c.d"):
+            with self.assertRaises(InvalidToken):
+                verify_token(forged, max_age=60)
+
+        old = make_token(self.session, window=current_window() - 10)
+        with self.assertRaises(StaleToken):
+            verify_token(old, max_age=rotate_seconds())
+
+        self.session.expires_at = timezone.now() - timedelta(seconds=1)
+        with self.assertRaises(StaleToken):
+            verify_token(make_token(self.session), max_age=60)
+
+    @override_settings(QR_TOKENS={"ROTATE_SECONDS": 20, "SCAN_GRACE_WINDOWS": 1, "SUBMIT_GRACE_WINDOWS": 3})
+    def test_submit_grace_is_a_few_rotations(self):
+        self.assertEqual(submit_max_age(), 80)
+        url = lambda window: reverse("attendance_form", args=[make_token(self.session, window=window)])
+        form = {"roll_no": "CS001", "dob": "2004-01-01", "confirm": "yes"}
+
+        # Opened two windows ago: still accepted
+        self.assertTemplateUsed(self.client.post(url(current_window() - 2), form), "qr_app/success.html")
+        # Older than the grace: rejected, nothing recorded
+        response = self.client.post(url(current_window() - 5), {**form, "roll_no": "CS002", "dob": "2004-01-02"})
+        self.assertContains(response, "has expired")
+        self.assertFalse(Attendance.objects.filter(student=self.students[1]).exists())
+
+    @override_settings(QR_TOKENS={"ROTATE_SECONDS": 20, "SCAN_GRACE_WINDOWS": 1, "SUBMIT_GRACE_WINDOWS": 3})
+    def test_submit_grace_counts_from_when_the_form_was_opened(self):
+        # Scanned in the last second of a window: the form carries when it was opened
+        window = current_window()
+        url = reverse("attendance_form", args=[make_token(self.session, window=window)])
+        with mock.patch("qr_app.tokens.time.time", return_value=(window + 1) * 20 - 1):
+            response = self.client.get(url)
+        stamp = response.context["stamp"]
+        self.assertContains(response, f'name="stamp" value="{stamp}"')
+
+        # Confirmed near the end of the grace, four windows later: still accepted
+        form = {"roll_no": "CS001", "dob": "2004-01-01", "stamp": stamp}
+        with mock.patch("qr_app.tokens.time.time", return_value=(window + 1) * 20 - 1 + 79):
+            confirm = self.client.post(url, form)
+            self.assertContains(confirm, f'name="stamp" value="{stamp}"')
+            self.assertTemplateUsed(self.client.post(url, {**form, "confirm": "yes"}), "qr_app/success.html")
+
+        # Past the grace, or a stamp of another session: rejected
+        late = {"roll_no": "CS002", "dob": "2004-01-02", "confirm": "yes"}
+        with mock.patch("qr_app.tokens.time.time", return_value=(window + 1) * 20 - 1 + 81):
+            self.assertContains(self.client.post(url, {**late, "stamp": stamp}), "has expired")
+        other = make_form_stamp(self.session.id + 1)
+        self.assertContains(self.client.post(url, {**late, "stamp": other}), "has expired")
+        self.assertFalse(Attendance.objects.filter(student=self.students[1]).exists())
+
+    def test_scan_page_rejects_bad_tokens_without_queries(self):
+        stale = make_token(self.session, window=current_window() - 10)
+        with CaptureQueriesContext(connection) as queries:
+            forged = self.client.get(reverse("attendance_form", args=["1.k.8c.AAAAAAAAAAAA"]))
+            expired = self.client.get(reverse("attendance_form", args=[stale]))
+        self.assertEqual(forged.status_code, 404)
+        self.assertContains(expired, "has expired")
+        self.assertEqual(len(queries), 0)
+
+    def test_signed_scan_is_recorded(self):
+        url = reverse("attendance_form", args=[make_token(self.session)])
+        self.assertContains(self.client.get(url), "Roll")
+        response = self.client.post(url, {"roll_no": "CS002", "dob": "2004-01-02", "confirm": "yes"})
+        self.assertTemplateUsed(response, "qr_app/success.html")
+        self.assertTrue(Attendance.objects.filter(student=self.students[1], qr_session=self.session).exists())
+
+    def test_generate_page_encodes_a_signed_token(self):
+        response = self.client.post(reverse("qr_generate"), {
+            "branch": self.branch.id, "semester": 1, "subject": self.subject.id, "duration": 5,
+        })
+        session = response.context["qr_session"]
+        token = response.context["qr_url"].rstrip("/").rsplit("/", 1)[1]
+        self.assertEqual(verify_token(token, max_age=60), session.id)
+        self.assertContains(response, f"?w={response.context['qr_rotation']['window']}")
+
+
+class AdmissionControlTest(AttendanceFixtureMixin, TestCase):
+
+    def controller(self):
+        self.now = 0.0
+        self.slept = []
+        return AdmissionController(clock=lambda: self.now, sleep=self.slept.append)
+
+    @override_settings(QR_ADMISSION={"SESSION_RATE": 10, "SESSION_BURST": 2, "IP_BURST": 100, "MAX_WAIT": 0.25})
+    def test_burst_then_bounded_wait_then_busy(self):
+        controller = self.controller()
+        decisions = [controller.admit(1, f"10.0.0.{i}") for i in range(6)]
+
+        self.assertEqual([d.admitted for d in decisions], [True, True, True, True, False, False])
+        self.assertEqual(self.slept, [0.1, 0.2])
+        self.assertEqual(decisions[4].retry_after, 1)
+        self.assertTrue(controller.admit(2, "10.0.0.9").admitted)  # other sessions unaffected
+
+        self.now = 1.0
+        self.assertTrue(controller.admit(1, "10.0.0.1").admitted)
+        stats = controller.stats()
+        self.assertEqual((stats["admitted"], stats["delayed"], stats["rejected_busy"]), (6, 2, 2))
+        self.assertEqual(stats["waiting"], 0)
+
+    @override_settings(QR_ADMISSION={"IP_RATE": 1, "IP_BURST": 2, "TRUSTED_PROXIES": ["10.1.1.1"]})
+    def test_single_client_is_throttled(self):
+        controller = self.controller()
+        self.assertTrue(controller.admit(1, "10.0.0.1").admitted)
+        self.assertTrue(controller.admit(1, "10.0.0.1").admitted)
+        self.assertFalse(controller.admit(1, "10.0.0.1").admitted)
+        self.assertTrue(controller.admit(1, "10.0.0.2").admitted)
+        self.assertEqual(controller.stats()["rejected_ip"], 1)
+
+    @override_settings(QR_ADMISSION={"IP_RATE": 1, "IP_BURST": 2, "TRUSTED_PROXIES": []})
+    def test_shared_address_is_not_throttled_without_trusted_proxies(self):
+        # Behind an unconfigured proxy or a classroom NAT everyone has this address
+        controller = self.controller()
+        self.assertTrue(all(controller.admit(1, "100.64.0.1").admitted for _ in range(20)))
+        self.assertEqual(controller.stats()["rejected_ip"], 0)
+
+    @override_settings(QR_ADMISSION={"SESSION_RATE": 0.1, "SESSION_BURST": 1, "MAX_WAIT": 0})
+    def test_busy_submission_gets_retry_after_before_any_query(self):
+        url = reverse("attendance_form", args=[self.session.token])
+        self.client.post(url, {"roll_no": "CS001", "dob": "2004-01-01"})
+        get_qr_session(self.session.token)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"roll_no": "CS002", "dob": "2004-01-02"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "10")
+        self.assertContains(response, "try again", status_code=503)
+        self.assertFalse(any("qr_app_" in q["sql"] for q in queries.captured_queries))
+
+
+    def test_client_ip_behind_trusted_proxy(self):
+        from django.test import RequestFactory
+
+        def ip(remote, forwarded=None):
+            extra = {"HTTP_X_FORWARDED_FOR": forwarded} if forwarded is not None else {}
+            return client_ip(RequestFactory().post("/", REMOTE_ADDR=remote, **extra))
+
+        # No trusted proxies: the header is ignored
+        self.assertEqual(ip("203.0.113.7", "1.2.3.4"), "203.0.113.7")
+        with override_settings(QR_ADMISSION={"TRUSTED_PROXIES": ["100.64.0.0/10", "10.1.1.1"]}):
+            self.assertEqual(ip("100.64.3.2", "198.51.100.20"), "198.51.100.20")
+            # Spoofed hops on the left are skipped, trusted hops on the right too
+            self.assertEqual(ip("100.64.3.2", "6.6.6.6, 198.51.100.20, 10.1.1.1"), "198.51.100.20")
+            self.assertEqual(ip("100.64.3.2"), "100.64.3.2")
+            # A direct client's header is not believed
+            self.assertEqual(ip("198.51.100.9", "6.6.6.6"), "198.51.100.9")
+
+class LoadtestHelpersTest(TestCase):
+
+    def test_percentiles_and_outcomes(self):
+        from .management.commands.loadtest_scans import classify, percentiles
+
+        stats = percentiles([float(ms) for ms in range(1, 101)])
+        self.assertEqual((stats["p50"], stats["p95"], stats["p99"], stats["max"]), (51.0, 96.0, 100.0, 100.0))
+        self.assertEqual(percentiles([]), {})
+        self.assertEqual(classify(503, ""), "busy")
+        self.assertEqual(classify(200, "✅ Attendance Marked Successfully"), "ok")
+        self.assertEqual(classify(200, "⚠️ Attendance already marked!"), "duplicate")
+
+
+class StudentImportTest(AttendanceFixtureMixin, TestCase):
+
+    CSV = (
+        "roll_no,name,father_name,dob,year,semester,branch,email\n"
+        "CS001,Renamed One,,01-01-2004,1,1,CSE,\n"          # update
+        "CS101,New Student,Mr. New,2004-05-06,1,1,cse,\n"   # create, branch matched case-insensitively
+        "CS102,Bad Year,,01-01-2004,9,1,CSE,\n"             # invalid
+        "CS103,No Branch,,01-01-2004,1,1,ECE,\n"            # unknown branch
+        "CS101,Again,,01-01-2004,1,1,CSE,\n"                # duplicate in file
+        "CS104,Bad Mail,,01-01-2004,1,1,CSE,nope\n"         # invalid
+    )
+
+    def test_upsert_enroll_and_per_row_errors_in_batches(self):
+        from .importers import import_students
+
+        with CaptureQueriesContext(connection) as queries:
+            result = import_students(io.StringIO(self.CSV))
+
+        self.assertEqual((result.rows, result.created, result.updated), (6, 1, 1))
+        self.assertEqual([line for line, _, _ in result.errors], [4, 5, 6, 7])
+        self.assertIn("year", result.errors[0][2])
+        self.assertEqual(Student.objects.get(roll_no="CS001").name, "Renamed One")
+        new = Student.objects.get(roll_no="CS101")
+        self.assertEqual((new.dob, new.father_name, new.email), (date(2004, 5, 6), "Mr. New", None))
+        self.assertEqual(list(new.subjects.all()), [self.subject])
+        self.assertEqual(result.enrolled, 2)
+        self.assertLess(len(queries), 15)
+
+        again = import_students(io.StringIO(self.CSV))
+        self.assertEqual((again.created, again.updated, again.unchanged, again.enrolled), (0, 0, 2, 0))
+
+    def test_command_and_upload_view(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fh:
+            fh.write(self.CSV)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_students", fh.name, "--no-enroll", stdout=out, stderr=err)
+        Path(fh.name).unlink()
+        self.assertIn("1 created, 1 updated", out.getvalue())
+        self.assertIn("line 5 [CS103]: Unknown branch", err.getvalue())
+        self.assertFalse(Student.objects.get(roll_no="CS101").subjects.exists())
+
+        response = self.client.post(reverse("import_students"), {
+            "file": SimpleUploadedFile("students.csv", self.CSV.encode()), "enroll": "on",
+        })
+        self.assertContains(response, "2 unchanged")
+        self.assertContains(response, "Unknown branch")
+        self.assertTrue(Student.objects.get(roll_no="CS101").subjects.exists())
+
+
+    def test_undecodable_upload_and_database_errors_are_reported(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .importers import import_students
+
+        body = "roll_no,name,dob,year,semester,branch\nCS201,Good,2004-01-01,1,1,CSE\nCS202,Bad \xe9,2004-01-01,1,1,CSE\n"
+        response = self.client.post(reverse("import_students"), {
+            "file": SimpleUploadedFile("students.csv", body.encode("latin-1")),
+        })
+        self.assertContains(response, "Unreadable file")
+
+        def bulk_update(objs, *args, **kwargs):
+            if objs:
+                raise DatabaseError("disk I/O error")
+
+        with mock.patch("qr_app.importers.Student.objects.bulk_update", side_effect=bulk_update):
+            result = import_students(io.StringIO(self.CSV), batch_size=1)
+        self.assertIn((2, "", "Database error, lines 2-2 not saved (disk I/O error)"), result.errors)
+        self.assertEqual((result.created, result.updated), (1, 0))
+        self.assertEqual(Student.objects.get(roll_no="CS001").name, "Student 1")
+
+    def test_committed_batches_invalidate_caches(self):
+        from .catalog import catalog_version
+        from .importers import import_students
+
+        summary = history.student_summary("CS001")
+        self.assertEqual(summary["student"]["name"], "Student 1")
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            import_students(io.StringIO(self.CSV))
+        self.assertEqual(history.student_summary("CS001")["student"]["name"], "Renamed One")
+        self.assertNotEqual(catalog_version(), version)
+
+@override_settings(QR_INGEST={"ASYNC": False})
+class StudentSubjectStatsTest(AttendanceFixtureMixin, TestCase):
+
+    def generate(self):
+        return self.client.post(reverse("qr_generate"), {
+            "branch": self.branch.id, "semester": 1, "subject": self.subject.id, "duration": 5,
+        }).context["qr_session"]
+
+    def stats(self, student):
+        from .models import StudentSubjectStats
+        row = StudentSubjectStats.objects.get(student=student, subject=self.subject)
+        return row.attended, row.held, row.percentage
+
+    def test_counters_follow_sessions_and_attendance(self):
+        from .stats import find_drift
+
+        first, second = self.generate(), self.generate()
+        with transaction.atomic():
+            record_attendance([(self.students[0].id, first.id), (self.students[0].id, second.id),
+                               (self.students[1].id, first.id)])
+        self.assertEqual(self.stats(self.students[0]), (2, 2, 100.0))
+        self.assertEqual(self.stats(self.students[1]), (1, 2, 50.0))
+        self.assertEqual(self.stats(self.students[2]), (0, 2, 0.0))
+
+        Attendance.objects.get(student=self.students[1], qr_session=first).delete()
+        second.delete()
+        self.assertEqual(self.stats(self.students[0]), (1, 1, 100.0))
+        self.assertEqual(self.stats(self.students[1]), (0, 1, 0.0))
+        # The fixture session was never generated through the view: only a rebuild counts it
+        self.assertEqual(len(find_drift()), 3)
+
+    def test_session_delete_uncounts_the_roster_it_was_counted_for(self):
+        from .stats import find_drift
+
+        self.session.delete()
+        session = self.generate()
+        self.assertEqual(sorted(session.held_for), sorted(s.id for s in self.students))
+        # The roster moves on: one student leaves the semester, a new one joins
+        Student.objects.filter(pk=self.students[2].pk).update(semester=2)
+        Student.objects.create(roll_no="CS004", name="Student 4", year=1, semester=1, branch=self.branch)
+        self.generate()
+        session.delete()
+        self.assertEqual(self.stats(self.students[2]), (0, 0, None))
+        self.assertEqual(find_drift(), {})
+
+    def test_student_enrolled_after_the_session_opened(self):
+        from .stats import find_drift
+
+        self.session.delete()
+        session = self.generate()
+        other = Branch.objects.create(name="ECE")
+        with self.captureOnCommitCallbacks(execute=True):
+            late = Student.objects.create(roll_no="EC001", name="Late", dob=date(2004, 2, 1), year=1,
+                                          semester=1, branch=other)
+            late.subjects.add(self.subject)
+        url = reverse("attendance_form", args=[make_token(session)])
+        response = self.client.post(url, {"roll_no": "EC001", "dob": "2004-02-01", "confirm": "yes"})
+        self.assertTemplateUsed(response, "qr_app/success.html")
+
+        # Counted as held when let in, so the signal path and a rebuild agree
+        self.assertEqual(self.stats(late), (1, 1, 100.0))
+        self.assertEqual(find_drift(), {})
+        call_command("rebuild_attendance_stats", "--check", stdout=io.StringIO())
+
+        # The Overall column never passes 100%, even on a drifted row
+        StudentSubjectStats.objects.filter(student=late).update(attended=3)
+        response = self.client.get(reverse("attendance_dashboard"), {"subject": self.subject.id})
+        self.assertContains(response, "100%")
+        self.assertNotContains(response, "300%")
+        StudentSubjectStats.objects.filter(student=late).update(attended=1)
+
+        session.delete()
+        self.assertEqual(self.stats(late), (0, 0, None))
+        self.assertEqual(find_drift(), {})
+
+    def test_failed_count_leaves_no_session(self):
+        with mock.patch("qr_app.stats.apply_deltas", side_effect=DatabaseError("disk full")), \
+                self.assertRaises(DatabaseError):
+            self.generate()
+        self.assertFalse(QRSession.objects.exclude(pk=self.session.pk).exists())
+
+    def test_rebuild_command_and_percentages_in_views(self):
+        session = self.generate()
+        Attendance.objects.create(student=self.students[0], qr_session=session)
+        call_command("rebuild_attendance_stats", stdout=io.StringIO())
+        self.assertEqual(self.stats(self.students[0]), (1, 2, 50.0))
+        call_command("rebuild_attendance_stats", "--check", stdout=io.StringIO())
+
+        self.students[0].subjects.add(self.subject)
+        response = self.client.get(reverse("attendance_dashboard"), {"subject": self.subject.id})
+        self.assertContains(response, "50%")
+
+        session_store = self.client.session
+        session_store["student_roll"] = "CS001"
+        session_store.save()
+        response = self.client.get(reverse("attendance_stu"))
+        self.assertContains(response, "50.0%")
+
+
+@override_settings(QR_INGEST={"ASYNC": False})
+class StudentHistoryTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        session_store = self.client.session
+        session_store["student_roll"] = "CS001"
+        session_store.save()
+
+    def make_sessions(self, n):
+        expires = timezone.now() + timedelta(minutes=5)
+        sessions = [QRSession.objects.create(subject=self.subject, token=uuid.uuid4().hex, expires_at=expires)
+                    for i in range(n)]
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            record_attendance([(self.students[0].id, s.id) for s in sessions])
+        return sessions
+
+    def test_pages_without_per_row_queries(self):
+        self.make_sessions(25)
+        response = self.client.get(reverse("attendance_stu"), {"filter": "all"})
+        self.assertEqual(len(response.context["attendance"]), history.HISTORY_PAGE_SIZE)
+        self.assertContains(response, "Programming")
+        next_query = response.context["next_query"]
+        self.assertIsNotNone(next_query)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{reverse('attendance_stu')}?{next_query}")
+        self.assertEqual(len(response.context["attendance"]), 5)
+        self.assertIsNone(response.context["next_query"])
+        # session + history page + subject stats; the summary comes from the cache
+        self.assertLessEqual(len(queries), 4)
+
+        response = self.client.get(reverse("attendance_stu"), {"filter": "all", "cursor": "garbage"})
+        self.assertRedirects(response, f"{reverse('attendance_stu')}?filter=all")
+
+    def test_summary_cached_and_dropped_on_write(self):
+        self.make_sessions(2)
+        summary = history.student_summary("CS001")
+        self.assertEqual((summary["total"], summary["week"], summary["today"]), (2, 2, 2))
+        self.assertEqual([(s["code"], s["total"]) for s in summary["subjects"]], [("CS101", 2)])
+        with self.assertNumQueries(0):
+            history.student_summary("CS001")
+
+        self.make_sessions(1)
+        self.assertEqual(history.student_summary("CS001")["total"], 3)
+        self.assertEqual(history.student_summary("CS002")["total"], 0)
+
+
+class ReadReplicaRouterTest(TestCase):
+
+    def test_reads_follow_the_context_and_writes_stay_on_default(self):
+        router = ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(Attendance))
+        with reading_from_replica():
+            self.assertEqual(router.db_for_read(Attendance), REPLICA)
+            self.assertEqual(router.db_for_write(Attendance), "default")
+        self.assertIsNone(router.db_for_read(Attendance))
+        self.assertFalse(router.allow_migrate(REPLICA, "qr_app"))
+        self.assertTrue(router.allow_migrate("default", "qr_app"))
+
+    def test_decorated_views_still_work_without_the_profile(self):
+        response = self.client.get(reverse("attendance_dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+
+class CatalogPageCacheTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        page_cache.clear()
+
+    @skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_version_bumped_in_another_worker_is_seen_here(self):
+        from .catalog import bump_catalog_version, catalog_version
+
+        # The suite's cache is per process; stand in a cross-process one
+        with tempfile.TemporaryDirectory() as tmp, override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tmp,
+        }}):
+            before = catalog_version()
+            worker = multiprocessing.get_context("fork").Process(target=bump_catalog_version)
+            worker.start()
+            worker.join(10)
+            self.assertEqual(worker.exitcode, 0)
+            self.assertNotEqual(catalog_version(), before)
+
+    def test_hot_pages_cost_no_queries_until_the_catalog_changes(self):
+        url = reverse("student_list")
+        first = self.client.get(url, {"semester": "1"})
+        self.assertContains(first, "CS002")
+        with self.assertNumQueries(0):
+            again = self.client.get(url, {"semester": "1"})
+            revalidated = self.client.get(url, {"semester": "1"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(revalidated.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(roll_no="CS999", name="Late Joiner", year=1, semester=1, branch=self.branch)
+        changed = self.client.get(url, {"semester": "1"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertContains(changed, "CS999")
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_subject_json_keyed_by_filters(self):
+        url = reverse("ajax_get_subjects")
+        response = self.client.get(url, {"branch": self.branch.id, "semester": 1})
+        self.assertEqual(response.json()["results"], [{"id": self.subject.id, "name": "CS101 - Programming"}])
+        self.assertEqual(self.client.get(url, {"branch": self.branch.id, "semester": 2}).json()["results"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(code="CS102", name="Data Structures", branch=self.branch, semester=1)
+        response = self.client.get(url, {"branch": self.branch.id, "semester": 1})
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertContains(self.client.get(reverse("subject_list")), "CS102")
+
+
+class StudentSearchTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        page_cache.clear()
+        other = Branch.objects.create(name="ECE")
+        Student.objects.bulk_create([
+            Student(roll_no="EC001", name="Ramesh Kumar", year=1, semester=1, branch=other),
+            Student(roll_no="EC002", name="Priya Cs", year=1, semester=1, branch=other),
+        ])
+
+    def roll_nos(self, query, **kwargs):
+        return [s.roll_no for s in search_students(query, 10, **kwargs)]
+
+    def test_prefix_matching_ranking_and_triggers(self):
+        self.assertEqual(self.roll_nos("cs00"), ["CS001", "CS002", "CS003"])
+        self.assertEqual(self.roll_nos("stud 2"), ["CS002"])
+        self.assertEqual(self.roll_nos("ram"), ["EC001"])  # bulk_create is indexed too
+        # A roll number hit outranks the same word in a name
+        self.assertEqual(self.roll_nos("cs")[-1], "EC002")
+        self.assertEqual(self.roll_nos("cs", queryset=Student.objects.filter(branch__name="ECE")), ["EC002"])
+        self.assertEqual(self.roll_nos("***"), [])
+
+        Student.objects.filter(roll_no="EC001").update(name="Suresh Kumar")
+        self.students[0].delete()
+        self.assertEqual(self.roll_nos("ram"), [])
+        self.assertEqual(self.roll_nos("sur"), ["EC001"])
+        self.assertNotIn("CS001", self.roll_nos("cs00"))
+        call_command("rebuild_student_search", "--check", stdout=io.StringIO())
+
+    def test_search_does_not_introspect_the_schema_each_time(self):
+        self.roll_nos("cs00")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.roll_nos("cs00"), ["CS001", "CS002", "CS003"])
+        self.assertFalse(any("sqlite_master" in q["sql"] for q in queries.captured_queries))
+
+    def test_check_reports_dropped_triggers(self):
+        from .search import check_index_triggers
+
+        self.assertEqual(check_index_triggers(databases=["default"]), [])
+        # What a migration that remakes qr_app_student leaves behind
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER qr_app_student_fts_au")
+        errors = check_index_triggers(databases=["default"])
+        self.assertEqual([e.id for e in errors], ["qr_app.E001"])
+        self.assertIn("qr_app_student_fts_au", errors[0].msg)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_student_search", stdout=io.StringIO())
+
+    def test_autocomplete_and_list_page(self):
+        url = reverse("student_search")
+        results = self.client.get(url, {"q": "cs0", "limit": 2}).json()["results"]
+        self.assertEqual([r["roll_no"] for r in results], ["CS001", "CS002"])
+        self.assertEqual(results[0]["branch"], "CSE")
+        self.assertEqual(self.client.get(url, {"q": "cs0", "limit": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(url).json()["results"], [])
+
+        response = self.client.get(reverse("student_list"), {"q": "kumar"})
+        self.assertContains(response, "EC001")
+        self.assertNotContains(response, "CS001")
+
+
+@override_settings(QR_INGEST={"ASYNC": False})
+class BulkAttendanceAPITest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("bulk_attendance_api", args=[self.session.id])
+        other = Branch.objects.create(name="ECE")
+        self.outsider = Student.objects.create(roll_no="EC001", name="Outsider", year=1, semester=1, branch=other)
+
+    def post(self, roll_nos):
+        return self.client.post(self.url, json.dumps({"roll_nos": roll_nos}), content_type="application/json")
+
+    def test_requires_login(self):
+        response = self.post(["CS001"])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "Authentication required")
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_marks_a_class_in_one_round_trip(self):
+        self.client.force_login(User.objects.create_user("teacher", password="x"))
+        Attendance.objects.create(student=self.students[1], qr_session=self.session)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(["CS001", "CS002", "EC001", "NOPE", "CS001", " "])
+        body = response.json()
+        self.assertEqual(body["results"], {
+            "CS001": "created", "CS002": "duplicate", "EC001": "not_enrolled", "NOPE": "unknown",
+        })
+        self.assertEqual(body["counts"], {"created": 1, "duplicate": 1, "not_enrolled": 1, "unknown": 1})
+        self.assertEqual(Attendance.objects.filter(qr_session=self.session).count(), 2)
+        self.assertEqual(StudentSubjectStats.objects.get(student=self.students[0]).attended, 1)
+
+        # Enrolling the outsider puts them on the roster
+        self.outsider.subjects.add(self.subject)
+        self.assertEqual(self.post(["EC001"]).json()["results"], {"EC001": "created"})
+        self.assertEqual(self.client.post(self.url, "not json", content_type="application/json").status_code, 400)
+        self.assertEqual(self.post([1, 2]).status_code, 400)
+
+
+class IDCardTest(AttendanceFixtureMixin, TestCase):
+
+    def test_payload_is_signed(self):
+        payload = card_payload("CS001")
+        self.assertTrue(payload.startswith("CS001."))
+        self.assertEqual(verify_card(payload), "CS001")
+        self.assertIsNone(verify_card(payload.replace("CS001", "CS002")))
+        self.assertIsNone(verify_card("CS001"))
+        with override_settings(SECRET_KEY="another-key"):
+            self.assertIsNone(verify_card(payload))
+
+    def test_zip_and_pdf_batches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            batch = generate_id_cards(Student.objects.filter(roll_no__lt="CS003"), Path(tmp) / "cards.zip",
+                                      fmt="svg", workers=1, chunk_size=1)
+            self.assertEqual(batch.cards, 2)
+            with zipfile.ZipFile(Path(tmp) / "cards.zip") as archive:
+                self.assertEqual(archive.namelist(), ["CS001.svg", "CS002.svg"])
+                self.assertTrue(archive.read("CS001.svg").startswith(b"<svg"))
+
+            batch = generate_id_cards(Student.objects.all(), Path(tmp) / "cards.pdf", workers=1)
+            self.assertEqual(batch.cards, 3)
+            self.assertTrue((Path(tmp) / "cards.pdf").read_bytes().startswith(b"%PDF"))
+
+        with self.assertRaises(ValueError):
+            generate_id_cards(Student.objects.all(), io.BytesIO(), fmt="gif")
+
+    def test_admin_action_renders_on_threads_and_caps_the_batch(self):
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+        url = reverse("admin:qr_app_student_changelist")
+        action = {"action": "id_cards_png", "_selected_action": [self.students[0].pk, self.students[2].pk]}
+        with mock.patch("qr_app.idcards.ProcessPoolExecutor") as processes:
+            response = self.client.post(url, action)
+        processes.assert_not_called()
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="id-cards.zip"')
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ["CS001.png", "CS003.png"])
+
+        with override_settings(QR_ID_CARDS={"ADMIN_MAX_CARDS": 1}):
+            response = self.client.post(url, action, follow=True)
+        self.assertContains(response, "Select at most 1 students")
+
+
+class DefaulterAnalyticsTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from .analytics import matrix_cache
+        matrix_cache.clear()
+        self.sessions = [self.session] + [
+            QRSession.objects.create(subject=self.subject, token=f"tok-a{i}",
+                                     expires_at=timezone.now() + timedelta(minutes=5))
+            for i in range(4)
+        ]
+        # CS001 attends all 5, CS002 sessions 1 and 5, CS003 only session 1
+        pattern = {0: range(5), 1: (0, 4), 2: (0,)}
+        for i, columns in pattern.items():
+            for j in columns:
+                Attendance.objects.create(student=self.students[i], qr_session=self.sessions[j])
+        today = timezone.localdate()
+        from .analytics import Scope
+        self.scope = Scope(self.branch.id, 1, today - timedelta(days=1), today)
+
+    def test_percentages_defaulters_and_streaks(self):
+        from .analytics import build_matrix
+
+        matrix = build_matrix(self.scope)
+        self.assertEqual((len(matrix), matrix.n_sessions), (3, 5))
+        rows = {r["roll_no"]: r for r in matrix.report()}
+        self.assertEqual([rows[r]["percentage"] for r in ("CS001", "CS002", "CS003")], [100.0, 40.0, 20.0])
+        self.assertEqual((rows["CS002"]["longest_absence"], rows["CS002"]["current_absence"]), (3, 0))
+        self.assertEqual((rows["CS003"]["longest_absence"], rows["CS003"]["current_absence"]), (4, 4))
+        self.assertEqual([r["roll_no"] for r in matrix.defaulters()], ["CS003", "CS002"])
+        self.assertEqual(rows["CS002"]["subjects_below"][0]["code"], "CS101")
+
+    def test_matrix_is_cached_until_data_changes(self):
+        from . import analytics
+
+        with mock.patch("qr_app.analytics.build_matrix", wraps=analytics.build_matrix) as build:
+            analytics.get_matrix(self.scope)
+            analytics.get_matrix(self.scope)
+            self.assertEqual(build.call_count, 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                Attendance.objects.create(student=self.students[2], qr_session=self.sessions[1])
+            matrix = analytics.get_matrix(self.scope)
+            self.assertEqual(build.call_count, 2)
+        self.assertEqual({r["roll_no"]: r["attended"] for r in matrix.report()}["CS003"], 2)
+
+    def test_defaulters_page_and_csv(self):
+        params = {"branch": self.branch.id, "semester": 1}
+        response = self.client.get(reverse("defaulters"), params)
+        self.assertContains(response, "CS003")
+        self.assertNotContains(response, "CS001")
+        csv_body = b"".join(self.client.get(reverse("defaulters"), {**params, "export": "csv"}).streaming_content)
+        self.assertIn(b"CS002,Student 2,2,5,40.0,CS101:40.0,3,0", csv_body)
+
+
+class MonthlyRegisterTest(AttendanceFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.second = QRSession.objects.create(subject=self.subject, token="tok-r2",
+                                               expires_at=timezone.now() + timedelta(minutes=5))
+        Attendance.objects.create(student=self.students[0], qr_session=self.session)
+        Attendance.objects.create(student=self.students[0], qr_session=self.second)
+        Attendance.objects.create(student=self.students[1], qr_session=self.second)
+        self.month = timezone.localdate().strftime("%Y-%m")
+
+    def test_grid_from_three_queries(self):
+        from .register import build_register
+
+        today = timezone.localdate()
+        with self.assertNumQueries(3):
+            register = build_register(self.subject, today.year, today.month)
+            rows = list(register.rows())
+        self.assertEqual(len(register.header()), 2 + 2 + 3)
+        self.assertEqual(rows[0][2:], ["P", "P", 2, 2, 100.0])
+        self.assertEqual(rows[1][2:], ["A", "P", 1, 2, 50.0])
+        self.assertEqual(rows[2][2:], ["A", "A", 0, 2, 0.0])
+
+    def test_csv_and_xlsx_exports(self):
+        from openpyxl import load_workbook
+
+        params = {"subject": self.subject.id, "month": self.month}
+        csv_body = b"".join(self.client.get(reverse("attendance_register"), {**params, "export": "csv"}).streaming_content)
+        self.assertIn(b"CS002,Student 2,A,P,1,2,50.0", csv_body)
+
+        response = self.client.get(reverse("attendance_register"), {**params, "export": "xlsx"})
+        sheet = load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+        self.assertEqual([c.value for c in sheet[2]][:4], ["CS001", "Student 1", "P", "P"])
+
+        self.assertContains(self.client.get(reverse("attendance_register"), params), "2 classes held")
@@ -0,0 +1,159 @@
+"""
+Signed, rotating QR tokens.
+
+A token is ``<session id>.<window>.<ttl>.<signature>`` (numbers in base 36):
+``window`` is the rotation window it was issued for (unix time // ROTATE_SECONDS)
+and ``ttl`` the seconds from the start of that window until the session
+expires. The signature is an HMAC over the rest, keyed with SECRET_KEY.
+
+Everything needed to reject a forged, rotated-out or expired token is in the
+token itself, so the scan page does that before touching the database. The
+live page shows a new token every window, which makes a forwarded screenshot
+useless shortly after it was taken. Legacy ``uuid4().hex`` tokens (stored in
+``QRSession.token``) keep working through the old lookup.
+
+The form opened from a token carries a signed stamp of when it was opened
+(``make_form_stamp``); its submission grace counts from that moment, not
+from the start of the token's window, so a student who scanned late in a
+window gets the full grace to type a roll number and date of birth.
+"""
+import base64
+import time
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+KEY_SALT = "qr_app.tokens"
+IMAGE_KEY_SALT = "qr_app.tokens.image"
+FORM_STAMP_SALT = "qr_app.tokens.form"
+SIGNATURE_BYTES = 9  # 72 bits, 12 base64 characters
+
+
+class InvalidToken(Exception):
+    """Malformed or forged token."""
+
+
+class StaleToken(InvalidToken):
+    """Genuine token that rotated out or whose session expired."""
+
+    def __init__(self, session_id):
+        super().__init__("QR token is no longer valid")
+        self.session_id = session_id
+
+
+def token_setting(name, default):
+    return getattr(settings, "QR_TOKENS", {}).get(name, default)
+
+
+def signed_tokens_enabled():
+    return token_setting("SIGNED", True)
+
+
+def rotate_seconds():
+    return max(int(token_setting("ROTATE_SECONDS", 20)), 1)
+
+
+def current_window(now=None):
+    return int((time.time() if now is None else now) // rotate_seconds())
+
+
+def is_signed(token):
+    return "." in token
+
+
+def _b36(number):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        number, rem = divmod(number, 36)
+        out = digits[rem] + out
+        if not number:
+            return out
+
+
+def _signature(payload):
+    digest = salted_hmac(KEY_SALT, payload, algorithm="sha256").digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode()
+
+
+def make_token(session, window=None):
+    """Token for ``session`` valid in rotation ``window`` (default: the current one)."""
+    window = current_window() if window is None else window
+    ttl = max(int(session.expires_at.timestamp()) - window * rotate_seconds(), 0)
+    payload = f"{_b36(session.id)}.{_b36(window)}.{_b36(ttl)}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def image_key(session_id):
+    """
+    Unguessable part of a session's QR image URL. The image carries the
+    currently valid token, so it must not be reachable by counting session ids.
+    """
+    return _signature(f"{IMAGE_KEY_SALT}:{session_id}")
+
+
+def verify_image_key(session_id, key):
+    return constant_time_compare(key, image_key(session_id))
+
+
+def make_form_stamp(session_id, now=None):
+    """Signed record of when the attendance form of ``session_id`` was opened."""
+    issued = int(time.time() if now is None else now)
+    payload = f"{_b36(session_id)}.{_b36(issued)}"
+    return f"{payload}.{_signature(f'{FORM_STAMP_SALT}:{payload}')}"
+
+
+def verify_form_stamp(stamp, session_id, max_age, now=None):
+    """True if ``stamp`` is genuine, for ``session_id`` and at most ``max_age`` seconds old."""
+    now = time.time() if now is None else now
+    try:
+        payload, signature = stamp.rsplit(".", 1)
+        stamped_id, issued = (int(part, 36) for part in payload.split("."))
+    except ValueError:
+        return False
+    if not constant_time_compare(signature, _signature(f"{FORM_STAMP_SALT}:{payload}")):
+        return False
+    return stamped_id == session_id and -rotate_seconds() <= now - issued <= max_age
+
+
+def verify_token(token, max_age, now=None):
+    """
+    Return the session id of ``token``, checking only the token itself.
+
+    ``max_age`` is how many seconds after the start of its window a token is
+    still accepted (a scan needs a little grace); None skips that check for
+    a submission whose form stamp is checked instead. Raises InvalidToken for
+    forgeries and StaleToken for genuine tokens that rotated out or belong to
+    an expired session.
+    """
+    now = time.time() if now is None else now
+    try:
+        payload, signature = token.rsplit(".", 1)
+        session_id, window, ttl = (int(part, 36) for part in payload.split("."))
+    except ValueError:
+        raise InvalidToken("Malformed QR token")
+    if not constant_time_compare(signature, _signature(payload)):
+        raise InvalidToken("Bad QR token signature")
+
+    started = window * rotate_seconds()
+    # One window of clock skew is tolerated in the other direction.
+    if max_age is not None and not -rotate_seconds() <= now - started <= max_age:
+        raise StaleToken(session_id)
+    if now > started + ttl:
+        raise StaleToken(session_id)
+    return session_id
+
+
+def scan_max_age():
+    """Grace for opening the page: the current window plus SCAN_GRACE_WINDOWS."""
+    return rotate_seconds() * (1 + token_setting("SCAN_GRACE_WINDOWS", 1))
+
+
+def submit_max_age():
+    """
+    Grace for submitting a form, counted from when it was opened (its stamp),
+    or for a stampless post from the start of the token's window: one window
+    plus SUBMIT_GRACE_WINDOWS. Kept to a few rotations, or a token forwarded
+    from the room would stay usable long after it left the screen.
+    """
+    return max(rotate_seconds() * (1 + token_setting("SUBMIT_GRACE_WINDOWS", 3)), scan_max_age())
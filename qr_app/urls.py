@@ -9,6 +9,8 @@ urlpatterns = [
     # Students
     path("students/", views.student_list, name="student_list"),
     path("students/add/", views.add_student, name="add_student"),
+    path("students/import/", views.import_students_view, name="import_students"),
+    path("students/search/", views.student_search, name="student_search"),
 
     # Subjects
     path("subjects/", views.subject_list, name="subject_list"),
@@ -20,6 +22,7 @@ urlpatterns = [
     path("qr/scan/form/<str:token>/", views.scan_form, name="scan_form"),
 
     path("qr/generate/", views.generate_qr, name="attendance_live"),
+    path("qr/session/<int:session_id>/image/<str:key>/", views.qr_image_view, name="qr_image"),
 
     # Attendance
     path("form/<str:token>/", views.attendance_form, name="attendance_form"),
@@ -28,7 +31,15 @@ urlpatterns = [
     path("attendance/faculty/", views.attendance_faculty, name="attendance_faculty"),
     path("attendance/stu/", views.attendance_stu, name="attendance_stu"),
     path("attendance/report/", views.report, name="report"),
+    path("attendance/defaulters/", views.defaulters, name="defaulters"),
+    path("attendance/register/", views.attendance_register, name="attendance_register"),
     path("api/session/<int:session_id>/attendance/", views.session_attendance_api, name="session_attendance_api"),
+    path("api/session/<int:session_id>/attendance/bulk/", views.bulk_attendance_api, name="bulk_attendance_api"),
+    path("api/session/<int:session_id>/stream/", views.session_attendance_stream, name="session_attendance_stream"),
+    path("attendance/report/jobs/<slug:job_id>/", views.report_job, name="report_job"),
+    path("attendance/report/jobs/<slug:job_id>/download/", views.report_job_download, name="report_job_download"),
+    path("api/report/", views.report_api, name="report_api"),
+    path("api/metrics/", views.metrics, name="metrics"),
 
     # Ajax endpoint
     path("ajax/get-subjects/", views.ajax_get_subjects, name="ajax_get_subjects"),
@@ -1,16 +1,42 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag, urlencode
+from django.utils.dateparse import parse_date
 from datetime import timedelta
-import qrcode, base64, io, uuid
-import socket
-import csv
-from .models import Student, Subject, QRSession, Attendance, Branch 
+import base64, io, json, uuid
+from collections import Counter
+from .models import Student, Subject, QRSession, Attendance, Branch, StudentSubjectStats
 from django.utils.timezone import now
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from .forms import StudentForm, SubjectForm
-from django.db.models import Q
+from .forms import StudentForm, SubjectForm, StudentImportForm
+from .importers import import_students
+from .ingest import ingestor, mark_roll_numbers
+from .admission import admission, client_ip
+from .catalog import cached_page, page_cache
+from .cache import get_qr_session, get_qr_session_by_id, cache_qr_session, qr_session_cache
+from .search import search_setting, search_students
+from .roster import build_roster, cache_roster, get_roster, recheck_roster, roster_stats
+from .exports import stream_csv, faculty_rows, subject_sheet_rows
+from .reports import DONE, faculty_queryset, get_job, request_report
+from .pagination import keyset_page
+from .summary import todays_total, subjects_with_attendance
+from .stats import count_session_held, stats_for_student
+from .history import FILTERS as HISTORY_FILTERS, history_page, student_summary
+from .analytics import DEFAULT_THRESHOLD, Scope, get_matrix
+from .register import build_register, register_xlsx
+from .replica import replica_reads
+from .live import aevent_stream, event_stream, hub, session_version
+from .qr import CONTENT_TYPES, ERROR_CORRECTION, MAX_BOX_SIZE, qr_image, qr_image_cache, qr_setting, render_qr
+from .tokens import (
+    InvalidToken, StaleToken, current_window, image_key, is_signed, make_form_stamp, make_token, rotate_seconds,
+    scan_max_age, signed_tokens_enabled, submit_max_age, verify_form_stamp, verify_image_key, verify_token,
+)
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Least
 
 
 
@@ -20,16 +46,15 @@ def home(request):
 
 
 # 📊 Dashboard (overall view)
+@replica_reads
 def dashboard(request):
-    from .models import Student, Subject, Attendance
-    from django.utils.timezone import now
-
     students_count = Student.objects.count()
     subjects_count = Subject.objects.count()
-    todays_attendance_count = Attendance.objects.filter(timestamp__date=now().date()).count()
-    reports_count = Attendance.objects.values("qr_session__subject").distinct().count()
+    # Read from the incrementally maintained counters (see summary.py)
+    todays_attendance_count = todays_total()
+    reports_count = subjects_with_attendance()
 
-    attendance = Attendance.objects.all().order_by("-timestamp")[:10]
+    attendance = Attendance.objects.select_related("student", "qr_session__subject").order_by("-timestamp")[:10]
 
     return render(request, "qr_app/dashboard.html", {
         "students_count": students_count,
@@ -42,8 +67,9 @@ def dashboard(request):
 
 
 
+@replica_reads
 def attendance_faculty(request):
-    today = timezone.now().date()
+    today = timezone.localdate()
     subjects = Subject.objects.all()
     branches = Branch.objects.all()
     semester_choices = Student._meta.get_field("semester").choices
@@ -54,58 +80,40 @@ def attendance_faculty(request):
     export = request.GET.get("export")
 
     # Base query
-    attendance = Attendance.objects.filter(timestamp__date=today).select_related("student", "qr_session__subject")
+    attendance = faculty_queryset(today, branch_id, semester, subject_id).select_related("student", "qr_session__subject")
 
-    if branch_id:
-        attendance = attendance.filter(student__branch_id=branch_id)
-    if semester:
-        attendance = attendance.filter(student__semester=semester)
     if subject_id:
-        attendance = attendance.filter(qr_session__subject_id=subject_id)
         selected_subject = Subject.objects.get(id=subject_id)
     else:
         selected_subject = None
 
+    # Today's total over the same rows as the table. The counters are keyed by
+    # the subject (and its branch), the rows filter on the student's branch and
+    # semester, so only a subject-only filter can be served from them.
+    if branch_id or semester:
+        today_total = attendance.count()
+    elif subject_id:
+        today_total = todays_total(subject_id=subject_id)
+    else:
+        today_total = todays_total()
+
     # 🔹 CSV Export
     if export == "csv":
-        response = HttpResponse(content_type="text/csv")
-        response['Content-Disposition'] = f'attachment; filename="attendance_{today}.csv"'
-        writer = csv.writer(response)
-        writer.writerow(["Roll No", "Name", "Subject", "Time"])
-        for r in attendance:
-            writer.writerow([r.student.roll_no, r.student.name, r.qr_session.subject.name, r.timestamp.strftime("%H:%M:%S")])
-        return response
-
-    # 🔹 PDF Export
+        return stream_csv(
+            f"attendance_{today}.csv",
+            ["Roll No", "Name", "Subject", "Time"],
+            faculty_rows(attendance),
+        )
+
+    # 🔹 PDF Export (rendered in the background, see reports.py)
     if export == "pdf":
-        response = HttpResponse(content_type="application/pdf")
-        response['Content-Disposition'] = f'attachment; filename="attendance_{today}.pdf"'
-
-        p = canvas.Canvas(response, pagesize=letter)
-        width, height = letter
-
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(50, height - 50, f"Attendance Report ({today})")
-        y = height - 80
-        p.setFont("Helvetica", 11)
-        p.drawString(50, y, "Roll No")
-        p.drawString(150, y, "Name")
-        p.drawString(300, y, "Subject")
-        p.drawString(450, y, "Time")
-
-        y -= 20
-        for r in attendance:
-            p.drawString(50, y, str(r.student.roll_no))
-            p.drawString(150, y, r.student.name)
-            p.drawString(300, y, r.qr_session.subject.name)
-            p.drawString(450, y, r.timestamp.strftime("%H:%M:%S"))
-            y -= 20
-            if y < 50:
-                p.showPage()
-                y = height - 50
-
-        p.save()
-        return response
+        job = request_report("faculty", {
+            "date": str(today),
+            "branch_id": branch_id or None,
+            "semester": semester or None,
+            "subject_id": subject_id or None,
+        }, f"attendance_{today}.pdf")
+        return report_job_response(job)
 
     return render(request, "qr_app/attendance_faculty.html", {
         "attendance": attendance,
@@ -113,7 +121,96 @@ def attendance_faculty(request):
         "subjects": subjects,
         "branches": branches,
         "semester_choices": semester_choices,
-        "selected_subject": selected_subject
+        "selected_subject": selected_subject,
+        "today_total": today_total,
+    })
+
+
+# 🗓️ Monthly Register (students × classes held, see register.py)
+@replica_reads
+def attendance_register(request):
+    today = timezone.localdate()
+    subjects = Subject.objects.all().order_by("code")
+    subject_id = request.GET.get("subject")
+    month_str = request.GET.get("month") or today.strftime("%Y-%m")
+    export = request.GET.get("export")
+
+    try:
+        year, month = (int(part) for part in month_str.split("-"))
+        if not 1 <= month <= 12:
+            raise ValueError
+    except ValueError:
+        year, month = today.year, today.month
+        month_str = today.strftime("%Y-%m")
+
+    register = None
+    if subject_id:
+        subject = get_object_or_404(Subject, id=subject_id)
+        register = build_register(subject, year, month)
+
+        if export == "csv":
+            return stream_csv(register.filename("csv"), register.header(), register.rows())
+        if export == "xlsx":
+            try:
+                return register_xlsx(register)
+            except ImportError:
+                return HttpResponse("XLSX export needs openpyxl installed", status=501)
+
+    return render(request, "qr_app/attendance_register.html", {
+        "subjects": subjects,
+        "month": month_str,
+        "register": register,
+        "header": register.header() if register else [],
+        "rows": list(register.rows()) if register else [],
+    })
+
+
+# 🚩 Defaulters (branch + semester over a date range, see analytics.py)
+@replica_reads
+def defaulters(request):
+    today = timezone.localdate()
+    branches = Branch.objects.all().order_by("name")
+    semester_choices = Student._meta.get_field("semester").choices
+
+    branch_id = request.GET.get("branch")
+    semester = request.GET.get("semester")
+    date_from = parse_date(request.GET.get("from") or "") or today - timedelta(days=120)
+    date_to = parse_date(request.GET.get("to") or "") or today
+    show_all = request.GET.get("all") == "1"
+    try:
+        threshold = float(request.GET.get("threshold") or DEFAULT_THRESHOLD)
+    except ValueError:
+        threshold = DEFAULT_THRESHOLD
+
+    rows = None
+    matrix = None
+    if branch_id and semester:
+        try:
+            scope = Scope(int(branch_id), int(semester), date_from, date_to)
+        except ValueError:
+            return HttpResponse("branch and semester must be numbers", status=400)
+        matrix = get_matrix(scope)
+        rows = matrix.report(threshold) if show_all else matrix.defaulters(threshold)
+
+        if request.GET.get("export") == "csv":
+            return stream_csv(
+                f"defaulters_{branch_id}_sem{semester}_{date_from}_{date_to}.csv",
+                ["Roll No", "Name", "Attended", "Held", "Percentage", "Subjects Below",
+                 "Longest Absence", "Current Absence"],
+                ([r["roll_no"], r["name"], r["attended"], r["held"], r["percentage"],
+                  " ".join(f"{s['code']}:{s['percentage']}" for s in r["subjects_below"]),
+                  r["longest_absence"], r["current_absence"]] for r in rows),
+            )
+
+    return render(request, "qr_app/defaulters.html", {
+        "branches": branches,
+        "semester_choices": semester_choices,
+        "date_from": date_from,
+        "date_to": date_to,
+        "threshold": threshold,
+        "show_all": show_all,
+        "rows": rows,
+        "matrix": matrix,
     })
 
 
@@ -129,12 +226,34 @@ def add_student(request):
     return render(request, "qr_app/add_student.html", {"form": form})
 
 
+# 📥 Bulk Student Import (CSV upload, see importers.py)
+def import_students_view(request):
+    result = None
+    if request.method == "POST":
+        form = StudentImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Rows are streamed from the uploaded file, not read into memory
+            lines = io.TextIOWrapper(form.cleaned_data["file"].file, encoding="utf-8-sig", newline="")
+            result = import_students(
+                lines,
+                enroll=form.cleaned_data["enroll"],
+                create_branches=form.cleaned_data["create_branches"],
+            )
+    else:
+        form = StudentImportForm()
+    return render(request, "qr_app/import_students.html", {"form": form, "result": result})
+
 
 
 
 
-# 👨‍🎓 Student List
+
+# 👨‍🎓 Student List (cached per filters + catalog version, see catalog.py)
 def student_list(request):
+    return cached_page(request, "student_list", ("branch", "semester", "q"), lambda: _render_student_list(request))
+
+
+def _render_student_list(request):
     students = Student.objects.all().order_by("roll_no")
     branches = Branch.objects.all()
     semester_choices = Student._meta.get_field("semester").choices
@@ -149,9 +268,8 @@ def student_list(request):
     if semester:
         students = students.filter(semester=semester)
     if query:
-        students = students.filter(
-            Q(roll_no__icontains=query) | Q(name__icontains=query)
-        )
+        # Ranked prefix search on the FTS5 index (see search.py)
+        students = search_students(query, search_setting("LIST_LIMIT"), students)
 
     return render(request, "qr_app/student_list.html", {
         "students": students,
@@ -163,6 +281,25 @@ def student_list(request):
 
 
 
+# 🔎 Student autocomplete (?q=<prefix>&limit=<n>, cached like the lists)
+def student_search(request):
+    return cached_page(request, "student_search", ("q", "limit"), lambda: _student_search_json(request))
+
+
+def _student_search_json(request):
+    query = request.GET.get("q", "").strip()
+    try:
+        limit = int(request.GET.get("limit") or search_setting("AUTOCOMPLETE_LIMIT"))
+    except ValueError:
+        return JsonResponse({"error": "limit must be a number"}, status=400)
+    limit = max(1, min(limit, search_setting("MAX_LIMIT")))
+    students = search_students(query, limit, Student.objects.select_related("branch")) if query else []
+    return JsonResponse({"results": [
+        {"id": s.id, "roll_no": s.roll_no, "name": s.name, "branch": s.branch.name if s.branch else None}
+        for s in students
+    ]})
+
+
 # 📖 Add Subject
 def add_subject(request):
     if request.method == "POST":
@@ -177,8 +314,12 @@ def add_subject(request):
 
 
 
-# 📖 Subject List
+# 📖 Subject List (cached, see catalog.py)
 def subject_list(request):
+    return cached_page(request, "subject_list", ("branch", "semester"), lambda: _render_subject_list(request))
+
+
+def _render_subject_list(request):
     subjects = Subject.objects.all().order_by("code")
     branches = Branch.objects.all()
     semester_choices = Subject._meta.get_field("semester").choices
@@ -200,8 +341,12 @@ def subject_list(request):
 
 
 
-# 🔄 Ajax for Subjects (filter by branch & semester)
+# 🔄 Ajax for Subjects (filter by branch & semester, cached)
 def ajax_get_subjects(request):
+    return cached_page(request, "ajax_get_subjects", ("branch", "semester"), lambda: _subjects_json(request))
+
+
+def _subjects_json(request):
     branch_id = request.GET.get("branch")
     semester = request.GET.get("semester")
     if not branch_id or not semester:
@@ -221,8 +366,9 @@ def generate_qr(request):
     branches = Branch.objects.all().order_by("name")
     subjects = []  # initial
 
-    qr_code_b64 = None
+    qr_image_url = None
     qr_url = None
+    qr_rotation = None
     error = None
     selected_branch_id = request.GET.get("branch") or ""
     selected_semester = request.GET.get("semester") or ""
@@ -249,23 +395,35 @@ def generate_qr(request):
             token = uuid.uuid4().hex
             expires_at = timezone.now() + timedelta(minutes=duration_minutes)
 
-            qr_session = QRSession.objects.create(
-                subject=subject,
-                token=token,
-                created_at=timezone.now(),
-                expires_at=expires_at
-            )
-
-            # Build attendance URL for students (use token)
-            # If your attendance URL expects id, adjust accordingly.
-            server_host = request.get_host()  # host:port
-            qr_url = request.scheme + "://" + server_host + f"/attendance/form/{qr_session.token}/"
+            with transaction.atomic():
+                qr_session = QRSession.objects.create(
+                    subject=subject,
+                    token=token,
+                    created_at=timezone.now(),
+                    expires_at=expires_at
+                )
+                roster = build_roster(qr_session)
+                # Counts as held for everyone on the roster (attendance percentages)
+                count_session_held(qr_session, [entry.student_id for entry in roster.entries.values()])
+            # Cached only once committed: a rolled-back id could be handed out again
+            cache_qr_session(qr_session)
+            cache_roster(qr_session, roster)
+
+            # Build attendance URL for students (signed, rotating token unless disabled)
+            if signed_tokens_enabled():
+                now_ts = timezone.now().timestamp()
+                window = current_window(now_ts)
+                qr_url = _attendance_url(request, make_token(qr_session, window))
+                qr_rotation = {
+                    "seconds": rotate_seconds(),
+                    "window": window,
+                    "elapsed_ms": int((now_ts - window * rotate_seconds()) * 1000),
+                }
+            else:
+                qr_url = _attendance_url(request, qr_session.token)
 
-            # Generate QR image (PNG base64)
-            qr_img = qrcode.make(qr_url)
-            buffer = io.BytesIO()
-            qr_img.save(buffer, format="PNG")
-            qr_code_b64 = base64.b64encode(buffer.getvalue()).decode()
+            # QR image is served (and cached) by qr_image_view
+            qr_image_url = reverse("qr_image", args=[qr_session.id, image_key(qr_session.id)])
 
     # If branch+semester pre-selected (GET), load subjects for dropdown (optional)
     if selected_branch_id and selected_semester:
@@ -274,8 +432,9 @@ def generate_qr(request):
     context = {
     "branches": branches,
     "subjects": subjects,
-    "qr_code": qr_code_b64,
+    "qr_image_url": qr_image_url,
     "qr_url": qr_url,
+    "qr_rotation": qr_rotation,
     "error": error,
     "selected_branch_id": selected_branch_id,
     "selected_semester": selected_semester,
@@ -285,6 +444,57 @@ def generate_qr(request):
     return render(request, "qr_app/attendance_live.html", context)
 
 
+def _attendance_url(request, token):
+    server_host = request.get_host()  # host:port
+    return request.scheme + "://" + server_host + f"/attendance/form/{token}/"
+
+
+# 🖼️ QR image of a session (SVG by default, ?format=png&ec=H&box=12 optional)
+#     With signed tokens, ?w=<window> selects the rotation window to encode.
+#     The URL carries an HMAC of the session id, known only to the page that created it.
+def qr_image_view(request, session_id, key):
+    if not verify_image_key(session_id, key):
+        raise Http404("No such QR image")
+    session = get_object_or_404(QRSession, id=session_id)
+
+    fmt = request.GET.get("format", "svg")
+    ec = request.GET.get("ec", qr_setting("ERROR_CORRECTION", "M")).upper()
+    if fmt not in CONTENT_TYPES or ec not in ERROR_CORRECTION:
+        return HttpResponse("Unsupported format or error-correction level", status=400)
+    try:
+        box_size = min(max(int(request.GET.get("box", qr_setting("BOX_SIZE", 10))), 1), MAX_BOX_SIZE)
+    except ValueError:
+        return HttpResponse("box must be a number", status=400)
+
+    # The image behind a URL never changes, so browsers may keep it for the session's lifetime
+    lifetime = max(int((session.expires_at - timezone.now()).total_seconds()), 60)
+    cache_control = f"public, max-age={lifetime}, immutable"
+    ttl = lifetime
+    if signed_tokens_enabled():
+        now_window = current_window()
+        try:
+            window = int(request.GET.get("w", now_window))
+        except ValueError:
+            return HttpResponse("w must be a number", status=400)
+        if abs(window - now_window) > 1:
+            return HttpResponse("Rotation window out of range", status=400)
+        if "w" not in request.GET:
+            cache_control = "no-cache"  # the plain URL follows the rotation
+        data = _attendance_url(request, make_token(session, window))
+        ttl = 3 * rotate_seconds()
+    else:
+        data = _attendance_url(request, session.token)
+    image, etag = qr_image(data, fmt, ec, box_size, ttl=ttl)
+
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(image, content_type=CONTENT_TYPES[fmt])
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
 # 📷 QR Scan Page (student side)
 def scan_qr(request):
     return render(request, "qr_app/scan.html")
@@ -298,11 +508,45 @@ def scan_form(request, token):
 from datetime import datetime
 
 def attendance_form(request, token):
-    session = get_object_or_404(QRSession, token=token)
+    stamp = None
+    if is_signed(token):
+        # Forged, rotated-out and expired tokens are turned away before any query;
+        # a form opened from a valid token may still be submitted for a while,
+        # counted from when it was opened (its stamp).
+        if request.method == "POST":
+            stamp = request.POST.get("stamp")
+            max_age = None if stamp else submit_max_age()
+        else:
+            max_age = scan_max_age()
+        try:
+            session_id = verify_token(token, max_age)
+            if stamp and not verify_form_stamp(stamp, session_id, submit_max_age()):
+                raise StaleToken(session_id)
+        except StaleToken:
+            return render(request, "qr_app/attendance_form.html", {"token": token, "expired": True})
+        except InvalidToken:
+            raise Http404("Invalid QR token.")
+        if request.method != "POST":
+            stamp = make_form_stamp(session_id)
+        session = get_qr_session_by_id(session_id)
+    else:
+        session = get_qr_session(token)
     expired = timezone.now() > session.expires_at
     message = None
 
     if request.method == "POST" and not expired:
+        # Pace the submission burst before any roster or database work
+        decision = admission.admit(session.id, client_ip(request))
+        if not decision.admitted:
+            response = render(request, "qr_app/attendance_form.html", {
+                "token": token,
+                "stamp": stamp,
+                "expired": False,
+                "message": f"⏳ Too many students are submitting right now. Please try again in {decision.retry_after} s.",
+            }, status=503)
+            response["Retry-After"] = str(decision.retry_after)
+            return response
+
         roll_no = request.POST.get("roll_no")
         dob_input = request.POST.get("dob")
         confirm = request.POST.get("confirm")
@@ -310,39 +554,55 @@ def attendance_form(request, token):
         try:
             # Convert string "YYYY-MM-DD" to date object
             dob = datetime.strptime(dob_input, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            dob = None
+            message = "⚠️ Please enter DOB in valid format (YYYY-MM-DD)."
+
+        # Roll/DOB check and enrollment check are both roster lookups
+        roster = get_roster(session) if dob else None
+        entry = roster.verify(roll_no, dob) if roster else None
 
-            student = Student.objects.get(roll_no=roll_no, dob=dob)
+        if dob and entry is None:
+            # Not on the roster: rebuilt if it predates a catalog edit, misses are remembered
+            roster, entry, is_student = recheck_roster(session, roster, roll_no, dob)
+            if entry is None:
+                message = (f"❌ You are not enrolled in {session.subject.name}!" if is_student
+                           else "❌ Invalid Roll No or Date of Birth!")
 
-            already = Attendance.objects.filter(student=student, qr_session=session).exists()
+        if entry:
+            student = roster.student(roll_no)
+
+            already = (
+                ingestor.is_pending(student.id, session.id)
+                or Attendance.objects.filter(student_id=student.id, qr_session=session).exists()
+            )
             if already:
                 message = "⚠️ Attendance already marked!"
             else:
                 if confirm == "yes":
-                    Attendance.objects.create(student=student, qr_session=session)
-
-                    request.session["student_roll"] = student.roll_no
-
-                    return render(request, "qr_app/success.html", {
-                        "student": student,
-                        "qr_session": session,
-                        "subject": session.subject
-                    })
+                    # Queued for the batched writer; the student is confirmed right away
+                    if ingestor.submit(student.id, session.id):
+                        request.session["student_roll"] = student.roll_no
+
+                        return render(request, "qr_app/success.html", {
+                            "student": student,
+                            "qr_session": session,
+                            "subject": session.subject
+                        })
+                    message = "⚠️ Attendance already marked!"
                 else:
 
                     request.session["student_roll"] = student.roll_no
 
                     return render(request, "qr_app/confirm_attendance.html", {
                         "student": student,
-                        "qr_session": session
+                        "qr_session": session,
+                        "stamp": stamp
                     })
 
-        except Student.DoesNotExist:
-            message = "❌ Invalid Roll No or Date of Birth!"
-        except ValueError:
-            message = "⚠️ Please enter DOB in valid format (YYYY-MM-DD)."
-
     return render(request, "qr_app/attendance_form.html", {
         "token": token,
+        "stamp": stamp,
         "expired": expired,
         "message": message
     })
@@ -352,8 +612,9 @@ def attendance_form(request, token):
 
 
 # 📊 Attendance Dashboard
+@replica_reads
 def attendance_dashboard(request):
-    today = timezone.now().date()
+    today = timezone.localdate()
     subjects = Subject.objects.all()
 
     subject_id = request.GET.get("subject")
@@ -373,69 +634,36 @@ def attendance_dashboard(request):
         except Exception:
             selected_date = today
 
-        # All students for that subject
-        students = Student.objects.filter(subjects=selected_subject).order_by("roll_no")
+        # All students for that subject, with their overall attended/held counters
+        subject_stats = StudentSubjectStats.objects.filter(student=OuterRef("pk"), subject=selected_subject)
+        students = Student.objects.filter(subjects=selected_subject).order_by("roll_no").annotate(
+            attended=Subquery(subject_stats.values("attended")[:1]),
+            held=Subquery(subject_stats.values("held")[:1]),
+        ).annotate(counted=Least("attended", "held"))  # the Overall column stays at or below 100%
 
         # Present students
         present = Attendance.objects.filter(
             qr_session__subject=selected_subject,
-            timestamp__date=selected_date
-        ).select_related("student")
+            attendance_date=selected_date
+        )
 
-        present_ids = [att.student.id for att in present]
+        present_ids = set(present.values_list("student_id", flat=True))
 
-        # 🔹 Export to CSV
+        # 🔹 Export to CSV (streamed; presence resolved in SQL)
         if export == "csv":
-            response = HttpResponse(content_type="text/csv")
-            filename = f"attendance_{selected_subject.code}_{selected_date}.csv"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-            writer = csv.writer(response)
-            writer.writerow(["Roll No", "Name", "Status"])
-
-            for student in students:
-                status = "Present" if student.id in present_ids else "Absent"
-                writer.writerow([student.roll_no, student.name, status])
-            return response
+            return stream_csv(
+                f"attendance_{selected_subject.code}_{selected_date}.csv",
+                ["Roll No", "Name", "Status"],
+                subject_sheet_rows(selected_subject, selected_date),
+            )
 
-        # 🔹 Export to PDF
+        # 🔹 Export to PDF (rendered in the background, see reports.py)
         if export == "pdf":
-            response = HttpResponse(content_type="application/pdf")
-            filename = f"attendance_{selected_subject.code}_{selected_date}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-            p = canvas.Canvas(response, pagesize=letter)
-            width, height = letter
-
-            # Title
-            p.setFont("Helvetica-Bold", 14)
-            p.drawString(50, height - 50, f"Attendance Sheet - {selected_subject.name} ({selected_subject.code})")
-            p.setFont("Helvetica", 12)
-            p.drawString(50, height - 70, f"Date: {selected_date}")
-
-            # Table headers
-            y = height - 100
-            p.setFont("Helvetica-Bold", 11)
-            p.drawString(50, y, "Roll No")
-            p.drawString(150, y, "Name")
-            p.drawString(400, y, "Status")
-
-            # Rows
-            p.setFont("Helvetica", 11)
-            y -= 20
-            for student in students:
-                status = "Present ✓" if student.id in present_ids else "Absent ×"
-                p.drawString(50, y, str(student.roll_no))
-                p.drawString(150, y, student.name)
-                p.drawString(400, y, status)
-                y -= 20
-                if y < 50:  # New page if too long
-                    p.showPage()
-                    y = height - 50
-
-            p.showPage()
-            p.save()
-            return response
+            job = request_report("subject", {
+                "subject_id": selected_subject.id,
+                "date": str(selected_date),
+            }, f"attendance_{selected_subject.code}_{selected_date}.pdf")
+            return report_job_response(job)
 
     return render(request, "qr_app/attendance_dashboard.html", {
         "subjects": subjects,
@@ -464,10 +692,7 @@ def attendance_qrlive(request):
 
         # QR code generate करें (id या session की info encode करें)
         data = f"{qr_session.id}"
-        img = qrcode.make(data)
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        qr_code = base64.b64encode(buffer.getvalue()).decode()
+        qr_code = base64.b64encode(render_qr(data, "png")).decode()
 
     # Attendance records fetch करें (latest 20)
     attendance = Attendance.objects.select_related('student','qr_session__subject').order_by('-timestamp')[:20]
@@ -479,62 +704,264 @@ def attendance_qrlive(request):
     })
 
 def session_attendance_api(request, session_id):
+    """
+    Attendance of one session, newest first. ``?since=<id>`` returns only
+    rows added after that id; ``cursor`` in the response is the value to
+    send next time. Responses carry an ETag built from the session's version
+    counter, so unchanged polls get a 304 without querying Attendance.
+    """
     session = get_object_or_404(QRSession, id=session_id)
     # if you want to restrict by IP/WiFi, add checks here
+    active = session.is_active()
+    since = request.GET.get("since") or ""
+    if since and not since.isdigit():
+        return JsonResponse({"error": "since must be an attendance id"}, status=400)
+
+    etag = quote_etag(f"{session.id}-{session_version(session.id)}-{int(active)}-{since}")
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    records = Attendance.objects.filter(qr_session=session).order_by('-timestamp', '-id')
+    if since:
+        records = records.filter(id__gt=int(since))
+    rows = records.values_list("id", "student__roll_no", "student__name", "timestamp")
 
-    records = Attendance.objects.filter(qr_session=session).select_related('student').order_by('-timestamp')
     data = []
-    for r in records:
+    cursor = int(since) if since else 0
+    for attendance_id, roll_no, name, timestamp in rows:
+        cursor = max(cursor, attendance_id)
         data.append({
-            "roll_no": r.student.roll_no,
-            "name": r.student.name,
-            "timestamp": r.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            "roll_no": roll_no,
+            "name": name,
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S")
         })
 
+    response = JsonResponse({
+        "session": session.id,
+        "active": active,
+        "records": data,
+        "cursor": cursor,
+    })
+    response["ETag"] = etag
+    return response
+
+
+# 📥 Bulk attendance (kiosk / teacher device), see ingest.mark_roll_numbers()
+BULK_MAX_ROLLS = 1000
+
+
+def bulk_attendance_api(request, session_id):
+    """
+    POST ``{"roll_nos": [...]}`` to mark a whole class present in one round
+    trip. Needs a logged-in user (and the CSRF header like any session POST);
+    answers with the outcome per roll number and their counts.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    session = get_object_or_404(QRSession.objects.select_related("subject"), id=session_id)
+
+    try:
+        roll_nos = json.loads(request.body)["roll_nos"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Body must be JSON like {"roll_nos": [...]}'}, status=400)
+    if not isinstance(roll_nos, list) or not all(isinstance(r, str) for r in roll_nos):
+        return JsonResponse({"error": "roll_nos must be a list of strings"}, status=400)
+    roll_nos = [r.strip() for r in roll_nos if r.strip()]
+    if len(roll_nos) > BULK_MAX_ROLLS:
+        return JsonResponse({"error": f"At most {BULK_MAX_ROLLS} roll numbers per request"}, status=400)
+
+    results = mark_roll_numbers(session, roll_nos)
     return JsonResponse({
         "session": session.id,
-        "active": session.is_active() if hasattr(session, "is_active") else True,
-        "records": data
+        "active": session.is_active(),
+        "results": results,
+        "counts": Counter(results.values()),
     })
 
 
+# 📡 Live attendance stream (Server-Sent Events, see live.py)
+async def session_attendance_stream(request, session_id):
+    session = await QRSession.objects.filter(id=session_id).afirst()
+    if session is None:
+        raise Http404("No QRSession matches the given query.")
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.GET.get("last_id") or 0)
+    except ValueError:
+        last_id = 0
+
+    stream = aevent_stream if isinstance(request, ASGIRequest) else event_stream
+    response = StreamingHttpResponse(stream(session, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 # 📡 Live Attendance
 def attendance_stu(request):
-    today = timezone.now().date()
+    today = timezone.localdate()
     roll_no = request.session.get("student_roll")  # session se roll no lo
-    try:
-        student = Student.objects.get(roll_no=roll_no)
-    except Student.DoesNotExist:
-        student = None
+    summary = student_summary(roll_no) if roll_no else None
 
     filter_type = request.GET.get("filter", "today")
+    if filter_type not in HISTORY_FILTERS:
+        filter_type = "today"
 
-    if student:
-        if filter_type == "today":
-            attendance = Attendance.objects.filter(student=student, timestamp__date=today).order_by("-timestamp")
-        elif filter_type == "week":
-            start_date = today - timedelta(days=7)
-            attendance = Attendance.objects.filter(student=student, timestamp__date__gte=start_date).order_by("-timestamp")
-        else:  # all
-            attendance = Attendance.objects.filter(student=student).order_by("-timestamp")
-    else:
-        attendance = []
+    attendance, next_query = [], None
+    if summary:
+        try:
+            attendance, next_cursor = history_page(
+                summary["student"]["id"], filter_type, today, request.GET.get("cursor")
+            )
+        except ValueError:
+            return redirect(f"{reverse('attendance_stu')}?filter={filter_type}")
+        if next_cursor:
+            next_query = urlencode({"filter": filter_type, "cursor": next_cursor})
 
     return render(request, "qr_app/attendance_stu.html", {
         "attendance": attendance,
         "today": today,
-        "student": student,
+        "student": summary["student"] if summary else None,
+        "summary": summary,
         "filter": filter_type,
+        "next_query": next_query,
+        "first_page": not request.GET.get("cursor"),
+        "subject_stats": stats_for_student(summary["student"]["id"]) if summary else [],
     })
 
 
 
 
 
-# 📑 Attendance Report
+# 📑 Attendance Report (keyset paginated, see pagination.py)
+REPORT_ORDERING = ("qr_session__subject", "student", "id")
+REPORT_COLUMNS = (
+    "student__roll_no", "student__name",
+    "qr_session__subject__code", "qr_session__subject__name", "timestamp",
+)
+REPORT_PAGE_SIZE = 50
+REPORT_MAX_PAGE_SIZE = 500
+
+
+def _report_queryset(params):
+    attendance = Attendance.objects.all()
+    if params.get("branch"):
+        attendance = attendance.filter(student__branch_id=params["branch"])
+    if params.get("semester"):
+        attendance = attendance.filter(student__semester=params["semester"])
+    if params.get("subject"):
+        attendance = attendance.filter(qr_session__subject_id=params["subject"])
+    date_from = parse_date(params.get("from") or "")
+    date_to = parse_date(params.get("to") or "")
+    if date_from:
+        attendance = attendance.filter(attendance_date__gte=date_from)
+    if date_to:
+        attendance = attendance.filter(attendance_date__lte=date_to)
+    return attendance.values(*REPORT_ORDERING, *REPORT_COLUMNS)
+
+
+def _report_page(request):
+    try:
+        limit = min(int(request.GET.get("limit", REPORT_PAGE_SIZE)), REPORT_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = REPORT_PAGE_SIZE
+    return keyset_page(
+        _report_queryset(request.GET), REPORT_ORDERING,
+        cursor=request.GET.get("cursor"), limit=max(limit, 1),
+    )
+
+
+@replica_reads
 def report(request):
-    attendance = Attendance.objects.all().order_by("qr_session__subject", "student")
-    return render(request, "qr_app/report.html", {"attendance": attendance})
+    try:
+        rows, next_cursor = _report_page(request)
+    except ValueError:
+        return redirect("report")
+
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    next_query = None
+    if next_cursor:
+        params["cursor"] = next_cursor
+        next_query = params.urlencode()
+
+    return render(request, "qr_app/report.html", {
+        "records": rows,
+        "next_query": next_query,
+        "branches": Branch.objects.all(),
+        "subjects": Subject.objects.all().order_by("code"),
+        "semester_choices": Student._meta.get_field("semester").choices,
+    })
+
+
+@replica_reads
+def report_api(request):
+    try:
+        rows, next_cursor = _report_page(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    return JsonResponse({
+        "results": [
+            {
+                "id": r["id"],
+                "roll_no": r["student__roll_no"],
+                "name": r["student__name"],
+                "subject_code": r["qr_session__subject__code"],
+                "subject": r["qr_session__subject__name"],
+                "timestamp": r["timestamp"].isoformat(),
+            }
+            for r in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+# 🖨️ Background PDF reports
+def report_job_response(job):
+    """Serve a finished report, or send the user to its progress page."""
+    if job.status == DONE:
+        try:
+            return FileResponse(open(job.path, "rb"), as_attachment=True, filename=job.filename)
+        except FileNotFoundError:
+            # Pruned by a newer version since the status check, or removed from disk
+            if job.kind is None:  # only known from its file: nothing to re-render from
+                raise Http404("Report expired; please export it again")
+            job = request_report(job.kind, job.params, job.filename)
+    return redirect("report_job", job_id=job.id)
+
+
+def report_job(request, job_id):
+    job = get_job(job_id)
+    if job is None:
+        raise Http404("Unknown report")
+    data = job.as_dict()
+    data["download_url"] = reverse("report_job_download", args=[job.id]) if job.status == DONE else None
+    if request.GET.get("format") == "json":
+        return JsonResponse(data)
+    return render(request, "qr_app/report_job.html", {"job": data})
+
+
+def report_job_download(request, job_id):
+    job = get_job(job_id)
+    if job is None or job.status != DONE:
+        raise Http404("Report is not ready")
+    return report_job_response(job)
+
+
+# 📈 Runtime metrics (ingestion queue, caches, ...)
+def metrics(request):
+    return JsonResponse({
+        "ingest": ingestor.stats(),
+        "admission": admission.stats(),
+        "qr_session_cache": qr_session_cache.stats(),
+        "rosters": roster_stats(),
+        "live": hub.stats(),
+        "qr_image_cache": qr_image_cache.stats(),
+        "catalog_pages": page_cache.stats(),
+    })
 
 
 # ✅ Success Page
@@ -1,6 +1,6 @@
 from pathlib import Path
-import socket
 import os
+import sys
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -8,12 +8,11 @@ SECRET_KEY = "django-insecure-%&4dfwaayogd!r)=ot3hi1ybepd=s9d%$gkcomne)rq-a&fnmq
 
 DEBUG = True
 
-s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-s.connect(("8.8.8.8", 80))
-server_ip = s.getsockname()[0]
-
-# 🔹 Automatically allow localhost + detected LAN IP
-ALLOWED_HOSTS = ["qrattendance-production-5d22.up.railway.app", '127.0.0.1', '10.218.31.108', 'localhost', f"{server_ip}", '*' ]
+# 🔹 Hosts come from the environment (comma separated); no lookups at import time
+ALLOWED_HOSTS = os.environ.get(
+    "QR_ALLOWED_HOSTS",
+    "qrattendance-production-5d22.up.railway.app,127.0.0.1,10.218.31.108,localhost,*",
+).split(",")
 
 # ✅ CSRF Trusted Origins
 CSRF_TRUSTED_ORIGINS = [
@@ -69,6 +68,63 @@ DATABASES = {
     }
 }
 
+# 🗄️ SQLite production profile (see qr_app/replica.py), on with QR_DB_PROFILE=production:
+#     WAL + tuned pragmas on every connection, a busy timeout instead of instant
+#     "database is locked", and a query-only "replica" alias for dashboard reads.
+QR_SQLITE = {
+    "PRAGMAS": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # KiB (negative), i.e. 64 MB per connection
+    },
+    "BUSY_TIMEOUT": 20,  # seconds
+}
+
+if os.environ.get("QR_DB_PROFILE") == "production":
+    _pragmas = "".join(f"PRAGMA {name}={value};" for name, value in QR_SQLITE["PRAGMAS"].items())
+    DATABASES["default"]["OPTIONS"] = {
+        "init_command": _pragmas,
+        "timeout": QR_SQLITE["BUSY_TIMEOUT"],
+        # Take the write lock at BEGIN: no deadlocked read-to-write upgrades
+        "transaction_mode": "IMMEDIATE",
+    }
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": DATABASES["default"]["NAME"],
+        "OPTIONS": {
+            "init_command": _pragmas + "PRAGMA query_only=ON;",
+            "timeout": QR_SQLITE["BUSY_TIMEOUT"],
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["qr_app.replica.ReadReplicaRouter"]
+
+# 🧊 Cache shared by every worker process. The version counters behind the cached
+#     pages, ETags and rosters live here (see qr_app/cache.py); with the per-process
+#     default, a write in one worker went unseen in the others. Redis when
+#     QR_REDIS_URL is set (needs the redis package), else a table in the database
+#     (created by migration 0007): both make a version bump one small write.
+if os.environ.get("QR_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["QR_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "qr_app_cache",
+            "OPTIONS": {"MAX_ENTRIES": 20000},
+        }
+    }
+
+# Tests get a cache of their own: cache.clear() in a test must not empty a running server's
+if sys.argv[1:2] == ["test"]:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -86,6 +142,90 @@ STATICFILES_DIRS = [BASE_DIR / "qr_app" / "static"]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ⚡ Batched attendance writer (see qr_app/ingest.py)
+QR_INGEST = {
+    "ASYNC": True,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 0.25,
+}
+
+# 🚦 Admission control for attendance submissions (see qr_app/admission.py)
+QR_ADMISSION = {
+    "ENABLED": True,
+    "SESSION_RATE": 50,
+    "SESSION_BURST": 100,
+    # Per-IP limit, only applied once TRUSTED_PROXIES is set: otherwise behind the
+    # platform proxy every client shares one address and this would cap the whole
+    # site. Kept at the session limit since a classroom NAT is one address too.
+    "IP_RATE": 50,
+    "IP_BURST": 100,
+    "MAX_WAIT": 2.0,
+    "MAX_WAITING": 50,
+    # Reverse proxies (IPs or CIDR networks, comma separated) whose X-Forwarded-For
+    # is trusted, e.g. the hosting platform's edge. Empty: REMOTE_ADDR is the client
+    # and the per-IP limit is off.
+    "TRUSTED_PROXIES": [p for p in os.environ.get("QR_TRUSTED_PROXIES", "").split(",") if p],
+    "FORWARDED_HEADER": "X-Forwarded-For",
+}
+
+# 🔑 In-memory QRSession cache for the scan page (see qr_app/cache.py)
+QR_SESSION_CACHE = {
+    "MAX_SIZE": 512,
+    "NEGATIVE_TTL": 30,
+}
+
+# 📚 Rendered student/subject list pages (see qr_app/catalog.py)
+QR_CATALOG_CACHE = {
+    "MAX_SIZE": 256,
+    "TTL": 3600,
+}
+
+# 🔎 Student search on the FTS5 index (see qr_app/search.py)
+QR_SEARCH = {
+    "AUTOCOMPLETE_LIMIT": 10,
+    "MAX_LIMIT": 50,
+    "LIST_LIMIT": 200,
+    "RANK_WINDOW": 500,
+}
+
+# 🪪 Batch ID card rendering (see qr_app/idcards.py)
+QR_ID_CARDS = {
+    "WORKERS": None,  # CPU count (management command)
+    "CHUNK_SIZE": 100,
+    "BOX_SIZE": 6,
+    "ADMIN_WORKERS": 2,  # threads for the admin action
+    "ADMIN_MAX_CARDS": 2000,
+}
+
+# 🖨️ Background PDF reports (see qr_app/reports.py)
+QR_REPORTS = {
+    "ROOT": BASE_DIR / "reports",
+    "WORKERS": 2,
+    "MAX_JOBS": 256,  # finished jobs remembered in memory
+}
+
+# 📡 Live attendance stream (see qr_app/live.py)
+QR_LIVE = {
+    "HEARTBEAT": 5,  # seconds; also how often rows from other processes are picked up
+    "RETRY_MS": 3000,
+    "WSGI_STREAM_SECONDS": 60,  # a WSGI stream holds a worker thread; the browser reconnects
+}
+
+# 🔏 Signed, rotating QR tokens (see qr_app/tokens.py)
+QR_TOKENS = {
+    "SIGNED": True,
+    "ROTATE_SECONDS": 20,
+    "SCAN_GRACE_WINDOWS": 1,
+    "SUBMIT_GRACE_WINDOWS": 3,
+}
+
+# 🖼️ QR images served by qr_image_view (see qr_app/qr.py)
+QR_IMAGE = {
+    "ERROR_CORRECTION": "M",
+    "BOX_SIZE": 10,
+    "CACHE_SIZE": 256,
+}
+
 
 
 